@@ -1,52 +1,176 @@
 import streamlit as st
-import mysql.connector
+import db
+import max_pain_archive
 import pandas as pd
 from dotenv import load_dotenv
 import os
 import pytz
+from datetime import date
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Only the columns the viewer shows; never SELECT *
+COLUMNS = ("record_time", "index_name", "expiry_date", "max_pain_price", "index_price_close", "max_pain_trend", "max_pain")
+# Rows are ordered newest first on this key, which max_pain_sensibull.create_indexes covers
+ORDER_KEY = ("record_time", "index_name", "expiry_date")
+PAGE_SIZE = int(os.getenv("VIEWER_PAGE_SIZE", "500"))
+CACHE_TTL = int(os.getenv("VIEWER_CACHE_TTL", "300"))
+# How long the newest record_time is reused: rows scraped since show up at most this many seconds late
+FRESHNESS_TTL = int(os.getenv("VIEWER_FRESHNESS_TTL", "5"))
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def build_query(columns=COLUMNS, index_name=None, expiry_date=None, start=None, end=None, limit=PAGE_SIZE, offset=0, after=None):
+    """
+    Builds the filtered, projected and paginated max_pain_data query.
+
+    start and end are naive UTC datetimes bounding record_time (end exclusive).
+    Newest rows come first, ordered on ORDER_KEY. `after` is the ORDER_KEY
+    values of the last row of the previous page (see page_cursor); with it
+    the page starts right after that row through the index instead of
+    skipping `offset` rows, so deep pages cost the same as the first.
+    """
+    conditions = []
+    params = []
+    if index_name:
+        conditions.append("index_name = %s")
+        params.append(index_name)
+    if expiry_date:
+        conditions.append("expiry_date = %s")
+        params.append(expiry_date)
+    if start is not None:
+        conditions.append("record_time >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("record_time < %s")
+        params.append(end)
+    if after is not None:
+        conditions.append(f"({', '.join(ORDER_KEY)}) < ({', '.join(['%s'] * len(ORDER_KEY))})")
+        params.extend(after)
+    query = f"SELECT {', '.join(columns)} FROM max_pain_data"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {', '.join(column + ' DESC' for column in ORDER_KEY)} LIMIT %s OFFSET %s"
+    params.extend([limit, offset])
+    return query, tuple(params)
+
+
+def page_cursor(df):
+    """Returns the `after` value for the page following `df` (a page from fetch_data), or None if it is empty."""
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    record_time = pd.Timestamp(last['record_time'])
+    if record_time.tzinfo is not None:
+        record_time = record_time.tz_convert('UTC').tz_localize(None)
+    return (record_time.to_pydatetime(), last['index_name'], last['expiry_date'])
+
+
+@st.cache_data(ttl=FRESHNESS_TTL, show_spinner=False)
+def latest_record_time():
+    """
+    Newest record_time in the table; cached results are keyed on it, so new data invalidates them.
+
+    It is itself cached for FRESHNESS_TTL seconds, so a fresh scrape can take
+    that long to appear; the cost is one MAX() query per window.
+    """
+    frame = db.read_frame("SELECT MAX(record_time) AS latest FROM max_pain_data")
+    return str(frame['latest'].iloc[0])
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def index_names(version):
+    return db.read_frame("SELECT DISTINCT index_name FROM max_pain_data")['index_name'].dropna().tolist()
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=256, show_spinner=False)
+def query_page(version, index_name, expiry_date, start, end, page, page_size, after=None):
+    query, params = build_query(index_name=index_name, expiry_date=expiry_date, start=start, end=end,
+                                limit=page_size, offset=0 if after is not None else page * page_size, after=after)
+    df = db.read_frame(query, params=params)
+
+    # Convert record_time from UTC to IST
+    df['record_time'] = pd.to_datetime(df['record_time']).dt.tz_localize('UTC').dt.tz_convert('Asia/Kolkata')
+    return df
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=64, show_spinner=False)
+def archive_page(version, index_name, expiry_date, start, end, page, page_size):
+    if expiry_date:
+        try:
+            expiry_date = date.fromisoformat(expiry_date)
+        except ValueError:
+            # The archive types expiry_date, so text that is not a date matches nothing
+            return pd.DataFrame(columns=list(COLUMNS))
+    # Filters run inside the Parquet scan, which stops at the newest partitions holding this page
+    df = max_pain_archive.read_archive(columns=COLUMNS, index_name=index_name, start=start, end=end,
+                                       expiry_date=expiry_date, limit=(page + 1) * page_size)
+    df = df.iloc[page * page_size:].copy()
+    df['record_time'] = pd.to_datetime(df['record_time']).dt.tz_localize('UTC').dt.tz_convert('Asia/Kolkata')
+    return df.reset_index(drop=True)
+
+
 # Function to fetch data from MySQL
-def fetch_data(expiry_date=None):
+def fetch_data(expiry_date=None, index_name=None, date_range=None, page=0, page_size=PAGE_SIZE, source="Database", after=None):
+    """
+    Fetches one page of max pain rows; date_range is a (first, last) pair of IST dates.
+
+    Pass page_cursor() of the previous page as `after` to read the database
+    by key instead of by offset; without it, `page` is skipped to by offset.
+    """
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            port=os.getenv('DB_PORT'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_NAME')
-        )
-        query = "SELECT * FROM max_pain_data"
-        if expiry_date:
-            query += " WHERE expiry_date = %s"
-            df = pd.read_sql(query, connection, params=(expiry_date,))
-        else:
-            df = pd.read_sql(query, connection)
-        connection.close()
-
-        # Convert record_time from UTC to IST
-        df['record_time'] = pd.to_datetime(df['record_time']).dt.tz_localize('UTC').dt.tz_convert('Asia/Kolkata')
-
-        return df
-    except mysql.connector.Error as err:
+        start = end = None
+        if date_range:
+            first, last = date_range[0], date_range[-1]
+            start = IST.localize(pd.Timestamp(first).to_pydatetime()).astimezone(pytz.utc).replace(tzinfo=None)
+            end = IST.localize((pd.Timestamp(last) + pd.Timedelta(days=1)).to_pydatetime()).astimezone(pytz.utc).replace(tzinfo=None)
+        if source == "Archive":
+            version = str(max_pain_archive.read_watermark())
+            return archive_page(version, index_name or None, expiry_date or None, start, end, page, page_size)
+        return query_page(latest_record_time(), index_name or None, expiry_date or None, start, end, page, page_size, after)
+    except db.Error as err:
         st.error(f"Error: {err}")
         return pd.DataFrame()
 
-# Streamlit UI
-st.title("Max Pain Data Viewer")
 
-# Filter options
-expiry_date = st.text_input("Enter Expiry Date (YYYY-MM-DD):")
+def main():
+    """The Streamlit UI; `streamlit run app.py` runs it, importing the module does not."""
+    st.title("Max Pain Data Viewer")
+
+    # Filter options
+    source = st.radio("Source", ["Database", "Archive"], horizontal=True,
+                      help="Archive reads the Parquet export from max_pain_archive.py instead of MySQL")
+    try:
+        index_options = [""] + index_names(latest_record_time())
+    except db.Error as err:
+        st.error(f"Error: {err}")
+        index_options = [""]
+    index_name = st.selectbox("Index", index_options, format_func=lambda name: name or "All indices")
+    expiry_date = st.text_input("Enter Expiry Date (YYYY-MM-DD):")
+    date_range = st.date_input("Record date range (IST)", value=())
+    page = st.number_input("Page", min_value=1, value=1, step=1) - 1
+
+    # Fetch and display data
+    if st.button("Fetch Data"):
+        show_page(source, page, expiry_date, index_name, date_range)
+
+    # Display all data
+    if st.button("Show All Data"):
+        show_page(source, page)
+
 
-# Fetch and display data
-if st.button("Fetch Data"):
-    data = fetch_data(expiry_date)
-    st.write(data)
+def show_page(source, page, expiry_date=None, index_name=None, date_range=None):
+    """Shows one page, remembering where it ended so the next page is read by key rather than by offset."""
+    cursors = st.session_state.setdefault("page_cursors", {})
+    filters = (source, expiry_date or None, index_name or None, tuple(date_range or ()))
+    after = cursors.get((filters, page)) if source == "Database" else None
+    data = fetch_data(expiry_date, index_name, date_range, page, source=source, after=after)
+    cursors[(filters, page + 1)] = page_cursor(data)
+    st.dataframe(data)
+    if len(data) == PAGE_SIZE:
+        st.caption(f"Showing rows {page * PAGE_SIZE + 1}-{(page + 1) * PAGE_SIZE}; increase Page for more.")
 
-# Display all data
-if st.button("Show All Data"):
-    data = fetch_data()
-    st.write(data)
 
+if __name__ == "__main__":
+    main()
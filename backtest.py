@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+OUTCOMES = np.array(["target", "stoploss", "expiry", "no_data"])
+# Memory one chunk's (recommendations x bars) matrices may take
+CHUNK_MEMORY_BYTES = int(os.getenv("BACKTEST_CHUNK_MEMORY", str(256 * 1024 * 1024)))
+# Bytes per matrix cell in _first_touch: bar indices, two float paths, four boolean masks
+BYTES_PER_CELL = 8 + 2 * 8 + 4
+
+
+def backtest(recommendations, prices, stoploss_multiple=1.0, target_multiple=1.0,
+             symbol_column="instrument", chunk_size=None):
+    """
+    Replays recommendations against a historical price panel.
+
+    Each recommendation is entered at its entry_price and followed from the
+    first bar at or after created_at up to reco_end_date. It exits on the first
+    bar whose price reaches target_price_1 (target) or stoploss_price
+    (stoploss), with the target winning a tie as in fetch_LTP.evaluate_exits,
+    otherwise at the last price in the window (expiry). As in evaluate_exits,
+    a missing, zero or negative target or stoploss never triggers. 'sell'
+    recommendations are mirrored. The price paths of a whole chunk of
+    recommendations are gathered into one (recommendations x bars) matrix, so
+    first touches are found with array operations rather than per-row loops.
+
+    Parameters:
+    recommendations (DataFrame): rows from the recommendations table, with
+        symbol_column, entry_price, target_price_1, stoploss_price, created_at,
+        reco_end_date and optionally reco_type and user_name
+    prices (DataFrame): prices indexed by timestamp, one column per symbol
+    stoploss_multiple (float): scales the distance from entry to stoploss,
+        e.g. 1.5 puts the stop 50% further away
+    target_multiple (float): scales the distance from entry to target
+    chunk_size (int, optional): recommendations evaluated per matrix; by
+        default as many as fit CHUNK_MEMORY_BYTES at the longest window
+
+    Returns:
+    DataFrame: one row per recommendation with outcome, exit_time, exit_price,
+        bars_held, pnl (per unit) and return_pct
+    """
+    prices = prices.sort_index()
+    times = prices.index.to_numpy(dtype="datetime64[ns]")
+    panel = prices.to_numpy(dtype="float64")
+
+    columns = prices.columns.get_indexer(recommendations[symbol_column])
+    created = pd.to_datetime(recommendations["created_at"]).to_numpy(dtype="datetime64[ns]")
+    ends = pd.to_datetime(recommendations["reco_end_date"]).to_numpy(dtype="datetime64[ns]")
+    starts = np.searchsorted(times, created, side="left")
+    stops = np.where(np.isnat(ends), len(times), np.searchsorted(times, ends, side="right"))
+    stops = np.where(columns < 0, starts, np.maximum(stops, starts))
+
+    if "reco_type" in recommendations:
+        direction = np.where(recommendations["reco_type"].astype(str).str.lower() == "sell", -1.0, 1.0)
+    else:
+        direction = np.ones(len(recommendations))
+    entry = pd.to_numeric(recommendations["entry_price"], errors="coerce").to_numpy(dtype="float64")
+    target = pd.to_numeric(recommendations["target_price_1"], errors="coerce").to_numpy(dtype="float64")
+    stoploss = pd.to_numeric(recommendations["stoploss_price"], errors="coerce").to_numpy(dtype="float64")
+    # Unset levels are stored as 0; scaling one would invent a level below entry
+    target = np.where(target > 0, target, np.nan)
+    stoploss = np.where(stoploss > 0, stoploss, np.nan)
+    target = entry + target_multiple * (target - entry)
+    stoploss = entry - stoploss_multiple * (entry - stoploss)
+
+    if chunk_size is None:
+        longest = max(int((stops - starts).max(initial=0)), 1)
+        chunk_size = max(CHUNK_MEMORY_BYTES // (longest * BYTES_PER_CELL), 1)
+
+    outcome = np.full(len(recommendations), 3)
+    exit_bar = np.full(len(recommendations), -1)
+    for first in range(0, len(recommendations), chunk_size):
+        rows = slice(first, first + chunk_size)
+        outcome[rows], exit_bar[rows] = _first_touch(
+            panel, columns[rows], starts[rows], stops[rows], direction[rows], target[rows], stoploss[rows])
+
+    exited = exit_bar >= 0
+    exit_price = np.full(len(recommendations), np.nan)
+    exit_price[exited] = panel[exit_bar[exited], columns[exited]]
+    exit_time = np.full(len(recommendations), np.datetime64("NaT"), dtype="datetime64[ns]")
+    exit_time[exited] = times[exit_bar[exited]]
+    pnl = direction * (exit_price - entry)
+
+    result = pd.DataFrame({
+        "outcome": OUTCOMES[outcome],
+        "exit_time": exit_time,
+        "exit_price": exit_price,
+        "bars_held": np.where(exited, exit_bar - starts + 1, 0),
+        "pnl": pnl,
+        "return_pct": 100 * pnl / entry,
+    }, index=recommendations.index)
+    for column in (symbol_column, "user_name", "id"):
+        if column in recommendations:
+            result.insert(0, column, recommendations[column])
+    return result
+
+
+def _first_touch(panel, columns, starts, stops, direction, target, stoploss):
+    """Returns (outcome code, exit bar) per recommendation for one chunk."""
+    lengths = stops - starts
+    width = max(int(lengths.max(initial=0)), 1)
+    offsets = np.arange(width)
+    bars = starts[:, None] + offsets[None, :]
+    in_window = offsets[None, :] < lengths[:, None]
+    path = panel[np.minimum(bars, len(panel) - 1), np.maximum(columns, 0)[:, None]]
+    path = np.where(in_window, path, np.nan)
+
+    signed = direction[:, None] * path
+    with np.errstate(invalid="ignore"):
+        hit_target = signed >= (direction * target)[:, None]
+        hit_stoploss = signed <= (direction * stoploss)[:, None]
+    first_target = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), width)
+    first_stoploss = np.where(hit_stoploss.any(axis=1), hit_stoploss.argmax(axis=1), width)
+
+    priced = np.isfinite(path)
+    has_price = priced.any(axis=1)
+    last_priced = width - 1 - priced[:, ::-1].argmax(axis=1)
+
+    outcome = np.select(
+        [(first_target < width) & (first_target <= first_stoploss), first_stoploss < width, has_price],
+        [0, 1, 2], default=3)
+    offset = np.select([outcome == 0, outcome == 1, outcome == 2], [first_target, first_stoploss, last_priced], default=-1)
+    exit_bar = np.where(offset >= 0, starts + offset, -1)
+    return outcome, exit_bar
+
+
+def summarize(results, by="user_name"):
+    """Hit rates and P&L per group (by default per analyst) from backtest results."""
+    evaluated = results[results["outcome"] != "no_data"]
+    grouped = evaluated.groupby(by, observed=True) if by else evaluated.groupby(lambda _: "all")
+    summary = grouped.agg(
+        recommendations=("outcome", "size"),
+        target_hits=("outcome", lambda outcome: int((outcome == "target").sum())),
+        stoploss_hits=("outcome", lambda outcome: int((outcome == "stoploss").sum())),
+        total_pnl=("pnl", "sum"),
+        mean_return_pct=("return_pct", "mean"),
+    )
+    summary["hit_rate"] = summary["target_hits"] / summary["recommendations"]
+    summary["stoploss_rate"] = summary["stoploss_hits"] / summary["recommendations"]
+    return summary.sort_values("total_pnl", ascending=False)
+
+
+def sweep(recommendations, prices, stoploss_multiples=(0.5, 1.0, 1.5, 2.0), target_multiples=(1.0,), **kwargs):
+    """Backtests every combination of multiples and returns one summary row per combination."""
+    rows = []
+    for stoploss_multiple in stoploss_multiples:
+        for target_multiple in target_multiples:
+            results = backtest(recommendations, prices, stoploss_multiple=stoploss_multiple,
+                               target_multiple=target_multiple, **kwargs)
+            overall = summarize(results, by=None).iloc[0] if (results["outcome"] != "no_data").any() else None
+            rows.append({
+                "stoploss_multiple": stoploss_multiple,
+                "target_multiple": target_multiple,
+                "recommendations": 0 if overall is None else int(overall["recommendations"]),
+                "hit_rate": np.nan if overall is None else overall["hit_rate"],
+                "stoploss_rate": np.nan if overall is None else overall["stoploss_rate"],
+                "total_pnl": 0.0 if overall is None else overall["total_pnl"],
+                "mean_return_pct": np.nan if overall is None else overall["mean_return_pct"],
+            })
+    return pd.DataFrame(rows)
@@ -0,0 +1,67 @@
+"""
+Compares two pytest-benchmark JSON results and flags regressions.
+
+    python benchmarks/compare.py OLD.json NEW.json [--threshold 20] [--stat median]
+
+Exits with status 1 if any benchmark present in both files got slower by more
+than --threshold percent, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding="utf-8") as results:
+        data = json.load(results)
+    commit = (data.get("commit_info") or {}).get("id") or path
+    return commit[:10], {bench["fullname"]: bench["stats"] for bench in data["benchmarks"]}
+
+
+def compare(old, new, stat="median", threshold=20.0):
+    """Returns rows of (name, old seconds, new seconds, change %, status) for the union of benchmarks."""
+    rows = []
+    for name in sorted(old.keys() | new.keys()):
+        if name not in new:
+            rows.append((name, old[name][stat], None, None, "removed"))
+        elif name not in old:
+            rows.append((name, None, new[name][stat], None, "added"))
+        else:
+            before, after = old[name][stat], new[name][stat]
+            change = 100.0 * (after - before) / before if before else 0.0
+            status = "REGRESSION" if change > threshold else ("faster" if change < -threshold else "ok")
+            rows.append((name, before, after, change, status))
+    return rows
+
+
+def _format_seconds(value):
+    return "-" if value is None else f"{value * 1e6:,.1f} us"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag benchmark regressions between two runs")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=20.0, help="percent slowdown that counts as a regression")
+    parser.add_argument("--stat", default="median", choices=["min", "max", "mean", "median"])
+    args = parser.parse_args(argv)
+
+    old_commit, old = load(args.old)
+    new_commit, new = load(args.new)
+    rows = compare(old, new, args.stat, args.threshold)
+
+    width = max([len(row[0]) for row in rows] + [9])
+    print(f"{'benchmark':<{width}}  {old_commit:>14}  {new_commit:>14}  {'change':>8}  status")
+    for name, before, after, change, status in rows:
+        change_text = "-" if change is None else f"{change:+.1f}%"
+        print(f"{name:<{width}}  {_format_seconds(before):>14}  {_format_seconds(after):>14}  {change_text:>8}  {status}")
+
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:g}% ({args.stat})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+# benchmarks/conftest.py
+#
+# Offline performance baselines; needs pytest-benchmark and no browser or network.
+#
+#   python -m pytest benchmarks --benchmark-json=benchmarks/results/$(git rev-parse --short HEAD).json
+#   python benchmarks/compare.py benchmarks/results/<old>.json benchmarks/results/<new>.json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fixture:
+        return fixture.read()
+
+
+# The sqlite_db fixture comes from the repository's root conftest.py
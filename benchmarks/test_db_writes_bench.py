@@ -0,0 +1,78 @@
+# benchmarks/test_db_writes_bench.py
+import json
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import db
+from conftest import read_fixture
+from fetch_LTP import write_stock_prices
+from moneyControlScraping import create_tables, ingest_recommendations
+from price_history import PriceRings, append_ticks, create_table, record_prices
+
+
+@pytest.fixture
+def recommendations():
+    return json.loads(read_fixture("moneycontrol_recommendations.json"))["list"]["data"]
+
+
+def clear_tables():
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM portfolio")
+        cursor.execute("DELETE FROM recommendations")
+    return (), {}
+
+
+def test_ingest_new_recommendations(benchmark, sqlite_db, recommendations):
+    with db.transaction() as cursor:
+        create_tables(cursor)
+
+    def ingest():
+        with db.transaction() as cursor:
+            return ingest_recommendations(recommendations, cursor)
+
+    summary = benchmark.pedantic(ingest, setup=clear_tables, rounds=20)
+    assert summary["inserted"] == len(recommendations)
+
+
+def test_ingest_unchanged_recommendations(benchmark, sqlite_db, recommendations):
+    with db.transaction() as cursor:
+        create_tables(cursor)
+        ingest_recommendations(recommendations, cursor)
+
+    def ingest():
+        with db.transaction() as cursor:
+            return ingest_recommendations(recommendations, cursor)
+
+    assert benchmark(ingest)["unchanged"] == len(recommendations)
+
+
+def test_write_stock_prices(benchmark, sqlite_db, recommendations):
+    with db.transaction() as cursor:
+        create_tables(cursor)
+        ingest_recommendations(recommendations, cursor)
+    prices = {record["instrument"]: float(record["cmp"]) for record in recommendations}
+
+    def write():
+        with db.transaction() as cursor:
+            return write_stock_prices(prices, cursor)
+
+    assert benchmark(write)["updated"] == len(prices)
+
+
+def test_record_price_ticks(benchmark, sqlite_db):
+    with db.transaction() as cursor:
+        create_table(cursor)
+    prices = {f"SYM{number}": 100.0 + number for number in range(500)}
+    rings = PriceRings()
+
+    def record():
+        ts = datetime.now()
+        with db.transaction() as cursor:
+            written = record_prices(prices, cursor, ts=ts)
+        append_ticks(prices, ts, rings=rings)
+        return written
+
+    assert benchmark(record) == len(prices)
@@ -0,0 +1,25 @@
+# benchmarks/test_exits_bench.py
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fetch_LTP import OPEN_POSITIONS_COLUMNS, evaluate_exits
+
+
+@pytest.mark.parametrize("positions", [100, 10000])
+def test_evaluate_exits(benchmark, positions):
+    rng = np.random.default_rng(0)
+    entry = rng.uniform(100, 4000, positions)
+    frame = pd.DataFrame({
+        "id": np.arange(positions),
+        "instrument": [f"SYM{number % 500}" for number in range(positions)],
+        "current_price": entry * rng.uniform(0.85, 1.15, positions),
+        "entry_price": entry,
+        "quantity": rng.integers(1, 100, positions),
+        "target_price_1": entry * 1.08,
+        "stoploss_price": entry * 0.95,
+    }, columns=OPEN_POSITIONS_COLUMNS)
+    exits = benchmark(evaluate_exits, frame)
+    assert 0 < len(exits) < positions
@@ -0,0 +1,63 @@
+# benchmarks/test_max_pain_bench.py
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from max_pain import MaxPainBook, batch_max_pain, calculate_max_pain, pain_curve
+
+SIZES = [10, 50, 200, 1000, 2000]
+
+
+def chain(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "strike_prices": (np.arange(size) * 50 + 20000).tolist(),
+        "call_oi": rng.integers(0, 100000, size).tolist(),
+        "put_oi": rng.integers(0, 100000, size).tolist(),
+    }
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_calculate_max_pain(benchmark, size):
+    options_chain = chain(size)
+    max_pain_price, _ = benchmark(calculate_max_pain, options_chain)
+    assert max_pain_price in options_chain["strike_prices"]
+
+
+def test_batch_max_pain_five_indices_four_expiries(benchmark):
+    chains = {(index, expiry): chain(200, seed) for seed, (index, expiry) in enumerate(
+        (index, expiry) for index in ["NIFTY", "BANKNIFTY", "SENSEX", "FINNIFTY", "MIDCPNIFTY"] for expiry in range(4))}
+    summary, _ = benchmark(batch_max_pain, chains)
+    assert len(summary) == 20
+
+
+def test_max_pain_book_tick(benchmark):
+    options_chain = chain(2000)
+    book = MaxPainBook(options_chain["strike_prices"], options_chain["call_oi"], options_chain["put_oi"])
+    strikes = options_chain["strike_prices"][990:1000]
+    benchmark(book.update, strikes, [5] * 10, [-5] * 10)
+
+
+# Update and full recompute of the same book share a group per size, so the
+# benchmark table sets them side by side and compare.py tracks each across runs;
+# below a few hundred strikes both are bound by per-call overhead and finish about even
+BOOK_SIZES = [(1000, 10), (2000, 10), (5000, 50)]
+
+
+@pytest.mark.parametrize("size,changed", BOOK_SIZES)
+def test_max_pain_book_update(benchmark, size, changed):
+    benchmark.group = f"max_pain_book_{size}"
+    options_chain = chain(size)
+    book = MaxPainBook(options_chain["strike_prices"], options_chain["call_oi"], options_chain["put_oi"])
+    strikes = np.random.default_rng(size).choice(options_chain["strike_prices"], changed, replace=False)
+    deltas = np.ones(changed, dtype=book.call_oi.dtype)
+    benchmark(book.update, strikes, deltas, -deltas)
+
+
+@pytest.mark.parametrize("size,changed", BOOK_SIZES)
+def test_max_pain_book_full_recompute(benchmark, size, changed):
+    benchmark.group = f"max_pain_book_{size}"
+    options_chain = chain(size)
+    book = MaxPainBook(options_chain["strike_prices"], options_chain["call_oi"], options_chain["put_oi"])
+    benchmark(pain_curve, book.strikes, book.call_oi, book.put_oi)
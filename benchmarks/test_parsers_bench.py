@@ -0,0 +1,70 @@
+# benchmarks/test_parsers_bench.py
+import json
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import max_pain_sensibull
+from conftest import read_fixture
+from max_pain_archive import to_typed_frame
+from moneyControlScraping import normalize_recommendation
+from parsers import parse_price_html, parse_technical_picks
+from replay import FixtureStore, ReplayDriver, click_key
+
+SENSIBULL_URL = "https://web.sensibull.com/futures-options-data?tradingsymbol=NIFTY"
+SENSIBULL_EXPIRIES = ["30 Jan", "06 Feb", "13 Feb", "27 Feb"]
+
+
+def test_parse_tradingview_page(benchmark):
+    html = read_fixture("tradingview_INFY.html")
+    assert benchmark(parse_price_html, html) == 1534.8
+
+
+def test_parse_moneycontrol_cards(benchmark):
+    html = read_fixture("moneycontrol_technical_picks.html")
+    assert len(benchmark(parse_technical_picks, html)) == 60
+
+
+def test_extract_sensibull_max_pain(benchmark, tmp_path, monkeypatch):
+    # The recorded page with each expiry tab selected in turn, as a click would leave it
+    recorded = read_fixture("sensibull_NIFTY.html").replace('data-state="active"', 'data-state="inactive"')
+    store = FixtureStore(str(tmp_path))
+    for number, expiry in enumerate(SENSIBULL_EXPIRIES):
+        page = recorded.replace(f'data-state="inactive">{expiry}<', f'data-state="active">{expiry}<')
+        page = page.replace("<div>23,200</div>", f"<div>23,{200 + number * 100}</div>")
+        store.save("page", click_key(SENSIBULL_URL, expiry) if number else SENSIBULL_URL, page)
+    extracted = []
+    monkeypatch.setattr(max_pain_sensibull, "insert_data", lambda *row: extracted.append(row))
+
+    def extract():
+        extracted.clear()
+        # LTP, the expiry tabs and each tab's max pain text, read by the browser scraper's own code
+        max_pain_sensibull.scrape_max_pain(ReplayDriver(store), "NIFTY")
+        return list(extracted)
+
+    rows = benchmark(extract)
+    assert [(expiry, max_pain.split("\n")[0], ltp) for expiry, max_pain, _, ltp in rows] == \
+        [(expiry, f"23,{200 + number * 100}", "23,155.35") for number, expiry in enumerate(SENSIBULL_EXPIRIES)]
+
+
+def test_parse_moneycontrol_recommendations_json(benchmark):
+    payload = read_fixture("moneycontrol_recommendations.json")
+
+    def parse():
+        items = [item for item in json.loads(payload)["list"]["data"]
+                 if item["instrument_type"] == "cash" and item["asset_class"] == "equity"]
+        return [normalize_recommendation(item) for item in items]
+
+    records = benchmark(parse)
+    assert records and all(record["sc_symbol"] for record in records)
+
+
+def test_type_scraped_max_pain_rows(benchmark):
+    # Rows in max_pain_archive.SOURCE_COLUMNS order, with the text the Sensibull scraper stores;
+    # expiries carry no year and the record times straddle the new year
+    rows = [(f"2024-12-{18 + number % 14:02d} 09:{15 + number % 45:02d}:00", "NIFTY", ["02 Jan", "09 Jan", "30 Jan"][number % 3],
+             f"23,{200 + number % 50}", "23,155.35", "Bullish", f"23,{200 + number % 50}\nBullish") for number in range(5000)]
+    frame = benchmark(to_typed_frame, rows)
+    assert frame["max_pain_price"].notna().all()
+    assert {expiry.year for expiry in frame["expiry_date"]} == {2025}
@@ -0,0 +1,102 @@
+"""
+Single entry point for the stock jobs.
+
+    python cli.py max-pain [--index NIFTY ...] [--chain | --backfill-expiries]
+    python cli.py ltp
+    python cli.py exits [--dry-run]
+    python cli.py recos [--browser | --sync]
+    python cli.py viewer
+
+Each subcommand imports only what it needs, so DB-only commands such as
+`exits` start without loading Selenium, BeautifulSoup or webdriver_manager.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def run_max_pain(args):
+    import max_pain_sensibull
+    from driver_pool import DriverPool
+
+    if args.backfill_expiries:
+        print(f"Converted {max_pain_sensibull.backfill_expiries()} max_pain_data rows to ISO expiry dates")
+        return
+
+    mode = "chain" if args.chain else None
+    with DriverPool() as pool:
+        if args.index:
+            for index in args.index:
+                max_pain_sensibull.run_index(index, pool, mode)
+        else:
+            max_pain_sensibull.run_all(pool, mode)
+
+
+def run_ltp(args):
+    from fetch_LTP import update_stock_prices
+
+    update_stock_prices(workers=args.workers)
+
+
+def run_exits(args):
+    from fetch_LTP import update_stock_exit_date
+
+    update_stock_exit_date(dry_run=args.dry_run)
+
+
+def run_recos(args):
+    if args.sync:
+        import reco_sync
+
+        return 0 if reco_sync.run() else 1
+    import moneyControlScraping
+
+    return 0 if moneyControlScraping.run(browser=args.browser) else 1
+
+
+def run_viewer(args):
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    return subprocess.call([sys.executable, "-m", "streamlit", "run", app] + args.streamlit_args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Stock data jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    max_pain = commands.add_parser("max-pain", help="scrape max pain from Sensibull")
+    max_pain.add_argument("--index", action="append", help="index to scrape (repeatable; default: all)")
+    max_pain_mode = max_pain.add_mutually_exclusive_group()
+    max_pain_mode.add_argument("--chain", action="store_true",
+                               help="capture each index's full option chain and compute max pain locally")
+    max_pain_mode.add_argument("--backfill-expiries", action="store_true",
+                               help="one-off: rewrite stored '30 Jan' expiries as ISO dates, then exit")
+    max_pain.set_defaults(handler=run_max_pain)
+
+    ltp = commands.add_parser("ltp", help="refresh last traded prices of open positions")
+    ltp.add_argument("--workers", type=int, help="browsers used in parallel for the Selenium fallback")
+    ltp.set_defaults(handler=run_ltp)
+
+    exits = commands.add_parser("exits", help="close positions that hit their target or stoploss")
+    exits.add_argument("--dry-run", action="store_true", help="report exits without writing them")
+    exits.set_defaults(handler=run_exits)
+
+    recos = commands.add_parser("recos", help="ingest Moneycontrol recommendations")
+    recos_source = recos.add_mutually_exclusive_group()
+    recos_source.add_argument("--browser", action="store_true", help="fetch through a logged-in browser instead of the API client")
+    recos_source.add_argument("--sync", action="store_true", help="page through every recommendation and ingest only changed ones")
+    recos.set_defaults(handler=run_recos)
+
+    viewer = commands.add_parser("viewer", help="start the Streamlit max pain viewer")
+    viewer.add_argument("streamlit_args", nargs=argparse.REMAINDER, help="extra arguments for streamlit run")
+    viewer.set_defaults(handler=run_viewer)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
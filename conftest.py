@@ -0,0 +1,12 @@
+# conftest.py
+import pytest
+
+import db
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """A fresh file-backed SQLite database standing in for MySQL; yields the backend."""
+    backend = db.configure(db.SQLiteBackend(str(tmp_path / "stock.sqlite3"), pool_size=2))
+    yield backend
+    db.configure(None)
@@ -0,0 +1,260 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+import mysql.connector
+from mysql.connector import pooling
+from dotenv import load_dotenv
+
+from instrumentation import timer
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Catch this instead of mysql.connector.Error so the same code works on every backend
+Error = (mysql.connector.Error, sqlite3.Error)
+
+
+class MySQLBackend:
+    """Connections from a mysql.connector pool, so each script pays the TCP and auth handshake once."""
+
+    name = "mysql"
+
+    def __init__(self, pool_size=None, **params):
+        self.pool_size = pool_size or int(os.getenv("DB_POOL_SIZE", "5"))
+        params = params or {
+            "host": os.getenv("DB_HOST"),
+            "port": int(os.getenv("DB_PORT", "3306")),
+            "user": os.getenv("DB_USER"),
+            "password": os.getenv("DB_PASSWORD"),
+            "database": os.getenv("DB_NAME"),
+        }
+        self._pool = pooling.MySQLConnectionPool(pool_name="stock", pool_size=self.pool_size, **params)
+        # MySQLConnectionPool raises instead of waiting when it runs dry
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def connect(self):
+        self._slots.acquire()
+        try:
+            return self._pool.get_connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        try:
+            # Closing a pooled connection hands it back to the pool
+            connection.close()
+        finally:
+            self._slots.release()
+
+    def cursor(self, connection, prepared=False):
+        return connection.cursor(prepared=prepared) if prepared else connection.cursor()
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """A small pool of sqlite3 connections; stands in for MySQL in tests and local runs."""
+
+    name = "sqlite"
+
+    def __init__(self, path=None, pool_size=None):
+        self.path = path or os.getenv("DB_PATH", "stock.sqlite3")
+        # Every ":memory:" connection is a separate database, so share a single one
+        self.pool_size = 1 if self.path == ":memory:" else (pool_size or int(os.getenv("DB_POOL_SIZE", "5")))
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def connect(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return sqlite3.connect(self.path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        self._idle.put(connection)
+        self._slots.release()
+
+    def cursor(self, connection, prepared=False):
+        return connection.cursor()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# MySQL spellings the scripts use, and their SQLite equivalents
+SQLITE_REWRITES = [
+    ("%s", "?"),
+    ("INT PRIMARY KEY AUTO_INCREMENT", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    ("NOW()", "CURRENT_TIMESTAMP"),
+]
+
+
+@lru_cache(maxsize=256)
+def prepare(query, dialect):
+    """Rewrites a MySQL-style statement for the backend's dialect; cached per statement."""
+    if dialect == "sqlite":
+        for mysql_text, sqlite_text in SQLITE_REWRITES:
+            query = query.replace(mysql_text, sqlite_text)
+    return query
+
+
+class Cursor:
+    """DB-API cursor wrapper that lets callers write MySQL-style statements on every backend."""
+
+    def __init__(self, cursor, backend):
+        self._cursor = cursor
+        self._backend = backend
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(prepare(query, self._backend.name), params)
+
+    def executemany(self, query, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        if not seq_of_params:
+            return None
+        return self._cursor.executemany(prepare(query, self._backend.name), seq_of_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    @property
+    def dialect(self):
+        return self._backend.name
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+
+def insert_rows(cursor, table, columns, rows, key_columns=None, update_columns=None, chunk_size=500):
+    """
+    Inserts rows with multi-row INSERT statements, chunk_size rows per round trip.
+
+    With key_columns, rows that collide on that key update update_columns instead
+    (ON DUPLICATE KEY UPDATE on MySQL, ON CONFLICT ... DO UPDATE on SQLite).
+    Returns the number of rows sent.
+    """
+    rows = list(rows)
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([row_placeholder] * len(chunk))
+        if key_columns and update_columns:
+            if cursor.dialect == "sqlite":
+                assignments = ", ".join(f"{column} = excluded.{column}" for column in update_columns)
+                query += f" ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {assignments}"
+            else:
+                assignments = ", ".join(f"{column} = VALUES({column})" for column in update_columns)
+                query += f" ON DUPLICATE KEY UPDATE {assignments}"
+        cursor.execute(query, [value for row in chunk for value in row])
+    return len(rows)
+
+
+def create_index(cursor, table, name, columns):
+    """
+    Creates the index `name` on table(columns) unless it already exists, so table setup can run every time.
+
+    SQLite has CREATE INDEX IF NOT EXISTS; MySQL has not, so the index is
+    looked up in information_schema first.
+    """
+    statement = f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"
+    if cursor.dialect == "sqlite":
+        cursor.execute(statement.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+        return
+    cursor.execute("SELECT COUNT(*) FROM information_schema.statistics "
+                   "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s", (table, name))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(statement)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def configure(backend):
+    """Replaces the process-wide backend, e.g. with a SQLiteBackend in tests."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    if previous is not None and previous is not backend:
+        previous.close()
+    return backend
+
+
+def get_backend():
+    """Returns the process-wide backend, built from DB_BACKEND (mysql or sqlite) on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if os.getenv("DB_BACKEND", "mysql") == "sqlite":
+                _backend = SQLiteBackend()
+            else:
+                _backend = MySQLBackend()
+        return _backend
+
+
+@contextmanager
+def connection():
+    """Borrows a raw connection from the pool for the duration of the with-block."""
+    backend = get_backend()
+    with timer("db", "connect", backend=backend.name):
+        conn = backend.connect()
+    try:
+        yield conn
+    finally:
+        backend.release(conn)
+
+
+@contextmanager
+def transaction(prepared=False):
+    """Yields a cursor; commits when the block succeeds and rolls back if it raises."""
+    backend = get_backend()
+    with connection() as conn:
+        cursor = Cursor(backend.cursor(conn, prepared=prepared), backend)
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def read_frame(query, params=None):
+    """Runs a SELECT and returns the result as a pandas DataFrame."""
+    import pandas as pd
+
+    backend = get_backend()
+    with connection() as conn:
+        return pd.read_sql(prepare(query, backend.name), conn, params=params)
@@ -0,0 +1,162 @@
+import atexit
+import os
+import platform
+import queue
+import threading
+from contextlib import contextmanager
+
+from instrumentation import count, timer
+
+GECKODRIVER_PATH = os.getenv("GECKODRIVER_PATH", "/snap/bin/geckodriver")
+# Longest a driver.get() may block before raising TimeoutException, so a hung page cannot pin a pooled browser
+PAGE_LOAD_TIMEOUT = float(os.getenv("DRIVER_PAGE_LOAD_TIMEOUT", "30"))
+
+
+def create_driver():
+    """Returns a driver for SCRAPE_MODE: a live browser, a recording one, or a replay stand-in (see replay.py)."""
+    from replay import wrap_driver
+
+    return wrap_driver(start_browser)
+
+
+def start_browser():
+    """Starts a browser: Chrome on Windows, headless Firefox on Linux (Ubuntu)."""
+    # Imported here so that DB-only commands never load Selenium
+    from selenium import webdriver
+    from selenium.webdriver.firefox.service import Service
+
+    if platform.system() == "Windows":
+        print("Using Chrome on Windows")
+        from webdriver_manager.chrome import ChromeDriverManager
+        return configure_browser(webdriver.Chrome(service=webdriver.ChromeService(ChromeDriverManager().install())))
+    if platform.system() == "Linux":
+        print("Using Firefox on Linux")
+        firefox_options = webdriver.FirefoxOptions()
+        firefox_options.add_argument("--headless")
+        firefox_options.add_argument("--no-sandbox")
+        firefox_options.add_argument("--disable-dev-shm-usage")
+        service = Service(GECKODRIVER_PATH)
+        return configure_browser(webdriver.Firefox(service=service, options=firefox_options))
+    raise RuntimeError(f"Unsupported operating system: {platform.system()}")
+
+
+def configure_browser(driver):
+    """Bounds page loads and maximizes the window once per browser, rather than on every page."""
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    driver.maximize_window()
+    return driver
+
+
+class DriverPool:
+    """
+    Keeps warm WebDriver instances so scripts stop paying a browser cold start per call.
+
+    At most `size` drivers are checked out at once; callers beyond the cap
+    block until one is returned. Idle drivers are health-checked before reuse
+    and replaced if the browser has crashed or hung up, and a driver is
+    retired after `max_uses` checkouts to bound memory growth.
+    """
+
+    def __init__(self, size=None, factory=create_driver, max_uses=None):
+        self.size = size or int(os.getenv("DRIVER_POOL_SIZE", "2"))
+        self.max_uses = max_uses or int(os.getenv("DRIVER_POOL_MAX_USES", "200"))
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._uses = {}
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Checks out a healthy driver for the duration of the with-block."""
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No browser became free within {timeout} seconds")
+        driver = None
+        failed = False
+        try:
+            driver = self._checkout()
+            yield driver
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if driver is not None:
+                self._checkin(driver, check=failed)
+            self._slots.release()
+
+    def close(self):
+        """Quits every idle driver; drivers still checked out are quit when returned."""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def _checkout(self):
+        if self._closed:
+            raise RuntimeError("DriverPool is closed")
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with timer("driver_pool", "start_browser"):
+                    driver = self._factory()
+                with self._lock:
+                    self._uses[id(driver)] = 0
+                break
+            if is_alive(driver):
+                break
+            print("Discarding crashed browser from the pool")
+            count("browsers_discarded_total", reason="crashed")
+            self._discard(driver)
+        with self._lock:
+            self._uses[id(driver)] += 1
+        return driver
+
+    def _checkin(self, driver, check=False):
+        with self._lock:
+            worn_out = self._uses.get(id(driver), 0) >= self.max_uses
+        if self._closed or worn_out or (check and not is_alive(driver)):
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error quitting browser: {e}")
+
+
+def is_alive(driver):
+    """Returns True if the browser behind the driver still answers commands."""
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool shared by all scrapers, creating it on first use."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = DriverPool()
+            atexit.register(_shared_pool.close)
+        return _shared_pool
@@ -1,115 +1,195 @@
 import time
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import mysql.connector
 import dotenv
-import requests
-from bs4 import BeautifulSoup
-import platform
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.firefox import GeckoDriverManager
-from webdriver_manager.chrome import ChromeDriverManager
+import db
+import numpy as np
+import pandas as pd
+from driver_pool import get_pool, is_alive
+import price_history
+from ltp_cache import get_cache
+from instrumentation import count, timer
 # Load environment variables from .env file
 dotenv.load_dotenv()
 
-def update_stock_prices():
+# Latency budget for one symbol: how long to wait for the ticker to render a price
+LTP_TIMEOUT = float(os.getenv("LTP_TIMEOUT", "10"))
+
+
+def update_stock_prices(pool=None, workers=None):
     """Connects to the MySQL database, fetches instrument names,
     gets latest prices, and updates the portfolio table.
     """
+    # Scraping dependencies load here, so exit checks alone stay fast to start
+    from price_sources import HttpPriceSource, LayeredPriceSource
+
     try:
-        if platform.system() == "Windows":
-            # Use Chrome on Windows
-            print("Using Chrome on Windows")
-            driver = webdriver.Chrome(service=webdriver.ChromeService(ChromeDriverManager().install()))
-            
-        elif platform.system() == "Linux":
-            # Use Firefox on Linux (Ubuntu)
-            print("Using Firefox on Linux")
-            firefox_options = webdriver.FirefoxOptions()
-            firefox_options.add_argument("--headless")
-            firefox_options.add_argument("--no-sandbox")
-            firefox_options.add_argument("--disable-dev-shm-usage")
-            geckodriver_path = "/snap/bin/geckodriver"
-            service = Service(geckodriver_path)
-            driver = webdriver.Firefox(service=service, options=firefox_options)
-            
-        else:
-            print("Unsupported operating system.")
-            return False
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return False
-    try:
-        # Database connection details
-        mydb = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME")
-        )
-
-        mycursor = mydb.cursor()
-
-        # Replace 'your_query' with your actual query
-        mycursor.execute("SELECT instrument FROM portfolio WHERE exit_date IS NULL")
-        instruments = mycursor.fetchall()
-    
-        for instrument in instruments:
-            instrument_name = instrument[0]
-            # Replace 'your_price_fetching_logic' with your actual logic
-            # Example using a hypothetical 'get_latest_price' function
-            try:
-                latest_price = get_latest_price(instrument_name,driver)
-                if latest_price is not None:
-                    update_query = f"UPDATE portfolio SET current_price = {latest_price} WHERE instrument = '{instrument_name}';"
-                    mycursor.execute(update_query)
-                    mydb.commit()
-                    print(f"Updated price for {instrument_name} to {latest_price}")
-                else:
-                    print(f"Could not fetch price for {instrument_name}")
-            except Exception as e:
-                print(f"Error updating price for {instrument_name}: {e}")
+        # DDL commits implicitly on MySQL, so the table is ensured before any write, on its own
+        with db.transaction() as mycursor:
+            price_history.create_table(mycursor)
 
-        mydb.close()
+        # Read and write in separate short transactions so no connection is held while scraping
+        with timer("ltp", "read_instruments"), db.transaction() as mycursor:
+            mycursor.execute("SELECT DISTINCT instrument FROM portfolio WHERE exit_date IS NULL")
+            instruments = [instrument[0] for instrument in mycursor.fetchall()]
 
-    except mysql.connector.Error as err:
+        # Symbols fetched within LTP_CACHE_TTL, by this or (with LTP_CACHE_PATH) another process, are not scraped again
+        cache = get_cache()
+        sources = LayeredPriceSource([HttpPriceSource(), SeleniumPriceSource(pool=pool, workers=workers)])
+        started = time.time()
+        with timer("ltp", "fetch_prices"):
+            prices = cache.fetch_many(instruments, sources.fetch_many)
+        for report in sources.report():
+            print(f"LTP source {report['source']}: {report['hits']}/{report['requests']} hits, p50 {report['p50_seconds']}s")
+        report = cache.report()
+        print(f"LTP cache: {report['hits']} hits, {report['misses']} misses, {report['stale']} stale, {report['coalesced']} coalesced")
+        # Only prices fetched by this refresh are new ticks; cached ones were recorded when fetched
+        ticks = {name: price for name, price in prices.items() if (cache.fetched_at(name) or 0) >= started}
+
+        # One transaction for the whole refresh, including its ticks in price_history
+        ticked_at = datetime.now()
+        with timer("ltp", "db_write"), db.transaction() as mycursor:
+            result = write_stock_prices(prices, mycursor)
+            price_history.record_prices(ticks, mycursor, ts=ticked_at)
+        # Readers of the rings only ever see ticks that are in the database
+        price_history.append_ticks(ticks, ticked_at)
+        count("ltp_instruments_total", result['updated'], result="updated")
+        count("ltp_instruments_total", result['missing'], result="missing")
+        print(f"Updated prices for {result['updated']} instruments ({result['rows']} portfolio rows)")
+        if result['missing']:
+            print(f"Could not update {result['missing']} instruments: {', '.join(result['missing_instruments'])}")
+
+    except db.Error as err:
         print(f"Error connecting to MySQL database: {err}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-        if driver:
-            driver.quit()
 
 
-def get_latest_price(instrument_name,driver):
+def write_stock_prices(prices, cursor, chunk_size=500):
     """
-    Replace this with your actual logic to fetch the latest price
-    for the given instrument.  This is a placeholder.
+    Writes fetched prices to the portfolio with one parameterized CASE update per chunk.
+
+    `prices` maps instrument -> price, with None for instruments that could not
+    be fetched. Returns counts of updated instruments, portfolio rows written and
+    missing instruments (no price, or no portfolio row), plus the missing names.
     """
-    try:
-        url = f"https://www.tradingview.com/symbols/NSE-{instrument_name}/"
-        driver.get(url)
-        driver.maximize_window()
-        time.sleep(2)
-        price_element = driver.find_elements(By.XPATH, "//div[contains(@class, 'symbol-header-ticker')]//descendant::span[contains(@class, 'symbol-last')]")
+    fetched = {name: price for name, price in prices.items() if price is not None}
+    missing = [name for name, price in prices.items() if price is None]
+    updated = 0
+    rows = 0
+    names = list(fetched)
+    for start in range(0, len(names), chunk_size):
+        chunk = names[start:start + chunk_size]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"SELECT instrument, COUNT(*) FROM portfolio WHERE instrument IN ({placeholders}) GROUP BY instrument", chunk)
+        found = dict(cursor.fetchall())
+        chunk = [name for name in chunk if name in found]
+        missing.extend(name for name in names[start:start + chunk_size] if name not in found)
+        if not chunk:
+            continue
+        cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+        placeholders = ", ".join(["%s"] * len(chunk))
+        params = [value for name in chunk for value in (name, fetched[name])] + chunk
+        cursor.execute(f"UPDATE portfolio SET current_price = CASE instrument {cases} END WHERE instrument IN ({placeholders})", params)
+        updated += len(chunk)
+        rows += sum(found[name] for name in chunk)
+    return {"updated": updated, "rows": rows, "missing": len(missing), "missing_instruments": missing}
 
-        if price_element:
-            try:
-                latest_price = float(price_element[0].text.replace(",", ""))
-            except:
-                driver.get(url)
-                time.sleep(5)
-                price_element = driver.find_elements(By.XPATH, "//div[contains(@class, 'symbol-header-ticker')]//descendant::span[contains(@class, 'symbol-last')]")
-                latest_price = float(price_element[0].text.replace(",", ""))
-            return latest_price
-        else:
-            print(f"Could not find price element for {instrument_name} on TradingView.")
+
+def fetch_latest_prices(instruments, pool=None, workers=None, timeout=LTP_TIMEOUT, fetch_price=None):
+    """
+    Fetches latest prices for many instruments concurrently.
+
+    `workers` threads (default: the pool size) pull instruments from a shared
+    queue until it is empty, checking out a browser from the pool once they
+    hold one and keeping it for the instruments that follow. A worker whose
+    browser dies hands it back and checks out a fresh one.
+    Returns a dict of instrument -> price, with None where no price was found.
+    """
+    fetch_price = fetch_price or get_latest_price
+    pool = pool or get_pool()
+    workers = workers or pool.size
+    pending = queue.Queue()
+    for instrument_name in dict.fromkeys(instruments):
+        pending.put(instrument_name)
+    prices = {}
+
+    def take():
+        try:
+            return pending.get_nowait()
+        except queue.Empty:
             return None
+
+    def work():
+        # A symbol is claimed before a browser is checked out, so no worker
+        # holds (or waits for) a browser only to find the queue empty
+        instrument_name = take()
+        while instrument_name is not None:
+            with pool.driver() as driver:
+                while instrument_name is not None:
+                    prices[instrument_name] = fetch_price(instrument_name, driver, timeout)
+                    crashed = prices[instrument_name] is None and not is_alive(driver)
+                    instrument_name = take()
+                    if crashed:
+                        break
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(work) for _ in range(min(workers, pending.qsize()))]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"LTP worker failed: {e}")
+
+    return {instrument_name: prices.get(instrument_name) for instrument_name in dict.fromkeys(instruments)}
+
+
+class SeleniumPriceSource:
+    """Price source that renders TradingView in pooled browsers; the slow fallback."""
+
+    name = "selenium"
+
+    def __init__(self, pool=None, workers=None, timeout=LTP_TIMEOUT):
+        self.pool = pool
+        self.workers = workers
+        self.timeout = timeout
+        from price_sources import SourceStats
+        self.stats = SourceStats(self.name)
+
+    def fetch(self, instrument_name, driver, timeout):
+        started = time.perf_counter()
+        price = get_latest_price(instrument_name, driver, timeout)
+        self.stats.record(price, time.perf_counter() - started)
+        return price
+
+    def fetch_many(self, instruments):
+        return fetch_latest_prices(instruments, pool=self.pool, workers=self.workers, timeout=self.timeout, fetch_price=self.fetch)
+
+
+def get_latest_price(instrument_name,driver,timeout=LTP_TIMEOUT):
+    """
+    Fetches the last traded price of an NSE instrument from TradingView.
+
+    Waits until the ticker shows a number, for at most `timeout` seconds,
+    instead of sleeping a fixed time.
+    """
+    import requests
+    from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    try:
+        url = f"https://www.tradingview.com/symbols/NSE-{instrument_name}/"
+        # The pool's browsers bound page loads (driver_pool.PAGE_LOAD_TIMEOUT) and are already maximized
+        with timer("ltp", "page_load", symbol=instrument_name):
+            driver.get(url)
+        wait = WebDriverWait(driver, timeout, poll_frequency=0.2, ignored_exceptions=(StaleElementReferenceException,))
+        with timer("ltp", "price_wait", symbol=instrument_name):
+            return wait.until(lambda page: read_price(page, instrument_name))
+    except TimeoutException:
+        print(f"Could not find price element for {instrument_name} on TradingView.")
+        return None
     except requests.exceptions.RequestException as e:
         print(f"Error fetching price from TradingView for {instrument_name}: {e}")
         return None
@@ -121,52 +201,105 @@ def get_latest_price(instrument_name,driver):
         return None
 
 
-def update_stock_exit_date():
-    mydb = mysql.connector.connect(
-        host=os.getenv('DB_HOST'),
-        port=int(os.getenv('DB_PORT')),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        database=os.getenv('DB_NAME')
-    )
-    mycursor = mydb.cursor()
+def read_price(driver, symbol=None):
+    """
+    Returns the price once the page shows one as a number, else False.
+
+    Each poll fetches page_source in a single WebDriver call and parses it
+    in-process, instead of locating the ticker and reading its text remotely.
+    """
+    from parsers import parse_price_html
+
+    price = parse_price_html(driver.page_source, symbol)
+    return False if price is None else price
+
+
+# Every open position with its recommendation's target and stoploss, in one round trip
+OPEN_POSITIONS_QUERY = """
+    SELECT p.id, p.instrument, p.current_price, p.entry_price, p.quantity, r.target_price_1, r.stoploss_price
+    FROM portfolio p
+    JOIN recommendations r ON r.id = p.recommendation_id
+    WHERE p.exit_date IS NULL
+"""
+OPEN_POSITIONS_COLUMNS = ["id", "instrument", "current_price", "entry_price", "quantity", "target_price_1", "stoploss_price"]
+
+
+def evaluate_exits(positions):
+    """
+    Finds the open positions whose latest price has crossed the target or the stoploss.
+
+    Takes a DataFrame shaped like OPEN_POSITIONS_QUERY's result and returns the
+    positions to close, with 'reason' ('target' or 'stoploss'), 'exit_price' and
+    'realized_profit' columns. As before, a missing or zero target/stoploss never
+    triggers, the target wins if both would, and a position without an entry
+    price or quantity is never closed, since its profit cannot be computed.
+    """
+    price = pd.to_numeric(positions["current_price"], errors="coerce")
+    target = pd.to_numeric(positions["target_price_1"], errors="coerce")
+    stoploss = pd.to_numeric(positions["stoploss_price"], errors="coerce")
+    entry_price = pd.to_numeric(positions["entry_price"], errors="coerce")
+    quantity = pd.to_numeric(positions["quantity"], errors="coerce")
+
+    hit_target = (target.fillna(0) != 0) & (price >= target)
+    hit_stoploss = ~hit_target & (stoploss.fillna(0) != 0) & (price <= stoploss)
+    triggered = ((hit_target | hit_stoploss) & entry_price.notna() & quantity.notna()).to_numpy()
+
+    exits = positions.loc[triggered].copy()
+    exits["reason"] = np.where(hit_target.to_numpy()[triggered], "target", "stoploss")
+    exits["exit_price"] = price[triggered]
+    exits["realized_profit"] = (price - entry_price)[triggered] * quantity[triggered]
+    return exits
 
+
+def update_stock_exit_date(dry_run=False):
+    """
+    Closes every open position whose target or stoploss has been reached.
+
+    One JOIN query loads the positions, the checks run vectorized in pandas and
+    all exits are written in a single transaction. With dry_run=True nothing is
+    written. Returns the DataFrame of exits made (or that would be made).
+    """
     try:
-        mycursor.execute("SELECT id, instrument,current_price,entry_price,quantity FROM portfolio WHERE exit_date IS NULL")
-        stocks_to_check = mycursor.fetchall()
+        with db.transaction() as mycursor:
+            with timer("exits", "load_positions"):
+                mycursor.execute(OPEN_POSITIONS_QUERY)
+                positions = pd.DataFrame(mycursor.fetchall(), columns=OPEN_POSITIONS_COLUMNS)
 
-        for (portfolio_id, instrument_name,ltp,entry_price,quantity) in stocks_to_check:
-            try:
-                mycursor.execute("SELECT target_price_1, stoploss_price FROM recommendations WHERE id = (SELECT recommendation_id FROM portfolio WHERE id = %s)", (portfolio_id,))
-                recommendation_data = mycursor.fetchone()
-
-                if recommendation_data:
-                    target_price = recommendation_data[0]
-                    stoploss_price = recommendation_data[1]
-                    latest_price = ltp
-
-                    if latest_price is not None:
-                        profit = (latest_price - entry_price)*quantity
-
-                        if target_price and latest_price >= target_price:
-                            print(f"Target price reached for {instrument_name} (portfolio_id: {portfolio_id}). Updating exit_date.")
-                            mycursor.execute("UPDATE portfolio SET exit_date = %s, exit_price = %s, realized_profit = %s WHERE id = %s", (datetime.now(), latest_price, profit, portfolio_id))
-                            mydb.commit()
-                        elif stoploss_price and latest_price <= stoploss_price:
-                            print(f"Stop loss triggered for {instrument_name} (portfolio_id: {portfolio_id}). Updating exit_date.")
-                            mycursor.execute("UPDATE portfolio SET exit_date = %s, exit_price = %s, realized_profit = %s WHERE id = %s", (datetime.now(), latest_price, profit, portfolio_id))
-                            mydb.commit()
-                    else:
-                        print(f"Could not fetch latest price for {instrument_name}. Skipping.")
-            except mysql.connector.Error as e:
-                print(f"Error updating portfolio data for {instrument_name}: {e}")
-            except Exception as e:
-                print(e)
+            for instrument_name in positions.loc[positions["current_price"].isna(), "instrument"]:
+                print(f"Could not fetch latest price for {instrument_name}. Skipping.")
+            unsized = positions["entry_price"].isna() | positions["quantity"].isna()
+            for instrument_name in positions.loc[unsized & positions["current_price"].notna(), "instrument"]:
+                print(f"Missing entry price or quantity for {instrument_name}. Skipping.")
+
+            with timer("exits", "evaluate"):
+                exits = evaluate_exits(positions)
+            count("exits_total", len(exits))
+            for position in exits.itertuples(index=False):
+                if position.reason == "target":
+                    print(f"Target price reached for {position.instrument} (portfolio_id: {position.id}). Updating exit_date.")
+                else:
+                    print(f"Stop loss triggered for {position.instrument} (portfolio_id: {position.id}). Updating exit_date.")
+
+            if dry_run:
+                print(f"Dry run: {len(exits)} of {len(positions)} open positions would be exited.")
+            else:
+                exit_date = datetime.now()
+                with timer("exits", "db_write"):
+                    mycursor.executemany(
+                        "UPDATE portfolio SET exit_date = %s, exit_price = %s, realized_profit = %s WHERE id = %s AND exit_date IS NULL",
+                        [(exit_date, float(position.exit_price), float(position.realized_profit), int(position.id)) for position in exits.itertuples(index=False)])
+        return exits
+    except db.Error as e:
+        print(f"Error updating portfolio exits: {e}")
     except Exception as e:
         print(e)
 
 
+def run(pool=None):
+    """Refreshes prices, then closes the positions that reached their target or stoploss."""
+    update_stock_prices(pool=pool)
+    update_stock_exit_date()
+
 
 if __name__ == "__main__":
-    update_stock_prices()
-    update_stock_exit_date()
+    run()
@@ -0,0 +1,199 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from datetime import datetime, timezone
+
+# JSON-lines event log; "-" logs to stderr, unset disables logging
+METRICS_LOG = os.getenv("METRICS_LOG")
+# Prometheus textfile (node_exporter textfile collector), rewritten by flush() and at exit
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+# Upper bounds in seconds; wide enough for both a DB round trip and a browser login
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Yields (upper bound, observations <= bound), ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """
+    Thread-safe counters and histograms keyed by metric name and labels.
+
+    Recording a value is a dict lookup and a bisect under a lock, so timers can
+    wrap per-symbol loops without measurable overhead; nothing is written out
+    until render(), write_textfile() or the HTTP endpoint asks for it.
+    """
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def inc(self, name, value=1, /, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, /, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter_value(self, name, /, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, name, /, **labels):
+        with self._lock:
+            return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def log(self, event, /, **fields):
+        """Writes one JSON line if a log is configured."""
+        if not self.log_path:
+            return
+        line = json.dumps({"ts": datetime.now(timezone.utc).isoformat(), "event": event, **fields}, default=str)
+        with self._log_lock:
+            if self.log_path == "-":
+                print(line, file=sys.stderr)
+            else:
+                with open(self.log_path, "a", encoding="utf-8") as log:
+                    log.write(line + "\n")
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(histogram.cumulative()), histogram.sum, histogram.count)
+                                for key, histogram in self._histograms.items())
+        lines = []
+        for name in sorted({key[0] for key, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{_labels(labels)} {value}" for (counter, labels), value in counters if counter == name)
+        for name in sorted({key[0] for key, _, _, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (histogram, labels), buckets, total, count in histograms:
+                if histogram != name:
+                    continue
+                for bound, cumulative in buckets:
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically replaces path with the current metrics."""
+        with open(path + ".tmp", "w", encoding="utf-8") as textfile:
+            textfile.write(self.render())
+        os.replace(path + ".tmp", path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serves /metrics over HTTP from a daemon thread; returns the server."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+        return server
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry(log_path=METRICS_LOG)
+
+
+class timer(ContextDecorator):
+    """
+    Times one stage of a job, as a with-block or as a decorator.
+
+    Records the duration in the stage_seconds histogram labelled with job,
+    stage and any extra labels (e.g. symbol), counts failures in
+    stage_errors_total, and logs a 'stage' event when a log is configured.
+    """
+
+    def __init__(self, job, stage, registry=None, **labels):
+        self.job = job
+        self.stage = stage
+        self.registry = registry or REGISTRY
+        self.labels = labels
+        self.seconds = None
+
+    def _recreate_cm(self):
+        # A fresh instance per decorated call, so concurrent calls don't share start times
+        return timer(self.job, self.stage, self.registry, **self.labels)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self._started
+        self.registry.observe("stage_seconds", self.seconds, job=self.job, stage=self.stage, **self.labels)
+        if exc_type is not None:
+            self.registry.inc("stage_errors_total", job=self.job, stage=self.stage, **self.labels)
+        self.registry.log("stage", job=self.job, stage=self.stage, seconds=round(self.seconds, 6),
+                          ok=exc_type is None, **self.labels)
+        return False
+
+
+def count(name, value=1, /, **labels):
+    """Adds to the counter `name`, e.g. count('ltp_prices_total', result='missing')."""
+    REGISTRY.inc(name, value, **labels)
+
+
+def flush():
+    """Rewrites METRICS_TEXTFILE, if set; called at exit and after each scheduled job."""
+    if METRICS_TEXTFILE:
+        try:
+            REGISTRY.write_textfile(METRICS_TEXTFILE)
+        except OSError as e:
+            print(f"Could not write metrics to {METRICS_TEXTFILE}: {e}")
+
+
+atexit.register(flush)
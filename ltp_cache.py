@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# How long a fetched price is served without refetching, in seconds
+LTP_CACHE_TTL = float(os.getenv("LTP_CACHE_TTL", "60"))
+LTP_CACHE_SIZE = int(os.getenv("LTP_CACHE_SIZE", "2048"))
+# Optional SQLite file shared by separate cron processes; unset keeps the cache in memory only
+LTP_CACHE_PATH = os.getenv("LTP_CACHE_PATH")
+
+
+class SQLiteStore:
+    """Persists symbol -> (price, fetched_at) in a local SQLite file that several processes can share."""
+
+    def __init__(self, path):
+        self.path = path
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS ltp_cache (symbol TEXT PRIMARY KEY, price REAL NOT NULL, fetched_at REAL NOT NULL)")
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get_many(self, symbols):
+        if not symbols:
+            return {}
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT symbol, price, fetched_at FROM ltp_cache WHERE symbol IN ({', '.join(['?'] * len(symbols))})", list(symbols)).fetchall()
+        finally:
+            connection.close()
+        return {symbol: (price, fetched_at) for symbol, price, fetched_at in rows}
+
+    def put_many(self, entries):
+        if not entries:
+            return
+        connection = self._connect()
+        try:
+            with connection:
+                # Never let a slower process overwrite a newer price with an older one
+                connection.executemany(
+                    "INSERT INTO ltp_cache (symbol, price, fetched_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (symbol) DO UPDATE SET price = excluded.price, fetched_at = excluded.fetched_at "
+                    "WHERE excluded.fetched_at > ltp_cache.fetched_at",
+                    [(symbol, price, fetched_at) for symbol, (price, fetched_at) in entries.items()])
+        finally:
+            connection.close()
+
+
+class LTPCache:
+    """
+    Symbol -> (price, fetched_at) cache in front of any price source.
+
+    Entries are served for `ttl` seconds, and once more than `max_entries` are
+    held the least recently used is evicted. With a `store`, entries are also
+    shared with other processes through it. Concurrent callers that ask for a
+    symbol already being fetched wait for that fetch instead of starting
+    another one. Failed lookups (None) are never cached.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, store=None, clock=time.time):
+        self.ttl = LTP_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or LTP_CACHE_SIZE
+        self.store = store
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def fetched_at(self, symbol):
+        """Returns when the cached price of symbol was fetched, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(symbol)
+        return entry[1] if entry else None
+
+    def fetch_many(self, symbols, loader):
+        """
+        Returns symbol -> price for the distinct symbols, calling loader only for the rest.
+
+        `loader` takes a list of symbols and returns a dict of symbol -> price
+        (None where it found no price), like a price source's fetch_many.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        prices, wanted = self._lookup(symbols)
+
+        leading, following = [], {}
+        with self._lock:
+            for symbol in wanted:
+                fetching = self._inflight.get(symbol)
+                if fetching is None:
+                    self._inflight[symbol] = threading.Event()
+                    leading.append(symbol)
+                else:
+                    following[symbol] = fetching
+                    self.coalesced += 1
+
+        try:
+            if leading:
+                found = loader(leading)
+                fetched_at = self.clock()
+                fetched = {symbol: (found[symbol], fetched_at) for symbol in leading if found.get(symbol) is not None}
+                self._remember(fetched)
+                if self.store is not None:
+                    self.store.put_many(fetched)
+                prices.update({symbol: found.get(symbol) for symbol in leading})
+        finally:
+            with self._lock:
+                for symbol in leading:
+                    self._inflight.pop(symbol).set()
+
+        for symbol, fetching in following.items():
+            fetching.wait()
+            with self._lock:
+                entry = self._entries.get(symbol)
+            # A failed fetch leaves the old entry behind; don't hand that out as fresh
+            prices[symbol] = entry[0] if entry and self.clock() - entry[1] < self.ttl else None
+        return {symbol: prices.get(symbol) for symbol in symbols}
+
+    def _lookup(self, symbols):
+        """Splits symbols into fresh cached prices and the symbols that still need fetching."""
+        now = self.clock()
+        prices = {}
+        expired = set()
+        wanted = []
+        with self._lock:
+            for symbol in symbols:
+                entry = self._entries.get(symbol)
+                if entry is not None and now - entry[1] < self.ttl:
+                    self._entries.move_to_end(symbol)
+                    prices[symbol] = entry[0]
+                else:
+                    if entry is not None:
+                        expired.add(symbol)
+                    wanted.append(symbol)
+
+        if wanted and self.store is not None:
+            stored = self.store.get_many(wanted)
+            shared = {symbol: entry for symbol, entry in stored.items() if now - entry[1] < self.ttl}
+            self._remember(shared)
+            prices.update({symbol: entry[0] for symbol, entry in shared.items()})
+            expired = (expired | stored.keys()) - shared.keys()
+            wanted = [symbol for symbol in wanted if symbol not in shared]
+
+        with self._lock:
+            self.hits += len(prices)
+            self.stale += len(expired)
+            self.misses += len(wanted) - len(expired)
+        return prices, wanted
+
+    def _remember(self, entries):
+        with self._lock:
+            for symbol, entry in entries.items():
+                self._entries[symbol] = entry
+                self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def report(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "coalesced": self.coalesced,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide LTP cache, persisted to LTP_CACHE_PATH when it is set."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LTPCache(store=SQLiteStore(LTP_CACHE_PATH) if LTP_CACHE_PATH else None)
+        return _cache
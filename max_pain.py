@@ -1,6 +1,10 @@
+from collections import namedtuple
+
 import numpy as np
 import pandas as pd
 
+PainCurve = namedtuple('PainCurve', ['strikes', 'call_pain', 'put_pain', 'total_pain'])
+
 def calculate_max_pain(options_chain):
     """
     Calculate the max pain point for a stock's option chain.
@@ -18,42 +22,358 @@ def calculate_max_pain(options_chain):
     strikes = np.array(options_chain['strike_prices'])
     call_oi = np.array(options_chain['call_oi'])
     put_oi = np.array(options_chain['put_oi'])
-    
-    pain_values = {}
-    
-    # Calculate pain for each potential stock price (strike price)
-    for stock_price in strikes:
-        total_pain = 0
-        
-        # Calculate call option pain
-        for idx, strike in enumerate(strikes):
-            if stock_price > strike:
-                # For calls, loss = (stock price - strike) * open interest
-                call_pain = (stock_price - strike) * call_oi[idx]
-                total_pain += call_pain
-                
-        # Calculate put option pain
-        for idx, strike in enumerate(strikes):
-            if stock_price < strike:
-                # For puts, loss = (strike - stock price) * open interest
-                put_pain = (strike - stock_price) * put_oi[idx]
-                total_pain += put_pain
-                
-        pain_values[stock_price] = total_pain
-    
-    # Find the stock price with minimum total pain
-    max_pain_price = min(pain_values.items(), key=lambda x: x[1])[0]
-    
+
+    curve = pain_curve(strikes, call_oi, put_oi)
+    if len(curve.strikes) == 0:
+        raise ValueError("options_chain has no strike prices")
+
+    # argmin keeps the first minimum in input order, same as min() over the dict
+    max_pain_price = curve.strikes[np.argmin(curve.total_pain)]
+    pain_values = dict(zip(curve.strikes, curve.total_pain))
+
     return max_pain_price, pain_values
 
-# Example usage
-example_data = {
-    'strike_prices': [95, 100, 105, 110, 115],
-    'call_oi': [500, 700, 400, 300, 200],
-    'put_oi': [200, 400, 600, 400, 300]
-}
 
-max_pain, pain_distribution = calculate_max_pain(example_data)
+def pain_curve(strikes, call_oi, put_oi, prices=None):
+    """
+    Build the pain curve of an option chain with prefix sums.
+
+    Strikes are sorted once and the call/put payoffs at every candidate
+    price are read off cumulative sums of OI and strike * OI, so the whole
+    curve costs O((n + m) log n) instead of O(n * m).
+
+    Parameters:
+    strikes (array-like): strike prices, in any order
+    call_oi (array-like): call open interest per strike
+    put_oi (array-like): put open interest per strike
+    prices (array-like, optional): candidate expiry prices; defaults to the strikes
+
+    Returns:
+    PainCurve: arrays (strikes, call_pain, put_pain, total_pain), where
+        `strikes` holds the candidate prices in the order they were given
+    """
+    strikes = np.asarray(strikes)
+    call_oi = np.asarray(call_oi)
+    put_oi = np.asarray(put_oi)
+    if not (strikes.shape == call_oi.shape == put_oi.shape) or strikes.ndim != 1:
+        raise ValueError("strikes, call_oi and put_oi must be 1-D arrays of equal length")
+    prices = strikes if prices is None else np.asarray(prices)
+
+    order = np.argsort(strikes, kind='stable')
+    sorted_strikes = strikes[order]
+    sorted_call = call_oi[order]
+    sorted_put = put_oi[order]
+
+    cum_call = _prefix_sum(sorted_call)
+    cum_call_value = _prefix_sum(sorted_strikes * sorted_call)
+    cum_put = _prefix_sum(sorted_put)
+    cum_put_value = _prefix_sum(sorted_strikes * sorted_put)
+
+    # Calls pay out on strikes strictly below the price, puts strictly above it
+    below = np.searchsorted(sorted_strikes, prices, side='left')
+    above = np.searchsorted(sorted_strikes, prices, side='right')
+
+    call_pain = prices * cum_call[below] - cum_call_value[below]
+    put_pain = (cum_put_value[-1] - cum_put_value[above]) - prices * (cum_put[-1] - cum_put[above])
+
+    return PainCurve(prices, call_pain, put_pain, call_pain + put_pain)
+
+
+def batch_max_pain(chains, keys=('index_name', 'expiry_date')):
+    """
+    Calculate max pain for many option chains in one vectorized pass.
+
+    All chains are stacked into one long array and sorted by (chain, strike);
+    each chain is then a contiguous segment, and the pain curves come from
+    global prefix sums offset by the segment boundaries, so there is no
+    Python-level loop per chain.
+
+    Parameters:
+    chains (DataFrame or dict): either a long-format DataFrame with the key
+        columns plus 'strike_price', 'call_oi' and 'put_oi', or a dict mapping
+        a key tuple such as (index_name, expiry_date) to an options_chain dict
+        as accepted by calculate_max_pain
+    keys (tuple): names of the columns identifying a chain
+
+    Returns:
+    DataFrame: one row per chain with the key columns, 'max_pain_price' and
+        'total_pain' (the pain at the max pain price)
+    DataFrame: the pain curves, one row per input strike, with the key columns,
+        'strike_price', 'call_pain', 'put_pain' and 'total_pain'
+    """
+    keys = list(keys)
+    frame = _chains_frame(chains, keys)
+    if frame.empty:
+        summary = pd.DataFrame(columns=keys + ['max_pain_price', 'total_pain'])
+        curves = pd.DataFrame(columns=keys + ['strike_price', 'call_pain', 'put_pain', 'total_pain'])
+        return summary, curves
+
+    codes = frame.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    strikes = frame['strike_price'].to_numpy()
+    call_oi = frame['call_oi'].to_numpy()
+    put_oi = frame['put_oi'].to_numpy()
+
+    # lexsort is stable, so rows with equal (chain, strike) keep their input order
+    order = np.lexsort((strikes, codes))
+    chain = codes[order]
+    sorted_strikes = strikes[order]
+    sorted_call = call_oi[order]
+    sorted_put = put_oi[order]
+    size = len(order)
+    positions = np.arange(size)
+
+    new_chain = np.r_[True, chain[1:] != chain[:-1]]
+    chain_start = np.flatnonzero(new_chain)
+    chain_end = np.r_[chain_start[1:], size]
+    row_start = np.repeat(chain_start, chain_end - chain_start)
+    row_end = np.repeat(chain_end, chain_end - chain_start)
+
+    # below: first row of this strike's run (rows before it have lower strikes);
+    # above: one past the last row of the run (rows from it have higher strikes)
+    new_strike = new_chain | np.r_[True, sorted_strikes[1:] != sorted_strikes[:-1]]
+    below = np.maximum.accumulate(np.where(new_strike, positions, 0))
+    run_end = np.r_[new_strike[1:], True]
+    above = np.minimum.accumulate(np.where(run_end, positions + 1, size)[::-1])[::-1]
+
+    cum_call = _prefix_sum(sorted_call)
+    cum_call_value = _prefix_sum(sorted_strikes * sorted_call)
+    cum_put = _prefix_sum(sorted_put)
+    cum_put_value = _prefix_sum(sorted_strikes * sorted_put)
+
+    call_pain = (sorted_strikes * (cum_call[below] - cum_call[row_start])
+                 - (cum_call_value[below] - cum_call_value[row_start]))
+    put_pain = ((cum_put_value[row_end] - cum_put_value[above])
+                - sorted_strikes * (cum_put[row_end] - cum_put[above]))
+    total_pain = call_pain + put_pain
+
+    # Break ties on the earliest input row, as calculate_max_pain does
+    chain_min = np.minimum.reduceat(total_pain, chain_start)
+    candidates = np.where(total_pain == chain_min[chain], order, len(frame))
+    best_row = np.minimum.reduceat(candidates, chain_start)
+
+    summary = frame[keys].iloc[order[chain_start]].reset_index(drop=True)
+    summary['max_pain_price'] = strikes[best_row]
+    summary['total_pain'] = chain_min
+
+    curves = frame[keys].iloc[order].reset_index(drop=True)
+    curves['strike_price'] = sorted_strikes
+    curves['call_pain'] = call_pain
+    curves['put_pain'] = put_pain
+    curves['total_pain'] = total_pain
+
+    return summary, curves
+
+
+def _chains_frame(chains, keys):
+    """Turn a dict of option chains into the long format used by batch_max_pain."""
+    if isinstance(chains, pd.DataFrame):
+        return chains
+    if not chains:
+        return pd.DataFrame(columns=keys + ['strike_price', 'call_oi', 'put_oi'])
+
+    chain_keys = list(chains.keys())
+    lengths = [len(chain['strike_prices']) for chain in chains.values()]
+    frame = pd.DataFrame({
+        'strike_price': np.concatenate([np.asarray(chain['strike_prices']) for chain in chains.values()]),
+        'call_oi': np.concatenate([np.asarray(chain['call_oi']) for chain in chains.values()]),
+        'put_oi': np.concatenate([np.asarray(chain['put_oi']) for chain in chains.values()]),
+    })
+    for position, name in enumerate(keys):
+        values = [key[position] for key in chain_keys]
+        frame[name] = np.repeat(np.array(values, dtype=object), lengths)
+    return frame
+
+
+class MaxPainBook:
+    """
+    An option chain whose pain curve is kept current as open interest moves.
+
+    A change of d contracts at strike k shifts the call pain at every price p
+    by d * max(p - k, 0) and the put pain by d * max(k - p, 0). Strikes are
+    kept sorted, so a batch of deltas is applied with prefix sums over the
+    changes alone, with no re-sort of the chain. Ties in total pain go to the
+    strike listed first, as in calculate_max_pain.
+
+    Parameters:
+    strike_prices (array-like): unique strike prices, in any order
+    call_oi (array-like): call open interest per strike
+    put_oi (array-like): put open interest per strike
+    verify (bool): after every update, recompute the curve with pain_curve
+        and raise RuntimeError if the incremental result disagrees
+    """
+
+    def __init__(self, strike_prices, call_oi, put_oi, verify=False):
+        strikes = np.asarray(strike_prices)
+        if len(np.unique(strikes)) != len(strikes):
+            raise ValueError("strike prices must be unique")
+        order = np.argsort(strikes, kind='stable')
+        self.strikes = strikes[order]
+        self.call_oi = np.array(call_oi)[order]
+        self.put_oi = np.array(put_oi)[order]
+        # Sorted position of each strike in the order it was listed, to break ties as calculate_max_pain does
+        self.listed = np.argsort(order)
+        self.verify = verify
+        self._rebuild()
+
+    @property
+    def max_pain_price(self):
+        return _first_minimum(self.strikes, self.total_pain, self.listed)
+
+    def curve(self):
+        """Return a copy of the current curve as a PainCurve, ordered by strike."""
+        return PainCurve(self.strikes.copy(), self.call_pain.copy(), self.put_pain.copy(), self.total_pain.copy())
+
+    def update(self, strike_prices, call_delta=None, put_delta=None):
+        """
+        Apply open interest changes at the given strikes.
+
+        Only the k changed strikes are sorted; their effect on the curve is a
+        step function read off prefix sums over the changes, so an update is
+        O(k log n + n) against the O(n log n) of a rebuild.
+
+        Parameters:
+        strike_prices (array-like): strikes whose OI changed; must already be in the book
+        call_delta (array-like, optional): change in call OI per strike
+        put_delta (array-like, optional): change in put OI per strike
+
+        Returns:
+        The max pain price after the update
+        """
+        self._promote(call_delta, put_delta)
+        positions = self._positions(strike_prices)
+        order = np.argsort(positions, kind='stable')
+        positions = positions[order]
+        moved = self.strikes[positions]
+        # Columns: call OI, call strike * OI, put OI, put strike * OI of each change
+        steps = np.zeros((len(positions) + 1, 4), dtype=self.total_pain.dtype)
+        for column, delta, oi in ((0, call_delta, self.call_oi), (2, put_delta, self.put_oi)):
+            if delta is None:
+                continue
+            delta = self._deltas(delta, order, oi.dtype)
+            np.add.at(oi, positions, delta)
+            steps[1:, column] = delta
+            steps[1:, column + 1] = moved * delta
+        # Row r sums the first r changes; puts count the changes above instead
+        np.cumsum(steps, axis=0, out=steps)
+        steps[:, 2:] -= steps[-1, 2:]
+        # The sums hold over the run of strikes between consecutive changes
+        edges = np.empty(len(positions) + 2, dtype=np.intp)
+        edges[0], edges[-1] = 0, len(self.strikes)
+        edges[1:-1] = positions + 1
+        steps = steps.repeat(edges[1:] - edges[:-1], axis=0)
+        change = self.strikes[:, None] * steps[:, 0::2] - steps[:, 1::2]
+        self.call_pain += change[:, 0]
+        self.put_pain += change[:, 1]
+        np.add(self.call_pain, self.put_pain, out=self.total_pain)
+
+        if self.verify:
+            self.check()
+        return self.max_pain_price
+
+    def apply_snapshot(self, strike_prices, call_oi, put_oi):
+        """
+        Bring the book to a freshly polled chain, touching only strikes whose OI moved.
+
+        A snapshot with a different set of strikes replaces the book's strikes
+        and rebuilds the curve.
+
+        Returns:
+        The max pain price after the update
+        """
+        strikes = np.asarray(strike_prices)
+        order = np.argsort(strikes, kind='stable')
+        strikes = strikes[order]
+        call_oi = np.asarray(call_oi)[order]
+        put_oi = np.asarray(put_oi)[order]
+        # The snapshot's listing order decides ties from now on
+        self.listed = np.argsort(order)
+        if not np.array_equal(strikes, self.strikes):
+            if len(np.unique(strikes)) != len(strikes):
+                raise ValueError("strike prices must be unique")
+            self.strikes = strikes
+            self.call_oi = call_oi.copy()
+            self.put_oi = put_oi.copy()
+            self._rebuild()
+            return self.max_pain_price
+
+        call_delta = call_oi - self.call_oi
+        put_delta = put_oi - self.put_oi
+        moved = np.flatnonzero((call_delta != 0) | (put_delta != 0))
+        if len(moved) == 0:
+            return self.max_pain_price
+        return self.update(strikes[moved], call_delta[moved], put_delta[moved])
+
+    def check(self):
+        """Recompute the curve from scratch and raise RuntimeError if the book has drifted."""
+        expected = pain_curve(self.strikes, self.call_oi, self.put_oi)
+        for name in ('call_pain', 'put_pain', 'total_pain'):
+            actual = getattr(self, name)
+            wanted = getattr(expected, name)
+            if np.issubdtype(actual.dtype, np.integer):
+                matches = np.array_equal(actual, wanted)
+            else:
+                matches = np.allclose(actual, wanted)
+            if not matches:
+                raise RuntimeError(f"MaxPainBook {name} diverged from a full recompute")
+        expected_price = _first_minimum(self.strikes, expected.total_pain, self.listed)
+        if expected_price != self.max_pain_price:
+            raise RuntimeError(
+                f"MaxPainBook max pain {self.max_pain_price} differs from full recompute {expected_price}")
+
+    def _positions(self, strike_prices):
+        strike_prices = np.atleast_1d(np.asarray(strike_prices))
+        positions = self.strikes.searchsorted(strike_prices)
+        # A strike past the top clips to the last one, which then fails to match
+        unknown = self.strikes.take(positions, mode='clip') != strike_prices
+        if unknown.any():
+            raise ValueError(f"strikes not in the book: {strike_prices[unknown].tolist()}")
+        return positions
+
+    def _promote(self, *deltas):
+        """Widen the book's arrays to hold the deltas exactly, e.g. to float for fractional OI on an integer book."""
+        dtype = np.result_type(self.call_oi, self.put_oi, *[np.asarray(delta) for delta in deltas if delta is not None])
+        if self.call_oi.dtype != dtype or self.put_oi.dtype != dtype:
+            self.call_oi = self.call_oi.astype(dtype)
+            self.put_oi = self.put_oi.astype(dtype)
+        pain_dtype = np.result_type(self.total_pain, self.strikes, dtype)
+        if self.total_pain.dtype != pain_dtype:
+            self.call_pain = self.call_pain.astype(pain_dtype)
+            self.put_pain = self.put_pain.astype(pain_dtype)
+            self.total_pain = self.total_pain.astype(pain_dtype)
+
+    @staticmethod
+    def _deltas(delta, order, dtype):
+        delta = np.asarray(delta, dtype=dtype)
+        return delta[order] if delta.ndim else np.full(order.shape, delta)
+
+    def _rebuild(self):
+        curve = pain_curve(self.strikes, self.call_oi, self.put_oi)
+        self.call_pain = curve.call_pain.copy()
+        self.put_pain = curve.put_pain.copy()
+        self.total_pain = curve.total_pain.copy()
+
+
+def _first_minimum(strikes, total_pain, listed):
+    """The strike of least total pain; among equal minima, the one listed first."""
+    return strikes[listed[np.argmin(total_pain[listed])]]
+
+
+def _prefix_sum(values):
+    """Cumulative sum with a leading zero, so prefix[i] sums the first i values."""
+    prefix = np.zeros(len(values) + 1, dtype=values.dtype)
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+if __name__ == "__main__":
+    # Example usage
+    example_data = {
+        'strike_prices': [95, 100, 105, 110, 115],
+        'call_oi': [500, 700, 400, 300, 200],
+        'put_oi': [200, 400, 600, 400, 300]
+    }
+
+    max_pain, pain_distribution = calculate_max_pain(example_data)
 
-print(max_pain)
-print(pain_distribution)
\ No newline at end of file
+    print(max_pain)
+    print(pain_distribution)
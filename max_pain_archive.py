@@ -0,0 +1,183 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+import db
+from parsers import parse_expiry
+
+ARCHIVE_DIR = os.getenv("MAX_PAIN_ARCHIVE", "archive/max_pain")
+WATERMARK_FILE = "_watermark.json"
+
+SCHEMA = pa.schema([
+    ("record_time", pa.timestamp("us")),
+    ("index_name", pa.dictionary(pa.int32(), pa.string())),
+    ("expiry_date", pa.date32()),
+    ("max_pain_price", pa.float64()),
+    ("index_price_close", pa.float64()),
+    ("max_pain_trend", pa.string()),
+    ("max_pain", pa.string()),
+])
+SOURCE_COLUMNS = ["record_time", "index_name", "expiry_date", "max_pain_price", "index_price_close", "max_pain_trend", "max_pain"]
+
+
+def parse_price(values):
+    """Turns scraped price text such as '24,500' or '₹ 1,234.5' into floats (NaN when unparseable)."""
+    text = pd.Series(values, dtype="object").astype(str).str.replace(r"[^0-9.\-]", "", regex=True)
+    return pd.to_numeric(text, errors="coerce").astype("float64")
+
+
+def to_typed_frame(rows):
+    """Converts raw max_pain_data rows to the archive's typed columns."""
+    frame = pd.DataFrame(rows, columns=SOURCE_COLUMNS)
+    typed = pd.DataFrame({
+        "record_time": pd.to_datetime(frame["record_time"]),
+        "index_name": frame["index_name"].astype("category"),
+        "expiry_date": parse_expiry(frame["expiry_date"], frame["record_time"]),
+        "max_pain_price": parse_price(frame["max_pain_price"]),
+        "index_price_close": parse_price(frame["index_price_close"]),
+        "max_pain_trend": frame["max_pain_trend"].astype("object"),
+        "max_pain": frame["max_pain"].astype("object"),
+    })
+    return typed
+
+
+def read_watermark(root=None):
+    """Returns the newest record_time already archived, or None for an empty archive."""
+    path = os.path.join(root or ARCHIVE_DIR, WATERMARK_FILE)
+    try:
+        with open(path, encoding="utf-8") as watermark:
+            return datetime.fromisoformat(json.load(watermark)["record_time"])
+    except FileNotFoundError:
+        return None
+
+
+def _write_watermark(root, record_time):
+    path = os.path.join(root, WATERMARK_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as watermark:
+        json.dump({"record_time": record_time.isoformat()}, watermark)
+    os.replace(path + ".tmp", path)
+
+
+def export_max_pain(root=None):
+    """
+    Appends max_pain_data rows newer than the archive's watermark as Parquet files.
+
+    Rows are exported one record date at a time into hive-style
+    `record_date=YYYY-MM-DD/` partitions; each run adds new files and never
+    rewrites old ones. The watermark only moves after a day is fully on disk,
+    so an interrupted export is simply resumed by the next run.
+    Returns the number of rows exported.
+    """
+    root = root or ARCHIVE_DIR
+    os.makedirs(root, exist_ok=True)
+    watermark = read_watermark(root)
+
+    conditions = ["record_time <= %s"]
+    with db.transaction() as cursor:
+        cursor.execute("SELECT MAX(record_time) FROM max_pain_data")
+        upper = cursor.fetchone()[0]
+        if upper is None:
+            return 0
+        params = [upper]
+        if watermark is not None:
+            conditions.append("record_time > %s")
+            params.append(watermark)
+        cursor.execute(f"SELECT DISTINCT DATE(record_time) FROM max_pain_data WHERE {' AND '.join(conditions)}", params)
+        days = sorted(pd.Timestamp(str(row[0])).to_pydatetime() for row in cursor.fetchall())
+
+    exported = 0
+    for day in days:
+        with db.transaction() as cursor:
+            cursor.execute(f"SELECT {', '.join(SOURCE_COLUMNS)} FROM max_pain_data "
+                           f"WHERE record_time >= %s AND record_time < %s AND {' AND '.join(conditions)}",
+                           [day, day + timedelta(days=1)] + params)
+            rows = cursor.fetchall()
+        if not rows:
+            continue
+        frame = to_typed_frame(rows)
+        newest = frame["record_time"].max().to_pydatetime()
+        partition = os.path.join(root, f"record_date={day.date().isoformat()}")
+        os.makedirs(partition, exist_ok=True)
+        name = f"part-{newest.strftime('%Y%m%dT%H%M%S%f')}.parquet"
+        # Dot-prefixed while being written, so readers never pick up a partial file
+        temporary = os.path.join(partition, "." + name)
+        pq.write_table(pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False), temporary)
+        os.replace(temporary, os.path.join(partition, name))
+        _write_watermark(root, newest)
+        exported += len(rows)
+    return exported
+
+
+def read_archive(columns=None, index_name=None, start=None, end=None, root=None, expiry_date=None, limit=None):
+    """
+    Reads archived snapshots into a DataFrame through memory-mapped Parquet files.
+
+    Filters are pushed down: start/end (naive UTC datetimes, end exclusive)
+    prune whole date partitions before any file is opened, and index_name and
+    expiry_date (a date or 'YYYY-MM-DD') are checked against row-group
+    statistics. With `limit`, only the `limit` newest rows are returned,
+    newest first, and partitions are read newest first until that many rows
+    are in hand. Returns an empty frame if nothing has been archived.
+    """
+    root = root or ARCHIVE_DIR
+    columns = list(columns) if columns else SCHEMA.names
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns)
+    dataset = ds.dataset(root, format="parquet", schema=SCHEMA.append(pa.field("record_date", pa.string())),
+                         partitioning="hive", filesystem=pafs.LocalFileSystem(use_mmap=True))
+    condition = None
+    for clause in _filters(index_name, expiry_date, start, end):
+        condition = clause if condition is None else condition & clause
+    if limit is None:
+        return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+    read = columns if "record_time" in columns else columns + ["record_time"]
+    tables = []
+    found = 0
+    for day in _partition_days(root, start, end):
+        day_filter = ds.field("record_date") == day
+        table = dataset.to_table(columns=read, filter=day_filter if condition is None else condition & day_filter)
+        if table.num_rows:
+            tables.append(table)
+            found += table.num_rows
+        if found >= limit:
+            break
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    table = pa.concat_tables(tables)
+    newest = pc.sort_indices(table, sort_keys=[("record_time", "descending")])[:limit]
+    return table.take(newest).select(columns).to_pandas()
+
+
+def _partition_days(root, start, end):
+    """The record dates partitioned under root within [start, end], newest first."""
+    first = pd.Timestamp(start).date().isoformat() if start is not None else None
+    last = pd.Timestamp(end).date().isoformat() if end is not None else None
+    days = [name.split("=", 1)[1] for name in os.listdir(root) if name.startswith("record_date=")]
+    return sorted((day for day in days if (first is None or day >= first) and (last is None or day <= last)), reverse=True)
+
+
+def _filters(index_name, expiry_date, start, end):
+    if index_name:
+        yield ds.field("index_name") == index_name
+    if expiry_date:
+        yield ds.field("expiry_date") == pa.scalar(pd.Timestamp(expiry_date).date(), pa.date32())
+    if start is not None:
+        yield ds.field("record_date") >= pd.Timestamp(start).date().isoformat()
+        yield ds.field("record_time") >= pa.scalar(pd.Timestamp(start).to_pydatetime(), pa.timestamp("us"))
+    if end is not None:
+        yield ds.field("record_date") <= pd.Timestamp(end).date().isoformat()
+        yield ds.field("record_time") < pa.scalar(pd.Timestamp(end).to_pydatetime(), pa.timestamp("us"))
+
+
+if __name__ == "__main__":
+    print("started : ", datetime.now())
+    print("exported rows : ", export_max_pain())
+    print("ended : ", datetime.now())
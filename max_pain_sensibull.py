@@ -1,107 +1,171 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.firefox import GeckoDriverManager
 import time
-import mysql.connector
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
+import pandas as pd
+import db
+from driver_pool import DriverPool, get_pool
+from parsers import parse_expiry
+from instrumentation import timer
 
 # Load environment variables from .env file
 load_dotenv()
 
-def max_pain(index):
+def max_pain(index, pool=None):
 
-	# Set up Firefox options
-	firefox_options = Options()
-	firefox_options.add_argument("--headless")  # Run in headless mode
-	firefox_options.add_argument("--no-sandbox")
-	firefox_options.add_argument("--disable-dev-shm-usage")
+	# Borrow a warm browser from the shared pool instead of starting Firefox per index
+	pool = pool or get_pool()
+	with timer("max_pain", "total", index=index), pool.driver() as driver:
+		scrape_max_pain(driver, index)
 
-	# Set up the WebDriver
-	geckodriver_path = "/snap/bin/geckodriver"  # Manually specify the path to geckodriver
-	service = Service(geckodriver_path)
-	driver = webdriver.Firefox(service=service, options=firefox_options)
+EXPIRY_BUTTONS = "//div[@dir='ltr']/descendant::button"
+
+def expiry_active(driver, expiry):
+	from selenium.webdriver.common.by import By
+
+	# Looked up afresh: the page may re-render the tabs after a click
+	return any(button.get_attribute("data-state") == "active" and button.text == expiry for button in driver.find_elements(By.XPATH, EXPIRY_BUTTONS))
+
+def scrape_max_pain(driver, index):
+	from selenium.common.exceptions import TimeoutException
+	from selenium.webdriver.common.by import By
+	from selenium.webdriver.support.ui import WebDriverWait
+	from selenium.webdriver.support import expected_conditions as EC
 
 	# Navigate to the Sensibull website
 	url = "https://web.sensibull.com/futures-options-data?tradingsymbol="+index
-	driver.get(url)
+	with timer("max_pain", "page_load", index=index):
+		driver.get(url)
 
 	# Example: Locate and extract data (modify selectors as needed)
 	# Assuming we want to extract some data from the homepage
 	try:
 		# Wait for the element to be present
 		wait = WebDriverWait(driver, 10)
-		instrument_ltp_element = wait.until(EC.presence_of_all_elements_located((By.XPATH, "//span[@class='instrument-ltp']")))
-		if(instrument_ltp_element[0].text.strip() == "--"):
-			time.sleep(2)
-		instrument_ltp = instrument_ltp_element[0].text.strip()
-		elements = wait.until(EC.presence_of_all_elements_located((By.XPATH, "//div[@dir='ltr']/descendant::button")))
+		with timer("max_pain", "element_wait", index=index):
+			instrument_ltp_element = wait.until(EC.presence_of_all_elements_located((By.XPATH, "//span[@class='instrument-ltp']")))
+			# The LTP shows "--" until the quote arrives; wait up to 2s for it rather than always sleeping
+			try:
+				WebDriverWait(driver, 2).until(lambda _: instrument_ltp_element[0].text.strip() != "--")
+			except TimeoutException:
+				pass
+			instrument_ltp = instrument_ltp_element[0].text.strip()
+			elements = wait.until(EC.presence_of_all_elements_located((By.XPATH, EXPIRY_BUTTONS)))
 		# iterate on each date button and if data-state="active" then fetch the max pain data else click on the button and then fetch the max pain data"
 		for element in elements:
 			if element.get_attribute("data-state") == "active":
 				expiryDate = element.text
 				print("Extracted Date:", expiryDate)
-				element = wait.until(EC.presence_of_element_located((By.XPATH, "//p[text()='Max pain']/following-sibling::*")))
+				with timer("max_pain", "max_pain_wait", index=index):
+					element = wait.until(EC.presence_of_element_located((By.XPATH, "//p[text()='Max pain']/following-sibling::*")))
 				data = element.text
 				print("Extracted Data:", data)
 				insert_data(expiryDate, data, index,instrument_ltp)
 			else:
-				element.click()
-				time.sleep(2)
 				expiryDate = element.text
+				element.click()
+				# Wait up to 2s for the clicked expiry to become the active tab
+				try:
+					WebDriverWait(driver, 2).until(lambda d: expiry_active(d, expiryDate))
+				except TimeoutException:
+					pass
 				print("Extracted Date:", expiryDate)
-				element = wait.until(EC.presence_of_element_located((By.XPATH, "//p[text()='Max pain']/following-sibling::*")))
+				with timer("max_pain", "max_pain_wait", index=index):
+					element = wait.until(EC.presence_of_element_located((By.XPATH, "//p[text()='Max pain']/following-sibling::*")))
 				data = element.text
 				print("Extracted Data:", data)
 				insert_data(expiryDate, data, index,instrument_ltp)
 	except Exception as e:
 		print("An error occurred:", e)
 
-	# Close the WebDriver
-	driver.quit()
+# The viewer filters on index and expiry and pages newest first; MAX(record_time) is read from the second index
+MAX_PAIN_INDEXES = {
+	"idx_max_pain_index_expiry_time": ("index_name", "expiry_date", "record_time"),
+	"idx_max_pain_record_time": ("record_time", "index_name", "expiry_date"),
+}
+
+def create_indexes(cursor):
+
+	# Idempotent, so it runs at the start of every scrape; DDL commits implicitly on MySQL, so keep it out of write transactions
+	for name, columns in MAX_PAIN_INDEXES.items():
+		db.create_index(cursor, "max_pain_data", name, columns)
 
 def insert_data(expiry_date, max_pain,index,instrument_ltp):
 	try:
-		# Convert expiry_date to DATE format
-		#expiry_date = datetime.strptime(expiry_date, '%d-%b-%Y').date()
+		# Store the tab's '30 Jan' as an ISO date, the format option chain captures use
+		expiry = parse_expiry([expiry_date], [datetime.now()])[0]
+		if not pd.isna(expiry):
+			expiry_date = expiry.isoformat()
 		
-		connection = mysql.connector.connect(
-			host=os.getenv('DB_HOST'),
-			port=os.getenv('DB_PORT'),
-			user=os.getenv('DB_USER'),
-			password=os.getenv('DB_PASSWORD'),
-			database=os.getenv('DB_NAME')
-		)
 		max_pain_price = max_pain.split("\n")[0].strip()
 		max_pain_trend = max_pain.split("\n")[1].strip()
 		index_price_close = instrument_ltp.strip()
-		cursor = connection.cursor()
-		query = "INSERT INTO max_pain_data (expiry_date, max_pain, index_name, index_price_close, max_pain_trend, max_pain_price) VALUES (%s, %s,%s,%s, %s,%s)"
-		cursor.execute(query, (expiry_date, max_pain, index,index_price_close, max_pain_trend, max_pain_price))
-		connection.commit()
-		cursor.close()
-		connection.close()
-	except mysql.connector.Error as err:
+		with timer("max_pain", "db_write", index=index), db.transaction() as cursor:
+			query = "INSERT INTO max_pain_data (expiry_date, max_pain, index_name, index_price_close, max_pain_trend, max_pain_price) VALUES (%s, %s,%s,%s, %s,%s)"
+			cursor.execute(query, (expiry_date, max_pain, index,index_price_close, max_pain_trend, max_pain_price))
+	except db.Error as err:
+		print("Error: {}".format(err))
+
+def backfill_expiries(batch_size=500):
+
+	# One-off migration: rows scraped before expiries were stored as ISO dates hold Sensibull's '30 Jan'.
+	# Each is dated from its own record day, as the archive does, so one expiry has one spelling in max_pain_data.
+	# Converted rows no longer match, so an interrupted run is resumed by running it again. Returns the rows updated.
+	with db.transaction() as cursor:
+		cursor.execute("SELECT DISTINCT expiry_date, DATE(record_time) FROM max_pain_data WHERE expiry_date NOT LIKE %s", ("____-__-__",))
+		pairs = [(text, pd.Timestamp(str(day)).to_pydatetime()) for text, day in cursor.fetchall() if text is not None and day is not None]
+	if not pairs:
+		return 0
+	expiries = parse_expiry([text for text, _ in pairs], [day for _, day in pairs])
+	updates = [(expiry.isoformat(), text, day, day + timedelta(days=1)) for (text, day), expiry in zip(pairs, expiries) if not pd.isna(expiry)]
+	skipped = len(pairs) - len(updates)
+	if skipped:
+		print(f"Left {skipped} unparseable expiry labels as they are")
+	updated = 0
+	for start in range(0, len(updates), batch_size):
+		with db.transaction() as cursor:
+			for params in updates[start:start + batch_size]:
+				cursor.execute("UPDATE max_pain_data SET expiry_date = %s WHERE expiry_date = %s AND record_time >= %s AND record_time < %s", params)
+				updated += cursor.rowcount
+	return updated
+
+def max_pain_chain(index, pool=None, session=None):
+
+	# One page load for every expiry's option chain, with max pain computed locally,
+	# instead of a browser click per expiry
+	import option_chain
+	pool = pool or get_pool()
+	try:
+		with timer("max_pain", "total", index=index), pool.driver() as driver:
+			option_chain.capture(index, driver, session)
+	except Exception as e:
+		print("An error occurred:", e)
+
+INDICES = ["NIFTY", "BANKNIFTY", "SENSEX", "FINNIFTY", "MIDCPNIFTY"]
+# "browser" scrapes the rendered Max pain text; "chain" captures the full option chain
+MAX_PAIN_MODE = os.getenv("MAX_PAIN_MODE", "browser")
+
+def run_index(index, pool, mode=None):
+	print("started : ", index, time.ctime())
+	if (mode or MAX_PAIN_MODE) == "chain":
+		max_pain_chain(index, pool)
+	else:
+		max_pain(index, pool)
+	print("ended : ", index, time.ctime())
+
+def run_all(pool=None, mode=None):
+	# One pool for the whole run: browsers stay warm across indices and at most
+	# DRIVER_POOL_SIZE indices are scraped at the same time
+	pool = pool or get_pool()
+	try:
+		with db.transaction() as cursor:
+			create_indexes(cursor)
+	except db.Error as err:
 		print("Error: {}".format(err))
+	with ThreadPoolExecutor(max_workers=pool.size) as executor:
+		list(executor.map(lambda index: run_index(index, pool, mode), INDICES))
 
 if __name__ == "__main__":
-	print("started : ", time.ctime())
-	max_pain("NIFTY")
-	print("ended : ", time.ctime())
-	print("started : ", time.ctime())
-	max_pain("BANKNIFTY")
-	print("ended : ", time.ctime())
-	print("started : ", time.ctime())
-	max_pain("SENSEX")
-	print("ended : ", time.ctime())
-	print("started : ", time.ctime())
-	max_pain("FINNIFTY")
-	print("ended : ", time.ctime())
-	print("started : ", time.ctime())
-	max_pain("MIDCPNIFTY")
-	print("ended : ", time.ctime())
\ No newline at end of file
+	with DriverPool() as pool:
+		run_all(pool)
@@ -1,26 +1,20 @@
 from datetime import datetime
 import json
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.firefox import GeckoDriverManager
-import time
-import mysql.connector
 from dotenv import load_dotenv
 import os
+import db
 import re
-import platform
-from webdriver_manager.chrome import ChromeDriverManager
 import requests
+from driver_pool import get_pool
+from notifier import get_notifier
+from instrumentation import count, timer
+from replay import wrap_session
 # Load environment variables from .env file
 load_dotenv()
 
 def extract_stock_data_api(url):
-    # Make the GET request
-    response = requests.get(url)
+    # Make the GET request (served from fixtures when SCRAPE_MODE=replay)
+    response = wrap_session(requests).get(url)
 
     # Check if the request was successful
     if response.status_code == 200:
@@ -34,14 +28,28 @@ def extract_stock_data_api(url):
         return ""
 
 
-def extract_stock_data(driver):
-    """Extracts stock details from each card on the technical picks page."""
+def extract_stock_data(driver, mode="page_source"):
+    """
+    Extracts stock details from each card on the technical picks page.
+
+    In "page_source" mode the rendered page is read once and parsed in-process
+    by parsers.parse_technical_picks; "elements" mode reads every field with
+    its own WebDriver call, as before.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     try:
         # Wait for the elements to be present
         wait = WebDriverWait(driver, 10)
         cards = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".technical-picks-card")))
+        print("Extracting stock data from cards :: " +str(len(cards)))
+        if mode == "page_source":
+            from parsers import parse_technical_picks
+            return parse_technical_picks(driver.page_source)
+
         stock_data = []
-        print("Extracting stock data from cards :: " +str(cards.count()))
         
         for card in cards:
             # Extract stock name and other relevant details
@@ -89,231 +97,307 @@ def extract_stock_data(driver):
 
 
 
-def login_and_extract_data(username, password,apiUrl):
-    """Logs in to Moneycontrol and extracts stock data."""
+LOGIN_URL = "https://accounts.moneycontrol.com/mclogin/?v=2&d=2&cpurl=https://www.moneycontrol.com/"
+
+
+def browser_login(driver, username, password):
+    """Runs the Moneycontrol password login in `driver`; returns False if the login form could not be used."""
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    # Navigate to the Moneycontrol login page
+    driver.get(LOGIN_URL)
     try:
-        if platform.system() == "Windows":
-            # Use Chrome on Windows
-            driver = webdriver.Chrome(service=webdriver.ChromeService(ChromeDriverManager().install()))
-            print("Using Chrome on Windows")
-        elif platform.system() == "Linux":
-            # Use Firefox on Linux (Ubuntu)
-            firefox_options = webdriver.FirefoxOptions()
-            firefox_options.add_argument("--headless")
-            firefox_options.add_argument("--no-sandbox")
-            firefox_options.add_argument("--disable-dev-shm-usage")
-            geckodriver_path = "/snap/bin/geckodriver"
-            service = Service(geckodriver_path)
-            driver = webdriver.Firefox(service=service, options=firefox_options)
-            print("Using Firefox on Linux")
-        else:
-            print("Unsupported operating system.")
-            return False
-
-        # Navigate to the Moneycontrol login page
-        driver.get("https://accounts.moneycontrol.com/mclogin/?v=2&d=2&cpurl=https://www.moneycontrol.com/")
-        driver.maximize_window()
-        try:
-            # Attempt to find the "moneycontrol.com" link and click it if present.  This is a more robust check than just looking for the login button.
-            moneycontrol_link = driver.find_elements(By.XPATH, "//a[@href='https://www.moneycontrol.com' and contains(text(), 'moneycontrol.com')]")
-            if moneycontrol_link:
-                moneycontrol_link[0].click()
-        except Exception as e:
-            print(f"Error clicking moneycontrol link: {e}")
-            pass  # Proceed to the next step if the link is not found.
+        # Attempt to find the "moneycontrol.com" link and click it if present.  This is a more robust check than just looking for the login button.
+        moneycontrol_link = driver.find_elements(By.XPATH, "//a[@href='https://www.moneycontrol.com' and contains(text(), 'moneycontrol.com')]")
+        if moneycontrol_link:
+            moneycontrol_link[0].click()
+    except Exception as e:
+        print(f"Error clicking moneycontrol link: {e}")
+        pass  # Proceed to the next step if the link is not found.
 
 
-        wait = WebDriverWait(driver, 10)
-        #login_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//div[@class='user_before_login blp']/a[@class='userlink']")))
-        #login_button.click()
-        # try:
-        #     login_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "a.btn_signin.linkSignIn")))
-        #     login_button.click()
-        # except Exception as e:
-        #     print(f"Error clicking login button: {e}")
-        #     return False
+    wait = WebDriverWait(driver, 10)
+    #login_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//div[@class='user_before_login blp']/a[@class='userlink']")))
+    #login_button.click()
+    # try:
+    #     login_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "a.btn_signin.linkSignIn")))
+    #     login_button.click()
+    # except Exception as e:
+    #     print(f"Error clicking login button: {e}")
+    #     return False
+    try:
+        #driver.switch_to.frame(driver.find_element(By.ID, "myframe"))
+        # Wait for what each step needs instead of sleeping a fixed time
+        login_option = wait.until(lambda d: _at_least(d.find_elements(By.XPATH, "//div[@class='loginwithTab']/descendant::li[text()='Login with Password']"), 2))
+        login_option[1].click()
+        username_field = wait.until(lambda d: _at_least(d.find_elements(By.NAME, "email"), 2))
+        password_field = wait.until(lambda d: _at_least(d.find_elements(By.NAME, "pwd"), 2))
+        username_field[1].send_keys(username)
+        password_field[1].send_keys(password)
+        login_button = driver.find_elements(By.CSS_SELECTOR, "button.continue.login_verify_btn")
+        login_button[0].click()
         try:
-            #driver.switch_to.frame(driver.find_element(By.ID, "myframe"))
-            time.sleep(2)
-            login_option = driver.find_elements(By.XPATH, "//div[@class='loginwithTab']/descendant::li[text()='Login with Password']")
-            login_option[1].click()
-            time.sleep(2)
-            username_field = driver.find_elements(By.NAME, "email")
-            password_field = driver.find_elements(By.NAME, "pwd")
-            username_field[1].send_keys(username)
-            password_field[1].send_keys(password)
-            login_button = driver.find_elements(By.CSS_SELECTOR, "button.continue.login_verify_btn")
-            login_button[0].click()
-            time.sleep(5)
-        except Exception as e:
-            print(f"Error locating elements in login frame: {e}")
-            return False
-        # Wait for the technical picks page to load
-        driver.get(apiUrl)
-        json_response = driver.find_element(By.TAG_NAME, 'body').text
-        driver.quit()
+            # Logged in once the login form is gone; as before, carry on after 5s regardless
+            WebDriverWait(driver, 5).until(lambda d: not d.find_elements(By.CSS_SELECTOR, "button.continue.login_verify_btn"))
+        except TimeoutException:
+            pass
+    except Exception as e:
+        print(f"Error locating elements in login frame: {e}")
+        return False
+    return True
+
+
+def login_and_extract_data(username, password,apiUrl,pool=None):
+    """Logs in to Moneycontrol in a browser and extracts stock data through it."""
+    from selenium.webdriver.common.by import By
+
+    pool = pool or get_pool()
+    try:
+        with pool.driver() as driver:
+            with timer("recos", "login"):
+                if not browser_login(driver, username, password):
+                    return False
+            # Wait for the technical picks page to load
+            with timer("recos", "api_fetch"):
+                driver.get(apiUrl)
+                json_response = driver.find_element(By.TAG_NAME, 'body').text
         # Parse the json into stockdata
-        jsonData = json.loads(json_response)
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            port=int(os.getenv('DB_PORT')),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_NAME')
-        )
-        cursor = connection.cursor()
-        # Create table if it doesn't exist
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS recommendations (
-            id INT PRIMARY KEY,
-            asset_class VARCHAR(255),
-            instrument_type VARCHAR(255),
-            instrument VARCHAR(255),
-            reco_type VARCHAR(255),
-            option_category VARCHAR(255),
-            meta_data TEXT,
-            reco_end_date DATETIME,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            created_at DATETIME,
-            user_name VARCHAR(255),
-            call_status VARCHAR(255),
-            cmp VARCHAR(255),
-            entry_condition VARCHAR(255),
-            entry_price FLOAT,
-            target_condition VARCHAR(255),
-            target_price_1 FLOAT,
-            stoploss_price FLOAT,
-            target_return FLOAT,
-            stoploss_condition VARCHAR(255),
-            rationale TEXT,
-            closed_on_dt DATETIME
-        )
-        ''')
-        # Create portfolio table if it doesn't exist
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS portfolio (
-            id INT PRIMARY KEY AUTO_INCREMENT,
-            instrument VARCHAR(255),
-            entry_price FLOAT,
-            entry_date DATETIME,
-            quantity INT,
-            recommendation_id INT,
-            buy_sell VARCHAR(255),
-            FOREIGN KEY (recommendation_id) REFERENCES recommendations(id),
-            current_price FLOAT,
-            realized_profit FLOAT,
-            exit_price FLOAT,
-            exit_date DATETIME
-        )
-        ''')
-        
-        for item in jsonData['list']['data']:
-            if item['instrument_type'] == 'cash' and item['asset_class'] == 'equity':
-                insert_stock_data_to_db(item,cursor)
-                connection.commit()
+        with timer("recos", "parse"):
+            jsonData = json.loads(json_response)
+        ingest_payload(jsonData)
         #stock_data = extract_stock_data(driver)
-        connection.close
         return True
 
     except Exception as e:
         print(f"An error occurred: {e}")
-        if driver:
-            driver.quit()
         return False
 
 
-def insert_stock_data_to_db(stock_data,cursor):
-    # Insert data if ID does not exist
+def api_extract_data(username, password, apiUrl, pool=None, client=None):
+    """
+    Extracts stock data over plain HTTP with the saved Moneycontrol cookies.
+
+    The browser is only started to log in again when the API refuses the
+    cookies (see moneycontrol_session), so a typical run is one request.
+    """
+    from moneycontrol_session import get_client
+
     try:
-        try:
-            stock_data['reco_end_date'] = datetime.fromisoformat(stock_data['reco_end_date'].replace('Z', '+00:00'))
-        except ValueError as e:
-            print(f"Error parsing reco_end_date: {e}, stock_data: {stock_data}")
-            stock_data['reco_end_date'] = None  # Handle invalid format
+        client = client or get_client(username, password, pool)
+        ingest_payload(client.get_json(apiUrl))
+        return True
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return False
 
-        try:
-            stock_data['created_at'] = datetime.fromisoformat(stock_data['created_at'])
-        except ValueError as e:
-            print(f"Error parsing created_at: {e}, stock_data: {stock_data}")
-            stock_data['created_at'] = None
 
-        stock_data['closed_on_dt'] = str(datetime.now())
-        try:
-            stock_data['closed_on_dt'] = datetime.fromisoformat(stock_data['closed_on_dt']) if stock_data['closed_on_dt'] is not None else None
-        except ValueError as e:
-            print(f"Error parsing closed_on_dt: {e}, stock_data: {stock_data}")
-            stock_data['closed_on_dt'] = None
-        cursor.execute('''SELECT id, call_status FROM recommendations WHERE id = %s''', (stock_data['id'],))
-        result = cursor.fetchone()
-        if result:
-            existing_id = result[0]
-            existing_call_status = result[1]
-            if existing_call_status != stock_data['call_status']:
-                # Update the recommendation table
-                cursor.execute('''UPDATE recommendations SET call_status = %s WHERE id = %s''', (stock_data['call_status'], stock_data['id']))
-                # Update the portfolio table (assuming selling)
-                cursor.execute('''SELECT id FROM portfolio WHERE recommendation_id = %s''', (stock_data['id'],))
-                portfolio_id_result = cursor.fetchone()
-                if portfolio_id_result:
-                    cursor.execute('''UPDATE portfolio SET exit_price = %s, exit_date = NOW(), realized_profit = (quantity * (%s - (SELECT entry_price FROM portfolio WHERE recommendation_id = %s))) WHERE recommendation_id = %s''', (stock_data['cmp'], stock_data['cmp'], stock_data['id'], stock_data['id']))
-            
-            
-        else:
-            cursor.execute('''
-            INSERT INTO recommendations (id, asset_class, instrument_type, instrument, reco_type, option_category, meta_data, reco_end_date, created_at, user_name, call_status, cmp, entry_condition, entry_price, target_condition, target_price_1, stoploss_price, target_return, stoploss_condition, rationale, closed_on_dt)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (stock_data['id'], stock_data['asset_class'], stock_data['instrument_type'], stock_data['instrument'], stock_data['reco_type'], stock_data['option_category'], stock_data['meta_data'], 
-            stock_data['reco_end_date'], stock_data['created_at'], stock_data['user_name'], stock_data['call_status'], stock_data['cmp'], stock_data['entry_condition'], 
-            stock_data['entry_price'], stock_data['target_condition'], stock_data['target_price_1'], stock_data['stoploss_price'], stock_data['target_return'], stock_data['stoploss_condition'], 
-            stock_data['rationale'], stock_data['closed_on_dt']))
-            # Insert into portfolio table
-            try:
-                stock_data['meta_data'] = json.loads(stock_data['meta_data'])
-                sc_symbol = stock_data['meta_data'].get('sc_symbol')
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON for meta_data: {e}, stock_data: {stock_data}")
-                sc_symbol = None
-            if sc_symbol:
-                stock_data['sc_symbol'] = sc_symbol
-            else:
-                stock_data['sc_symbol'] = None
-            cursor.execute('''
-            INSERT INTO portfolio (instrument, entry_price, entry_date, quantity, recommendation_id, buy_sell)
-            VALUES (%s, %s, %s, 1, %s, 'buy')
-            ''', (stock_data['sc_symbol'], stock_data['entry_price'],stock_data['created_at'], stock_data['id']))
-        
+def ingest_payload(jsonData):
+    """Ingests the equity cash items of one recommendations API response and notifies about new ones."""
+    items = [item for item in jsonData['list']['data'] if item['instrument_type'] == 'cash' and item['asset_class'] == 'equity']
+    # One pooled connection and a single commit for the whole ingest
+    with timer("recos", "db_write"), db.transaction() as cursor:
+        create_tables(cursor)
+        summary = ingest_recommendations(items, cursor)
+    for outcome in ('inserted', 'updated', 'unchanged'):
+        count("recommendations_total", summary[outcome], result=outcome)
+    print(f"Recommendations: {summary['inserted']} inserted, {summary['updated']} updated, {summary['unchanged']} unchanged")
+    # Notify only after the transaction has committed
+    for record in summary['new']:
+        send_webhook(record)
+    return summary
 
-        try:
-            headers = {'Content-type': 'application/json'}
-            payload = {
-                'message': f"New recommendation identified \n Stock Name: {stock_data['sc_symbol']} \n Recommendation Type: {stock_data['reco_type']} \n Entry Price: {stock_data['entry_price']} \n Entry Time: {stock_data['created_at']} \n Target Price: {stock_data['target_price_1']}"
-            }
-            response = requests.post('http://140.245.31.82:8080/webhook', headers=headers, data=json.dumps(payload))
-            if response.status_code != 200:
-                print(f"Error sending webhook request: {response.status_code}, {response.text}")
-        except Exception as e:
-            print(f"Error sending webhook request: {e}")
-        # Commit changes
-        # connection.commit()
-        
-        # cursor.execute('''
-        # INSERT INTO recommendations (id, asset_class, instrument_type, instrument, reco_type, option_category, meta_data, reco_end_date, updated_at, created_at, user_name, call_status, cmp, entry_condition, entry_price, target_condition, target_price_1, stoploss_price, target_return, stoploss_condition, rationale, closed_on_dt)
-        # SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        # WHERE NOT EXISTS (SELECT 1 FROM recommendations WHERE id = %s)
-        # ''', (stock_data['id'], stock_data['asset_class'], stock_data['instrument_type'], stock_data['instrument'], stock_data['reco_type'], stock_data['option_category'], stock_data['meta_data'], 
-        # stock_data['reco_end_date'], stock_data['updated_at'], stock_data['created_at'], stock_data['user_name'], stock_data['call_status'], stock_data['cmp'], stock_data['entry_condition'], 
-        # stock_data['entry_price'], stock_data['target_condition'], stock_data['target_price_1'], stock_data['stoploss_price'], stock_data['target_return'], stock_data['stoploss_condition'], 
-        # stock_data['rationale'], stock_data['closed_on_dt'],stock_data['id']))
 
+def _at_least(elements, n):
+    """The elements if there are at least n of them, else False (a WebDriverWait condition)."""
+    return elements if len(elements) >= n else False
+
+
+def create_tables(cursor):
+    """Creates the recommendations and portfolio tables if they do not exist."""
+    # Create table if it doesn't exist
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS recommendations (
+        id INT PRIMARY KEY,
+        asset_class VARCHAR(255),
+        instrument_type VARCHAR(255),
+        instrument VARCHAR(255),
+        reco_type VARCHAR(255),
+        option_category VARCHAR(255),
+        meta_data TEXT,
+        reco_end_date DATETIME,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        created_at DATETIME,
+        user_name VARCHAR(255),
+        call_status VARCHAR(255),
+        cmp VARCHAR(255),
+        entry_condition VARCHAR(255),
+        entry_price FLOAT,
+        target_condition VARCHAR(255),
+        target_price_1 FLOAT,
+        stoploss_price FLOAT,
+        target_return FLOAT,
+        stoploss_condition VARCHAR(255),
+        rationale TEXT,
+        closed_on_dt DATETIME
+    )
+    ''')
+    # Create portfolio table if it doesn't exist
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS portfolio (
+        id INT PRIMARY KEY AUTO_INCREMENT,
+        instrument VARCHAR(255),
+        entry_price FLOAT,
+        entry_date DATETIME,
+        quantity INT,
+        recommendation_id INT,
+        buy_sell VARCHAR(255),
+        current_price FLOAT,
+        realized_profit FLOAT,
+        exit_price FLOAT,
+        exit_date DATETIME,
+        FOREIGN KEY (recommendation_id) REFERENCES recommendations(id)
+    )
+    ''')
+
+
+RECOMMENDATION_COLUMNS = ['id', 'asset_class', 'instrument_type', 'instrument', 'reco_type', 'option_category', 'meta_data',
+                          'reco_end_date', 'created_at', 'user_name', 'call_status', 'cmp', 'entry_condition', 'entry_price',
+                          'target_condition', 'target_price_1', 'stoploss_price', 'target_return', 'stoploss_condition',
+                          'rationale', 'closed_on_dt']
+PORTFOLIO_COLUMNS = ['instrument', 'entry_price', 'entry_date', 'quantity', 'recommendation_id', 'buy_sell']
+
+
+def normalize_recommendation(stock_data, now=None):
+    """Parses dates and the sc_symbol out of one API item; returns a new dict and leaves the item untouched."""
+    record = {column: stock_data.get(column) for column in RECOMMENDATION_COLUMNS}
+    record['id'] = int(stock_data['id'])
+    try:
+        record['reco_end_date'] = datetime.fromisoformat(stock_data['reco_end_date'].replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError, KeyError) as e:
+        print(f"Error parsing reco_end_date: {e}, stock_data: {stock_data}")
+        record['reco_end_date'] = None  # Handle invalid format
+
+    try:
+        record['created_at'] = datetime.fromisoformat(stock_data['created_at'])
+    except (ValueError, TypeError, KeyError) as e:
+        print(f"Error parsing created_at: {e}, stock_data: {stock_data}")
+        record['created_at'] = None
+
+    record['closed_on_dt'] = now or datetime.now()
+
+    try:
+        sc_symbol = json.loads(stock_data['meta_data']).get('sc_symbol')
+    except (json.JSONDecodeError, TypeError, KeyError, AttributeError) as e:
+        print(f"Error decoding JSON for meta_data: {e}, stock_data: {stock_data}")
+        sc_symbol = None
+    record['sc_symbol'] = sc_symbol or None
+    return record
+
+
+def ingest_recommendations(items, cursor, chunk_size=500):
+    """
+    Upserts a batch of API items into recommendations and portfolio.
+
+    Items are normalized up front, existing ids and call statuses are fetched
+    in one query, new recommendations and their portfolio rows go in as
+    multi-row inserts, and status changes are applied with one CASE update per
+    table. Runs on the caller's cursor, so the caller's transaction covers it.
+    Returns counts of inserted, updated and unchanged recommendations, plus the
+    normalized records that were new (for notifications).
+    """
+    now = datetime.now()
+    records = {}
+    for item in items:
+        record = normalize_recommendation(item, now)
+        records[record['id']] = record
+    ids = list(records)
+
+    existing = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"SELECT id, call_status FROM recommendations WHERE id IN ({placeholders})", chunk)
+        existing.update(cursor.fetchall())
+
+    new = [records[reco_id] for reco_id in ids if reco_id not in existing]
+    changed = [records[reco_id] for reco_id in ids if reco_id in existing and existing[reco_id] != records[reco_id]['call_status']]
+
+    db.insert_rows(cursor, 'recommendations', RECOMMENDATION_COLUMNS,
+                   [[record[column] for column in RECOMMENDATION_COLUMNS] for record in new],
+                   key_columns=['id'], update_columns=RECOMMENDATION_COLUMNS[1:], chunk_size=chunk_size)
+    # portfolio has no natural unique key, so only recommendations seen for the first time get a position
+    db.insert_rows(cursor, 'portfolio', PORTFOLIO_COLUMNS,
+                   [[record['sc_symbol'], record['entry_price'], record['created_at'], 1, record['id'], 'buy'] for record in new],
+                   chunk_size=chunk_size)
+
+    for start in range(0, len(changed), chunk_size):
+        chunk = changed[start:start + chunk_size]
+        chunk_ids = [record['id'] for record in chunk]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+        status_params = [value for record in chunk for value in (record['id'], record['call_status'])]
+        cursor.execute(f"UPDATE recommendations SET call_status = CASE id {cases} END WHERE id IN ({placeholders})",
+                       status_params + chunk_ids)
+        # A status change closes the position at the current market price (assuming selling)
+        cmp_params = [value for record in chunk for value in (record['id'], _to_float(record['cmp']))]
+        cursor.execute(f"""UPDATE portfolio SET exit_price = CASE recommendation_id {cases} END, exit_date = %s,
+            realized_profit = quantity * (CASE recommendation_id {cases} END - entry_price)
+            WHERE recommendation_id IN ({placeholders})""", cmp_params + [now] + cmp_params + chunk_ids)
+
+    return {
+        'inserted': len(new),
+        'updated': len(changed),
+        'unchanged': len(ids) - len(new) - len(changed),
+        'new': new,
+    }
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def insert_stock_data_to_db(stock_data,cursor):
+    """Ingests a single API item; batches should go through ingest_recommendations."""
+    try:
+        summary = ingest_recommendations([stock_data], cursor)
+        for record in summary['new']:
+            send_webhook(record)
     except Exception as err:
         print(f"Error inserting data into database: {err}")
 
-if __name__ == "__main__":
+
+def send_webhook(stock_data):
+    """Queues a new-recommendation message on the background webhook notifier; never blocks."""
+    message = f"New recommendation identified \n Stock Name: {stock_data['sc_symbol']} \n Recommendation Type: {stock_data['reco_type']} \n Entry Price: {stock_data['entry_price']} \n Entry Time: {stock_data['created_at']} \n Target Price: {stock_data['target_price_1']}"
+    get_notifier().notify(message)
+
+RECOMMENDATIONS_URL = "https://api.moneycontrol.com/mcapi/technicalpicks/recommendations?deviceType=I&version=150&start=0&limit=100&recommendation_type=active&asset_class=&instrument_type=&action_taken=&search=&analyst_id="
+
+
+def run(pool=None, browser=False):
+    """
+    Ingests the active recommendations with the credentials from .env.
+
+    Uses the cookie-backed API client unless `browser` is set, in which case
+    the whole fetch goes through a logged-in browser as it used to.
+    """
     username = os.getenv('MONEYCONTROL_USERNAME')
     password = os.getenv('MONEYCONTROL_PASSWORD')
 
     if username and password:
-        if login_and_extract_data(username, password,"https://api.moneycontrol.com/mcapi/technicalpicks/recommendations?deviceType=I&version=150&start=0&limit=100&recommendation_type=active&asset_class=&instrument_type=&action_taken=&search=&analyst_id="):
+        extract = login_and_extract_data if browser else api_extract_data
+        if extract(username, password, RECOMMENDATIONS_URL, pool=pool):
             print("Data extraction and insertion completed successfully.")
+            return True
     else:
         print("Username or password not found in .env file.")
+    return False
+
+
+if __name__ == "__main__":
+    run()
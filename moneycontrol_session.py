@@ -0,0 +1,180 @@
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import count, timer
+from price_sources import HTTP_USER_AGENT
+from replay import wrap_session
+
+# Where the login cookies are kept between runs; they are credentials, so the file is private
+COOKIE_PATH = os.getenv("MONEYCONTROL_COOKIES", ".moneycontrol_cookies.json")
+API_TIMEOUT = float(os.getenv("MONEYCONTROL_TIMEOUT", "10"))
+# Wording of the error messages the API puts in a 200 body when the session is not logged in
+AUTH_ERROR = re.compile(r"log ?in|sign ?in|session|unauthori[sz]ed|not authenticated", re.IGNORECASE)
+
+
+class AuthError(Exception):
+    """Moneycontrol refused the request even after a fresh browser login."""
+
+
+def auth_failed(response, payload=None):
+    """
+    True when the API rejected the cookies.
+
+    That is a 401/403, a redirect to the login page, or a 200 whose body
+    (`payload`, decoded from the response if not given) is not the
+    recommendations listing: no `list` key, `success` of 0, or an error
+    message about logging in.
+    """
+    if response.status_code in (401, 403) or "accounts.moneycontrol.com/mclogin" in (response.url or ""):
+        return True
+    if response.status_code != 200:
+        return False
+    if payload is None:
+        payload = decode_json(response)
+    if not isinstance(payload, dict) or "list" not in payload:
+        return True
+    error = " ".join(str(payload.get(key) or "") for key in ("error", "message", "msg"))
+    return payload.get("success") in (0, "0", False) or bool(AUTH_ERROR.search(error))
+
+
+def decode_json(response):
+    """Returns the response's decoded JSON, or None if the body is not JSON (e.g. a login page)."""
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def load_cookies(path):
+    """Returns the unexpired cookies saved at path (Selenium's cookie dicts), or [] if there are none."""
+    try:
+        with open(path, encoding="utf-8") as saved:
+            cookies = json.load(saved)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring unreadable cookie file {path}: {e}")
+        return []
+    now = time.time()
+    return [cookie for cookie in cookies if not cookie.get("expiry") or cookie["expiry"] > now]
+
+
+def save_cookies(cookies, path):
+    """Atomically replaces path with the cookies, readable only by the current user."""
+    descriptor = os.open(path + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as saved:
+        json.dump(cookies, saved)
+    os.replace(path + ".tmp", path)
+
+
+def browser_cookies(username, password, pool=None):
+    """Logs in with a pooled browser and returns its cookies, or None if the login failed."""
+    from driver_pool import get_pool
+    from moneyControlScraping import browser_login
+
+    pool = pool or get_pool()
+    with pool.driver() as driver:
+        if not browser_login(driver, username, password):
+            return None
+        return driver.get_cookies()
+
+
+class MoneycontrolSession:
+    """
+    Calls the Moneycontrol API over pooled keep-alive HTTP with the browser's login cookies.
+
+    Cookies are loaded from `cookie_path` at start and saved there after every
+    login, so they survive restarts. With no saved cookies the browser login
+    runs before the first request. When the API answers with an auth failure
+    the browser login runs once (concurrent callers share it) and the request
+    is retried; a refusal right after a login raises AuthError.
+    """
+
+    def __init__(self, username, password, cookie_path=None, session=None, pool=None, login=browser_cookies, max_connections=4):
+        self.username = username
+        self.password = password
+        self.cookie_path = cookie_path or COOKIE_PATH
+        self.pool = pool
+        self.logins = 0
+        self._login = login
+        self._lock = threading.Lock()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = HTTP_USER_AGENT
+            session = wrap_session(session)
+        self.session = session
+        cookies = load_cookies(self.cookie_path)
+        self._logged_in = bool(cookies)
+        self._set_cookies(cookies)
+
+    def get_json(self, url, params=None):
+        """GETs url and returns the decoded JSON, logging in first if there are no cookies or they are refused."""
+        logins = self.logins
+        if not self._logged_in:
+            # Nothing saved to try: a request now could only be refused
+            self.login(seen=logins)
+            logins = None
+        response = self._get(url, params)
+        payload = decode_json(response)
+        if auth_failed(response, payload):
+            count("moneycontrol_auth_failures_total")
+            if logins is not None:
+                self.login(seen=logins)
+                response = self._get(url, params)
+                payload = decode_json(response)
+            if auth_failed(response, payload):
+                raise AuthError(f"Moneycontrol refused {url} after a fresh login")
+        response.raise_for_status()
+        return payload
+
+    def login(self, seen=None):
+        """
+        Runs the browser login and stores its cookies.
+
+        With `seen`, the login is skipped if another thread has logged in
+        since the caller read self.logins, so a burst of refused requests
+        costs one browser session.
+        """
+        with self._lock:
+            if seen is not None and self.logins != seen:
+                return
+            with timer("recos", "login"):
+                cookies = self._login(self.username, self.password, self.pool)
+            if cookies is None:
+                raise AuthError("Browser login to Moneycontrol failed")
+            self._set_cookies(cookies)
+            save_cookies(cookies, self.cookie_path)
+            self._logged_in = True
+            self.logins += 1
+
+    def _get(self, url, params):
+        with timer("recos", "api_fetch"):
+            return self.session.get(url, params=params, timeout=API_TIMEOUT)
+
+    def _set_cookies(self, cookies):
+        jar = getattr(self.session, "cookies", None)
+        if jar is None:
+            return
+        for cookie in cookies:
+            jar.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(username, password, pool=None):
+    """Returns the process-wide API client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None or (_client.username, _client.password) != (username, password):
+            _client = MoneycontrolSession(username, password, pool=pool)
+        return _client
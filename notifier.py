@@ -0,0 +1,223 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: the spill file is still claimed by rename, only the append lock is lost
+    fcntl = None
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import count, timer
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "http://140.245.31.82:8080/webhook")
+SPILL_PATH = os.getenv("WEBHOOK_SPILL_PATH", "webhook_spill.jsonl")
+# How often the worker puts spilled messages back on the queue, in seconds
+SPILL_RETRY_INTERVAL = float(os.getenv("WEBHOOK_SPILL_RETRY_INTERVAL", "60"))
+
+
+class WebhookNotifier:
+    """
+    Delivers webhook messages from a background thread so callers never wait on the endpoint.
+
+    notify() only enqueues. The worker drains the queue, joins whatever is
+    waiting (up to `batch_size` messages) into one post, and retries failed
+    posts with exponential backoff. Messages that still fail, or that arrive
+    while the queue is full, are appended to a JSON-lines spill file. The
+    worker puts them back on the queue every `spill_retry_interval` seconds,
+    and a new notifier does so when it starts.
+    """
+
+    def __init__(self, url=None, spill_path=None, max_queue=1000, batch_size=20, timeout=5,
+                 retries=3, backoff=0.5, coalesce_window=0.2, session=None, spill_retry_interval=None):
+        self.url = url or WEBHOOK_URL
+        self.spill_path = spill_path or SPILL_PATH
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.coalesce_window = coalesce_window
+        self.spill_retry_interval = SPILL_RETRY_INTERVAL if spill_retry_interval is None else spill_retry_interval
+        self.sent = 0
+        self.spilled = 0
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_maxsize=1))
+            from replay import wrap_session
+            session = wrap_session(session)
+        self.session = session
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._retry_spilled()
+        self._worker = threading.Thread(target=self._run, name="webhook-notifier", daemon=True)
+        self._worker.start()
+
+    def notify(self, message):
+        """Queues a message for delivery; never blocks."""
+        self._enqueue(message)
+
+    def close(self, timeout=10):
+        """Delivers what is queued (spilling anything left after `timeout` seconds) and stops the worker."""
+        self._stopping.set()
+        self._worker.join(timeout)
+        leftovers = self._drain(block=False, limit=None)
+        if leftovers:
+            self._spill(leftovers)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _enqueue(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self._spill([message])
+
+    def _run(self):
+        next_retry = time.monotonic() + self.spill_retry_interval
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._drain(block=True, limit=self.batch_size)
+            if batch and not self._post(batch):
+                self._spill(batch)
+            if not self._stopping.is_set() and time.monotonic() >= next_retry:
+                self._retry_spilled()
+                next_retry = time.monotonic() + self.spill_retry_interval
+
+    def _retry_spilled(self):
+        for message in self._take_spilled():
+            self._enqueue(message)
+
+    def _drain(self, block, limit):
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=0.1))
+                # Give a burst of notifications a moment to arrive so they share one post
+                deadline = time.monotonic() + self.coalesce_window
+                while len(batch) < limit and time.monotonic() < deadline:
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+            while limit is None or len(batch) < limit:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _post(self, batch):
+        payload = {"message": "\n\n".join(batch)}
+        for attempt in range(self.retries):
+            try:
+                with timer("webhook", "post"):
+                    response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if response.status_code == 200:
+                    self.sent += len(batch)
+                    count("webhook_messages_total", len(batch), result="sent")
+                    return True
+                print(f"Error sending webhook request: {response.status_code}, {response.text}")
+            except requests.exceptions.RequestException as e:
+                print(f"Error sending webhook request: {e}")
+            if attempt < self.retries - 1:
+                time.sleep(self.backoff * 2 ** attempt)
+        return False
+
+    def _spill(self, messages):
+        """
+        Appends messages to the spill file, which other processes may share.
+
+        The append holds an exclusive flock, and is retried if the file was
+        claimed by a reader (renamed away) between opening and locking it.
+        """
+        lines = "".join(json.dumps({"message": message, "spilled_at": time.time()}) + "\n" for message in messages)
+        with self._spill_lock:
+            while True:
+                with open(self.spill_path, "a", encoding="utf-8") as spill:
+                    _lock(spill)
+                    try:
+                        if not _same_file(spill, self.spill_path):
+                            continue
+                        spill.write(lines)
+                        spill.flush()
+                        break
+                    finally:
+                        _unlock(spill)
+            self.spilled += len(messages)
+        count("webhook_messages_total", len(messages), result="spilled")
+
+    def _take_spilled(self):
+        """
+        Claims the spill file and returns its messages, skipping lines that cannot be read.
+
+        The file is first renamed to a name unique to this call, which is
+        atomic, so of several processes sharing the spill path exactly one
+        reads each message and appends after the rename start a new file.
+        """
+        messages = []
+        claimed = f"{self.spill_path}.{os.getpid()}.{uuid.uuid4().hex}.claimed"
+        with self._spill_lock:
+            try:
+                os.replace(self.spill_path, claimed)
+            except FileNotFoundError:
+                return []
+            with open(claimed, encoding="utf-8") as spill:
+                # Waits for a writer that opened the file before the rename to finish its append
+                _lock(spill)
+                try:
+                    for number, line in enumerate(spill, 1):
+                        if not line.strip():
+                            continue
+                        try:
+                            messages.append(json.loads(line)["message"])
+                        except (ValueError, KeyError, TypeError) as e:
+                            print(f"Skipping unreadable line {number} of {self.spill_path}: {e}")
+                            count("webhook_messages_total", result="unreadable")
+                    os.remove(claimed)
+                finally:
+                    _unlock(spill)
+        return messages
+
+
+def _lock(spill):
+    if fcntl is not None:
+        fcntl.flock(spill.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock(spill):
+    if fcntl is not None:
+        fcntl.flock(spill.fileno(), fcntl.LOCK_UN)
+
+
+def _same_file(spill, path):
+    """True if the open file is still the one at path, i.e. no reader has claimed it since it was opened."""
+    try:
+        return os.path.samestat(os.fstat(spill.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """Returns the process-wide notifier, started on first use and flushed at exit."""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = WebhookNotifier()
+            atexit.register(_notifier.close)
+        return _notifier
@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+from datetime import datetime
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+import db
+from instrumentation import count, timer
+from max_pain import batch_max_pain
+from parsers import parse_expiry
+from replay import wrap_session
+
+# The futures-and-options page the browser scraper reads; it loads the option
+# chain for every expiry as JSON, and that request is what gets captured
+SENSIBULL_URL = "https://web.sensibull.com/futures-options-data?tradingsymbol={index}"
+# Matches the URL of the page's option chain request among the resources it loaded
+OPTION_CHAIN_RESOURCE = os.getenv("OPTION_CHAIN_RESOURCE", r"option.?chain")
+# URLs of the fetch/XHR requests the page has made so far, oldest first
+RESOURCES_SCRIPT = """
+    return performance.getEntriesByType("resource")
+        .filter(entry => entry.initiatorType === "fetch" || entry.initiatorType === "xmlhttprequest")
+        .map(entry => entry.name);
+"""
+OPTION_CHAIN_TIMEOUT = float(os.getenv("OPTION_CHAIN_TIMEOUT", "10"))
+
+OPTION_CHAIN_DDL = """
+    CREATE TABLE IF NOT EXISTS option_chain_oi (
+        index_name VARCHAR(32) NOT NULL,
+        expiry_date DATE NOT NULL,
+        captured_at DATETIME NOT NULL,
+        strike_price DOUBLE NOT NULL,
+        call_oi BIGINT NOT NULL,
+        put_oi BIGINT NOT NULL,
+        call_pain DOUBLE NOT NULL,
+        put_pain DOUBLE NOT NULL,
+        total_pain DOUBLE NOT NULL,
+        PRIMARY KEY (index_name, expiry_date, captured_at, strike_price)
+    )
+"""
+CHAIN_COLUMNS = ["index_name", "expiry_date", "captured_at", "strike_price", "call_oi", "put_oi", "call_pain", "put_pain", "total_pain"]
+
+
+def create_table(cursor):
+    cursor.execute(OPTION_CHAIN_DDL)
+
+
+def parse_option_chain(payload, captured_at=None):
+    """
+    Flattens an option chain payload into one row per (expiry, strike).
+
+    The payload looks like
+    {"underlying_price": 23155.35,
+     "expiries": {"2025-01-30": [{"strike": 23000, "call_oi": 1200, "put_oi": 800}, ...], ...}}
+    and may be wrapped in {"data": ...}. Strikes without OI count as 0.
+    Expiries are stored as ISO dates, as the browser scraper stores them;
+    ones given without a year ('30 Jan') are dated from `captured_at`
+    (default: now). Strikes of an expiry that cannot be dated are dropped
+    and counted, since option_chain_oi.expiry_date is a DATE.
+
+    Returns:
+    float: the underlying's last price, or None if the payload has none
+    DataFrame: expiry_date, strike_price, call_oi and put_oi
+    """
+    payload = payload.get("data", payload)
+    if "expiries" not in payload:
+        # The shape is Sensibull's to change; fail loudly rather than store an empty chain
+        raise ValueError(f"Unrecognised option chain payload with keys {sorted(payload)}")
+    rows = [(expiry, float(strike["strike"]), int(strike.get("call_oi") or 0), int(strike.get("put_oi") or 0))
+            for expiry, strikes in (payload["expiries"] or {}).items()
+            for strike in strikes]
+    chain = pd.DataFrame(rows, columns=["expiry_date", "strike_price", "call_oi", "put_oi"])
+    expiries = parse_expiry(chain["expiry_date"], [captured_at or datetime.now()] * len(chain))
+    dated = ~pd.isna(expiries)
+    if not dated.all():
+        labels = sorted(set(chain.loc[~dated, "expiry_date"]))
+        print(f"Skipping {int((~dated).sum())} strikes of unparseable expiries {labels}")
+        count("option_chain_strikes_skipped_total", int((~dated).sum()))
+    chain = chain.loc[dated].reset_index(drop=True)
+    chain["expiry_date"] = [expiry.isoformat() for expiry in expiries[dated]]
+    underlying = payload.get("underlying_price")
+    return (float(underlying) if underlying is not None else None), chain
+
+
+def max_pain_text(price):
+    """Formats a price the way Sensibull shows it, e.g. 23200.0 -> '23,200'."""
+    return f"{price:,.2f}".rstrip("0").rstrip(".")
+
+
+def chain_resource_url(driver):
+    """Returns the URL of the latest option chain request the page in `driver` has made, or None."""
+    urls = driver.execute_script(RESOURCES_SCRIPT) or []
+    matching = [url for url in urls if re.search(OPTION_CHAIN_RESOURCE, url, re.IGNORECASE)]
+    return matching[-1] if matching else None
+
+
+def fetch_option_chain(index, driver, session=None):
+    """
+    Loads the index's Sensibull page in `driver` and returns the option chain JSON it requested.
+
+    The request is found among the page's own fetches, so the endpoint is
+    whatever the page uses, and replayed over HTTP with the browser's cookies.
+    Raises LookupError if the page makes no such request within
+    OPTION_CHAIN_TIMEOUT seconds.
+    """
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    session = session or get_session()
+    with timer("option_chain", "page_load", index=index):
+        driver.get(SENSIBULL_URL.format(index=index))
+        try:
+            url = WebDriverWait(driver, OPTION_CHAIN_TIMEOUT, poll_frequency=0.2).until(chain_resource_url)
+        except TimeoutException:
+            raise LookupError(f"Sensibull page for {index} made no option chain request") from None
+    cookies = {cookie["name"]: cookie["value"] for cookie in driver.get_cookies()}
+    with timer("option_chain", "fetch", index=index):
+        response = session.get(url, cookies=cookies, timeout=OPTION_CHAIN_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+
+def record_chain(index, underlying, chain, cursor, captured_at=None, chunk_size=500):
+    """
+    Computes max pain for every expiry of a parsed chain and stores it.
+
+    Per-strike OI and the pain curve go to option_chain_oi, one row per
+    strike; each expiry's max pain also goes to max_pain_data as the browser
+    scraper records it, with the trend Sensibull shows (Bullish when max pain
+    is above the underlying). Runs on the caller's cursor. Returns the summary
+    DataFrame from batch_max_pain.
+    """
+    captured_at = captured_at or datetime.now()
+    # Pre-sorted by (expiry, strike), batch_max_pain keeps row order, so curve rows line up with OI rows
+    chain = chain.sort_values(["expiry_date", "strike_price"], kind="stable").reset_index(drop=True)
+    summary, curves = batch_max_pain(chain, keys=("expiry_date",))
+    if summary.empty:
+        return summary
+
+    rows = zip(curves["expiry_date"], curves["strike_price"], chain["call_oi"], chain["put_oi"],
+               curves["call_pain"], curves["put_pain"], curves["total_pain"])
+    db.insert_rows(cursor, "option_chain_oi", CHAIN_COLUMNS,
+                   [(index, expiry, captured_at, float(strike), int(call_oi), int(put_oi), float(call_pain), float(put_pain), float(total_pain))
+                    for expiry, strike, call_oi, put_oi, call_pain, put_pain, total_pain in rows],
+                   key_columns=["index_name", "expiry_date", "captured_at", "strike_price"],
+                   update_columns=CHAIN_COLUMNS[4:], chunk_size=chunk_size)
+
+    index_price = max_pain_text(underlying) if underlying is not None else None
+    summary_rows = []
+    for expiry, price in zip(summary["expiry_date"], summary["max_pain_price"]):
+        trend = None if underlying is None else ("Bullish" if price > underlying else "Bearish")
+        text = max_pain_text(price)
+        summary_rows.append((expiry, f"{text}\n{trend}" if trend else text, index, index_price, trend, text))
+    db.insert_rows(cursor, "max_pain_data",
+                   ["expiry_date", "max_pain", "index_name", "index_price_close", "max_pain_trend", "max_pain_price"],
+                   summary_rows, chunk_size=chunk_size)
+    count("option_chain_strikes_total", len(curves), index=index)
+    return summary
+
+
+def capture(index, driver, session=None, captured_at=None):
+    """Fetches, computes and stores one index's whole option chain; returns the per-expiry summary."""
+    captured_at = captured_at or datetime.now()
+    underlying, chain = parse_option_chain(fetch_option_chain(index, driver, session), captured_at)
+    if chain.empty:
+        print(f"Option chain for {index} has no strikes")
+        return None
+    # DDL commits implicitly on MySQL, so it runs before, not inside, the write transaction
+    with db.transaction() as cursor:
+        create_table(cursor)
+    with timer("option_chain", "db_write", index=index), db.transaction() as cursor:
+        summary = record_chain(index, underlying, chain, cursor, captured_at)
+    for expiry, price in zip(summary["expiry_date"], summary["max_pain_price"]):
+        print(f"{index} {expiry} max pain: {max_pain_text(price)}")
+    return summary
+
+
+def pain_curves(index_name, expiry_date=None, captured_at=None):
+    """Reads a stored chain and its pain curve back; the latest capture unless captured_at is given."""
+    conditions = ["index_name = %s"]
+    params = [index_name]
+    if expiry_date is not None:
+        conditions.append("expiry_date = %s")
+        params.append(expiry_date)
+    if captured_at is None:
+        conditions.append("captured_at = (SELECT MAX(captured_at) FROM option_chain_oi WHERE index_name = %s)")
+        params.append(index_name)
+    else:
+        conditions.append("captured_at = %s")
+        params.append(captured_at)
+    return db.read_frame(f"SELECT {', '.join(CHAIN_COLUMNS)} FROM option_chain_oi WHERE {' AND '.join(conditions)} "
+                         "ORDER BY expiry_date, strike_price", params)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the process-wide keep-alive session for option chain requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=int(os.getenv("DRIVER_POOL_SIZE", "2")))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = wrap_session(session)
+        return _session
@@ -0,0 +1,158 @@
+import json
+import re
+
+from lxml import etree
+from lxml import html as lxml_html
+
+# Pure functions over page snapshots (driver.page_source or an HTTP body), so a
+# page costs one WebDriver round trip instead of one per field, and the parsing
+# can be tested and benchmarked offline against recorded pages.
+
+
+def _has_class(name, axis=".//"):
+    """XPath matching elements whose class attribute contains the whole word `name`."""
+    return etree.XPath(f"{axis}*[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]")
+
+
+def _document(html):
+    """Parses html into an lxml tree, or returns None for an empty or unparseable page."""
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+# TradingView quote pages
+
+TICKER_PRICE = etree.XPath("//div[contains(@class, 'symbol-header-ticker')]//span[contains(@class, 'symbol-last')]")
+META_PRICE = etree.XPath("//meta[@itemprop='price']/@content")
+# Quote values embedded in page scripts, e.g. "lp":1234.5 or "last_price":"1234.5"
+EMBEDDED_PRICE = re.compile(r'"(?:lp|last_price|lastPrice)"\s*:\s*"?([0-9][0-9,]*\.?[0-9]*)')
+EMBEDDED_PRICE_KEYS = ("lp", "last_price", "lastPrice")
+# The key naming the instrument of an embedded quote object, e.g. "symbol":"INFY" or "pro_name":"NSE:INFY"
+EMBEDDED_SYMBOL = r'"(?:symbol|short_name|pro_name)"\s*:\s*"(?:[A-Z_]+:)?{}"'
+# How many opening braces before a symbol key are tried as the start of its object
+EMBEDDED_OBJECT_TRIES = 20
+
+
+def parse_price_html(html, symbol=None):
+    """
+    Extracts the last traded price from a quote page, or None if the page has none.
+
+    With `symbol`, a price embedded in a page script is only taken from the
+    JSON object naming that symbol, so quotes of related instruments on the
+    same page are never picked up.
+    """
+    candidates = []
+    tree = _document(html)
+    if tree is not None:
+        candidates.extend(element.text_content().strip() for element in TICKER_PRICE(tree)[:1])
+        candidates.extend(META_PRICE(tree)[:1])
+    if symbol:
+        embedded = _embedded_price(html or "", symbol)
+        if embedded is not None:
+            candidates.append(embedded)
+    else:
+        match = EMBEDDED_PRICE.search(html or "")
+        if match:
+            candidates.append(match.group(1))
+    for text in candidates:
+        try:
+            return float(text.replace(",", ""))
+        except ValueError:
+            continue
+    return None
+
+
+def _embedded_price(html, symbol):
+    """Returns, as text, the price in the innermost JSON object enclosing a key naming `symbol`; None if there is none."""
+    decoder = json.JSONDecoder()
+    for match in re.finditer(EMBEDDED_SYMBOL.format(re.escape(symbol)), html):
+        start = match.start()
+        for _ in range(EMBEDDED_OBJECT_TRIES):
+            start = html.rfind("{", 0, start)
+            if start < 0:
+                break
+            try:
+                quote, end = decoder.raw_decode(html, start)
+            except ValueError:
+                continue
+            if end > match.end():
+                for key in EMBEDDED_PRICE_KEYS:
+                    if isinstance(quote, dict) and quote.get(key) is not None:
+                        return str(quote[key])
+                break
+    return None
+
+
+# Moneycontrol technical picks cards
+
+PICK_CARD = _has_class("technical-picks-card", axis="//")
+PICK_TEXT_FIELDS = {
+    "stock_name": _has_class("stock-name"),
+    "stock_code": _has_class("stock-code"),
+    "recommendation_date": _has_class("recommendation-date"),
+}
+PICK_PRICE_FIELDS = {key: _has_class(key.replace("_", "-")) for key in ["entry_price", "stoploss_price", "target_price", "current_price"]}
+
+
+def parse_price_text(text):
+    """Turns '₹ 1,234.50' into 1234.5; NaN when there is no number, as extract_stock_data always did."""
+    try:
+        return float(re.sub(r"[^0-9.]", "", text))
+    except ValueError:
+        return float("nan")
+
+
+def parse_technical_picks(html):
+    """
+    Extracts every card on a Moneycontrol technical picks page.
+
+    Returns one dict per card with stock_name, stock_code and
+    recommendation_date as strings ("" when missing) and entry_price,
+    stoploss_price, target_price and current_price as floats (NaN when
+    missing), the same records extract_stock_data builds.
+    """
+    tree = _document(html)
+    if tree is None:
+        return []
+    records = []
+    for card in PICK_CARD(tree):
+        record = {}
+        for key, field in PICK_TEXT_FIELDS.items():
+            found = field(card)
+            record[key] = found[0].text_content().strip() if found else ""
+        for key, field in PICK_PRICE_FIELDS.items():
+            found = field(card)
+            record[key] = parse_price_text(found[0].text_content()) if found else float("nan")
+        records.append(record)
+    return records
+
+
+# Sensibull expiry tabs
+
+def parse_expiry(values, record_times):
+    """
+    Turns scraped expiry text into dates.
+
+    Sensibull shows expiries without a year ('30 Jan'); each gets the first
+    such date on or after its row's record_time, so a January expiry scraped
+    in December lands in the next year. Dates with a year, such as ISO
+    strings, parse as they are; anything else becomes NaT.
+    """
+    import pandas as pd
+
+    text = pd.Series(values, dtype="object").astype(str).str.strip()
+    record_day = pd.to_datetime(pd.Series(record_times, index=text.index)).dt.normalize()
+    # Parsed against a leap year so that '29 Feb' is kept
+    day_month = pd.to_datetime(text + " 2000", format="%d %b %Y", errors="coerce")
+    expiry = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    # A 29 Feb expiry can be up to four years out
+    for years_ahead in range(5):
+        candidate = pd.to_datetime(pd.DataFrame({"year": record_day.dt.year + years_ahead,
+                                                 "month": day_month.dt.month, "day": day_month.dt.day}), errors="coerce")
+        expiry = expiry.where(expiry.notna() | ~(candidate >= record_day), candidate)
+    dated = pd.to_datetime(text.where(day_month.isna()), errors="coerce", format="mixed")
+    return expiry.where(day_month.notna(), dated).dt.date
@@ -0,0 +1,187 @@
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import db
+
+# Ticks kept in memory per instrument; at one refresh a minute this is several trading days
+RING_CAPACITY = int(os.getenv("PRICE_RING_CAPACITY", "4096"))
+
+PRICE_HISTORY_DDL = """
+    CREATE TABLE IF NOT EXISTS price_history (
+        instrument VARCHAR(64) NOT NULL,
+        ts DATETIME(3) NOT NULL,
+        price DOUBLE NOT NULL,
+        PRIMARY KEY (instrument, ts)
+    )
+"""
+OHLC_COLUMNS = ["instrument", "ts", "open", "high", "low", "close", "ticks"]
+
+
+def create_table(cursor):
+    cursor.execute(PRICE_HISTORY_DDL)
+
+
+def record_prices(prices, cursor, ts=None, chunk_size=500):
+    """
+    Appends one refresh's prices to price_history with batched multi-row inserts.
+
+    `prices` maps instrument -> price, with None for instruments that could not
+    be fetched; those are skipped. Every tick of the refresh shares `ts`
+    (default: now). A repeated (instrument, ts) overwrites the earlier price,
+    so re-running a refresh is harmless. The in-memory rings are left alone:
+    call append_ticks once the transaction has committed. Returns the number
+    of ticks written.
+    """
+    ts = ts or datetime.now()
+    fetched = {name: float(price) for name, price in prices.items() if price is not None}
+    return db.insert_rows(cursor, "price_history", ["instrument", "ts", "price"],
+                          [(name, ts, price) for name, price in fetched.items()],
+                          key_columns=["instrument", "ts"], update_columns=["price"], chunk_size=chunk_size)
+
+
+def append_ticks(prices, ts, rings=None):
+    """Adds committed ticks to `rings` (default: the process-wide PriceRings), skipping None prices."""
+    fetched = {name: float(price) for name, price in prices.items() if price is not None}
+    (rings if rings is not None else get_rings()).append_many(fetched, ts)
+
+
+def ohlc(instruments=None, start=None, end=None, interval=None):
+    """
+    Builds OHLC bars from price_history.
+
+    start and end bound ts (end exclusive); interval is a pandas frequency such
+    as '5min' or '1D', or None for one bar spanning the whole window. Returns a
+    DataFrame with OHLC_COLUMNS, where ts is the start of each bar (the first
+    tick's time when interval is None) and ticks counts the prices in the bar.
+    """
+    conditions = []
+    params = []
+    if instruments is not None:
+        instruments = list(instruments)
+        if not instruments:
+            return pd.DataFrame(columns=OHLC_COLUMNS)
+        conditions.append(f"instrument IN ({', '.join(['%s'] * len(instruments))})")
+        params.extend(instruments)
+    if start is not None:
+        conditions.append("ts >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("ts < %s")
+        params.append(end)
+    query = "SELECT instrument, ts, price FROM price_history"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY instrument, ts"
+    ticks = db.read_frame(query, params=tuple(params))
+    ticks["ts"] = pd.to_datetime(ticks["ts"], format="mixed")
+    return bars(ticks, interval)
+
+
+def bars(ticks, interval=None):
+    """Aggregates a frame of (instrument, ts, price) ticks into OHLC bars; see ohlc()."""
+    if ticks.empty:
+        return pd.DataFrame(columns=OHLC_COLUMNS)
+    if interval is None:
+        grouped = ticks.sort_values("ts").groupby("instrument", sort=True)
+        result = grouped.agg(ts=("ts", "first"), open=("price", "first"), high=("price", "max"),
+                             low=("price", "min"), close=("price", "last"), ticks=("price", "size"))
+        return result.reset_index()[OHLC_COLUMNS]
+    grouped = ticks.set_index("ts").groupby("instrument", sort=True)["price"].resample(interval)
+    result = grouped.ohlc()
+    result["ticks"] = grouped.size()
+    result = result[result["ticks"] > 0].reset_index()
+    return result[OHLC_COLUMNS]
+
+
+class PriceRing:
+    """
+    The most recent ticks of one instrument in fixed-size numpy arrays.
+
+    Appends overwrite the oldest tick once `capacity` is reached. Ticks are
+    expected in time order, so windows are found by binary search.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self._times = np.zeros(capacity, dtype="datetime64[ns]")
+        self._prices = np.zeros(capacity, dtype="float64")
+        self._appended = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._appended, self.capacity)
+
+    def append(self, ts, price):
+        with self._lock:
+            slot = self._appended % self.capacity
+            self._times[slot] = _ns(ts)
+            self._prices[slot] = price
+            self._appended += 1
+
+    def latest(self):
+        """Returns the newest (timestamp, price), or None if the ring is empty."""
+        with self._lock:
+            if not self._appended:
+                return None
+            slot = (self._appended - 1) % self.capacity
+            return pd.Timestamp(self._times[slot]), float(self._prices[slot])
+
+    def window(self, start=None, end=None):
+        """Returns (times, prices) arrays, oldest first, with start <= time < end."""
+        with self._lock:
+            head = self._appended % self.capacity
+            if self._appended <= self.capacity:
+                times, prices = self._times[:head].copy(), self._prices[:head].copy()
+            else:
+                times = np.concatenate([self._times[head:], self._times[:head]])
+                prices = np.concatenate([self._prices[head:], self._prices[:head]])
+        first = 0 if start is None else np.searchsorted(times, _ns(start), side="left")
+        last = len(times) if end is None else np.searchsorted(times, _ns(end), side="left")
+        return times[first:last], prices[first:last]
+
+    def ohlc(self, start=None, end=None):
+        """Returns open, high, low, close and ticks over a window, or None if it has no ticks."""
+        _, prices = self.window(start, end)
+        if not len(prices):
+            return None
+        return {"open": float(prices[0]), "high": float(prices.max()), "low": float(prices.min()),
+                "close": float(prices[-1]), "ticks": len(prices)}
+
+
+def _ns(ts):
+    return pd.Timestamp(ts).to_datetime64().astype("datetime64[ns]")
+
+
+class PriceRings:
+    """One PriceRing per instrument, created on first tick."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, instrument):
+        return instrument in self._rings
+
+    def get(self, instrument):
+        return self._rings.get(instrument)
+
+    def append_many(self, prices, ts):
+        for instrument, price in prices.items():
+            ring = self._rings.get(instrument)
+            if ring is None:
+                with self._lock:
+                    ring = self._rings.setdefault(instrument, PriceRing(self.capacity))
+            ring.append(ts, price)
+
+
+_rings = PriceRings()
+
+
+def get_rings():
+    """Returns the process-wide rings that every recorded refresh is appended to."""
+    return _rings
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from parsers import parse_price_html
+from replay import wrap_session
+
+TRADINGVIEW_URL = "https://www.tradingview.com/symbols/NSE-{symbol}/"
+HTTP_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"
+
+
+class SourceStats:
+    """Thread-safe hit/miss counts and per-symbol latencies for one price source."""
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def record(self, price, seconds):
+        with self._lock:
+            if price is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.latencies.append(seconds)
+
+    def report(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests_made = self.hits + self.misses
+            return {
+                "source": self.name,
+                "requests": requests_made,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests_made if requests_made else 0.0,
+                "p50_seconds": _percentile(latencies, 0.5),
+                "p95_seconds": _percentile(latencies, 0.95),
+            }
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class HttpPriceSource:
+    """
+    Reads prices from static quote pages over pooled keep-alive HTTP connections.
+
+    Up to `max_workers` requests are in flight at once and the connection pool
+    is sized to match, so every worker reuses a warm connection.
+    """
+
+    name = "http"
+
+    def __init__(self, url_template=None, parser=parse_price_html, max_workers=None, timeout=5, session=None):
+        self.url_template = url_template or os.getenv("LTP_HTTP_URL", TRADINGVIEW_URL)
+        self.parser = parser
+        self.max_workers = max_workers or int(os.getenv("LTP_HTTP_WORKERS", "8"))
+        self.timeout = timeout
+        self.stats = SourceStats(self.name)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = HTTP_USER_AGENT
+            session = wrap_session(session)
+        self.session = session
+
+    def fetch(self, symbol):
+        started = time.perf_counter()
+        price = None
+        try:
+            response = self.session.get(self.url_template.format(symbol=symbol), timeout=self.timeout)
+            if response.status_code == 200:
+                price = self.parser(response.text, symbol)
+        except requests.exceptions.RequestException as e:
+            print(f"HTTP price fetch failed for {symbol}: {e}")
+        self.stats.record(price, time.perf_counter() - started)
+        return price
+
+    def fetch_many(self, symbols):
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(symbols))) as executor:
+            return dict(zip(symbols, executor.map(self.fetch, symbols)))
+
+    def close(self):
+        self.session.close()
+
+
+class LayeredPriceSource:
+    """
+    Tries each source in order, passing on only the symbols earlier ones could not resolve.
+
+    Typically a fast HTTP source first and the Selenium scraper last.
+    """
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+
+    def fetch_many(self, symbols):
+        prices = dict.fromkeys(symbols)
+        unresolved = list(prices)
+        for source in self.sources:
+            if not unresolved:
+                break
+            found = source.fetch_many(unresolved)
+            prices.update({symbol: price for symbol, price in found.items() if price is not None})
+            unresolved = [symbol for symbol in unresolved if prices[symbol] is None]
+        return prices
+
+    def report(self):
+        return [source.stats.report() for source in self.sources]
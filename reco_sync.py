@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import db
+from instrumentation import count, timer
+from moneyControlScraping import RECOMMENDATION_COLUMNS, RECOMMENDATIONS_URL, create_tables, ingest_recommendations, send_webhook
+
+# Local SQLite file remembering what each recommendation looked like when last ingested
+RECO_SYNC_STATE = os.getenv("RECO_SYNC_STATE", "reco_sync_state.sqlite3")
+RECO_PAGE_SIZE = int(os.getenv("RECO_PAGE_SIZE", "100"))
+RECO_CONCURRENCY = int(os.getenv("RECO_CONCURRENCY", "4"))
+# The live price moves on every poll; hashing it would mark every call as changed
+HASH_COLUMNS = [column for column in RECOMMENDATION_COLUMNS if column != "cmp"]
+
+
+def content_hash(item):
+    """SHA-1 of the fields ingest cares about, stable across key order and the live price."""
+    fields = {column: item.get(column) for column in HASH_COLUMNS}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SyncState:
+    """Persists recommendation id -> content hash in a local SQLite file."""
+
+    def __init__(self, path=None):
+        self.path = path or RECO_SYNC_STATE
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS recommendation_sync_state "
+                               "(id INTEGER PRIMARY KEY, content_hash TEXT NOT NULL, synced_at REAL NOT NULL)")
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def changed(self, hashes):
+        """Returns the ids in `hashes` (id -> hash) that are new or whose hash differs from the stored one."""
+        if not hashes:
+            return []
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT id, content_hash FROM recommendation_sync_state WHERE id IN ({', '.join(['?'] * len(hashes))})",
+                list(hashes)).fetchall()
+        finally:
+            connection.close()
+        stored = dict(rows)
+        return [reco_id for reco_id, digest in hashes.items() if stored.get(reco_id) != digest]
+
+    def put_many(self, hashes):
+        if not hashes:
+            return
+        connection = self._connect()
+        now = time.time()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT INTO recommendation_sync_state (id, content_hash, synced_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET content_hash = excluded.content_hash, synced_at = excluded.synced_at",
+                    [(reco_id, digest, now) for reco_id, digest in hashes.items()])
+        finally:
+            connection.close()
+
+
+def page_url(url, start, limit):
+    """Returns url with its start and limit query parameters replaced."""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key not in ("start", "limit")]
+    return urlunsplit(parts._replace(query=urlencode(query + [("start", start), ("limit", limit)])))
+
+
+def iter_recommendations(fetch, url, page_size=None, concurrency=None):
+    """
+    Yields every recommendation of a paginated API, fetched page by page, in order.
+
+    `fetch` maps a URL to the decoded JSON (e.g. MoneycontrolSession.get_json).
+    The first page is fetched alone; each full page lets one more page be in
+    flight, up to `concurrency`, so a short listing costs one request. The
+    listing ends at an empty page, at the `total` the API reports, or, when
+    it reports none, at a page shorter than `page_size`. Only the pages in
+    flight are held in memory, however many recommendations there are.
+    """
+    page_size = page_size or RECO_PAGE_SIZE
+    concurrency = concurrency or RECO_CONCURRENCY
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="reco-page")
+    pending = deque()
+    next_start = 0
+    window = 1
+    total = None
+
+    def submit():
+        nonlocal next_start
+        while len(pending) < window and (total is None or next_start < total):
+            pending.append((next_start, executor.submit(fetch, page_url(url, next_start, page_size))))
+            next_start += page_size
+
+    try:
+        submit()
+        while pending:
+            start, future = pending.popleft()
+            with timer("recos", "page_fetch"):
+                listing = future.result().get("list") or {}
+            items = listing.get("data") or []
+            count("recommendation_pages_total")
+            yield from items
+            if listing.get("total") is not None:
+                total = int(listing["total"])
+            if not items or (len(items) < page_size if total is None else start + len(items) >= total):
+                break
+            window = min(window + 1, concurrency)
+            submit()
+    finally:
+        # Pages fetched past the end of the listing, or after the caller stopped, are dropped
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def sync_recommendations(fetch, url, state=None, page_size=None, concurrency=None, batch_size=500):
+    """
+    Streams the recommendations and ingests only the new or changed ones.
+
+    Equity cash items are hashed and compared with `state`; changed items are
+    ingested with ingest_recommendations in batches of `batch_size`, each in
+    its own transaction, and their hashes recorded once it commits. A run in
+    which nothing changed never opens a database connection. Returns counts of
+    seen, changed, inserted, updated and unchanged recommendations.
+    """
+    page_size = page_size or RECO_PAGE_SIZE
+    state = state or SyncState()
+    summary = {"seen": 0, "changed": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    batch = {}
+
+    def flush():
+        with timer("recos", "db_write"), db.transaction() as cursor:
+            create_tables(cursor)
+            result = ingest_recommendations([item for item, _ in batch.values()], cursor)
+        state.put_many({reco_id: digest for reco_id, (_, digest) in batch.items()})
+        for outcome in ("inserted", "updated", "unchanged"):
+            summary[outcome] += result[outcome]
+            count("recommendations_total", result[outcome], result=outcome)
+        # Notify only after the transaction has committed
+        for record in result["new"]:
+            send_webhook(record)
+        batch.clear()
+
+    # Hashes are checked against the state a page's worth at a time
+    pending = {}
+    for item in iter_recommendations(fetch, url, page_size, concurrency):
+        if item.get("instrument_type") != "cash" or item.get("asset_class") != "equity":
+            continue
+        summary["seen"] += 1
+        pending[int(item["id"])] = item
+        if len(pending) >= page_size:
+            _collect(pending, state, batch, summary)
+            if len(batch) >= batch_size:
+                flush()
+    _collect(pending, state, batch, summary)
+    if batch:
+        flush()
+    print(f"Recommendations sync: {summary['seen']} seen, {summary['changed']} changed, "
+          f"{summary['inserted']} inserted, {summary['updated']} updated")
+    return summary
+
+
+def _collect(pending, state, batch, summary):
+    """Moves the changed items of `pending` into `batch` as id -> (item, hash) and empties `pending`."""
+    hashes = {reco_id: content_hash(item) for reco_id, item in pending.items()}
+    for reco_id in state.changed(hashes):
+        batch[reco_id] = (pending[reco_id], hashes[reco_id])
+        summary["changed"] += 1
+    pending.clear()
+
+
+def run(pool=None):
+    """Syncs every active recommendation with the credentials from .env through the API client."""
+    from moneycontrol_session import get_client
+
+    username = os.getenv('MONEYCONTROL_USERNAME')
+    password = os.getenv('MONEYCONTROL_PASSWORD')
+    if not (username and password):
+        print("Username or password not found in .env file.")
+        return False
+    try:
+        sync_recommendations(get_client(username, password, pool).get_json, RECOMMENDATIONS_URL)
+        return True
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,438 @@
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone
+
+from lxml import etree
+from lxml import html as lxml_html
+
+# live: real sites; record: real sites, saving every page and response; replay: fixtures only
+SCRAPE_MODE = os.getenv("SCRAPE_MODE", "live")
+FIXTURE_DIR = os.getenv("FIXTURE_DIR", "fixtures/recorded")
+
+
+class FixtureStore:
+    """
+    Recorded pages and HTTP responses as one JSON file per fixture.
+
+    A fixture is addressed by kind ('page', 'script' or 'http') and key (a
+    page state such as a URL, or 'GET <url>'), and holds the body plus metadata. Keys may
+    contain '*' wildcards; an exact match wins, otherwise the first matching
+    pattern is used, so one recorded quote page can stand in for 500 symbols.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or FIXTURE_DIR
+        self._cache = {}
+        self._patterns = None
+        self._lock = threading.Lock()
+
+    def _path(self, kind, key):
+        return os.path.join(self.root, kind, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def save(self, kind, key, body, **metadata):
+        fixture = {"kind": kind, "key": key, "recorded_at": datetime.now(timezone.utc).isoformat(), **metadata, "body": body}
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as output:
+            json.dump(fixture, output)
+        os.replace(path + ".tmp", path)
+        with self._lock:
+            self._cache[(kind, key)] = fixture
+            if "*" in key and self._patterns is not None:
+                self._patterns.setdefault(kind, []).append(key)
+        return fixture
+
+    def load(self, kind, key):
+        """Returns the fixture dict for (kind, key), or None if nothing was recorded."""
+        with self._lock:
+            if (kind, key) in self._cache:
+                return self._cache[(kind, key)]
+        fixture = self._read(self._path(kind, key))
+        if fixture is None:
+            pattern = next((pattern for pattern in self._pattern_keys(kind) if fnmatch.fnmatchcase(key, pattern)), None)
+            if pattern is not None:
+                fixture = self.load(kind, pattern)
+        with self._lock:
+            self._cache[(kind, key)] = fixture
+        return fixture
+
+    def keys(self, kind):
+        directory = os.path.join(self.root, kind)
+        if not os.path.isdir(directory):
+            return []
+        return [self._read(os.path.join(directory, name))["key"] for name in sorted(os.listdir(directory)) if name.endswith(".json")]
+
+    def _pattern_keys(self, kind):
+        with self._lock:
+            patterns = self._patterns
+        if patterns is None:
+            patterns = {}
+            for fixture_kind in ("page", "script", "http"):
+                patterns[fixture_kind] = [key for key in self.keys(fixture_kind) if "*" in key]
+            with self._lock:
+                self._patterns = patterns
+        return patterns.get(kind, [])
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, encoding="utf-8") as fixture:
+                return json.load(fixture)
+        except FileNotFoundError:
+            return None
+
+
+def click_key(state, text):
+    """The page state after clicking an element labelled `text`; only the last click counts."""
+    return state.split("#click:", 1)[0] + "#click:" + text.strip()
+
+
+def script_key(state, script, args):
+    """Key of an execute_script result: the page state plus a digest of the script and its arguments."""
+    digest = hashlib.sha1(json.dumps([script, list(args)], default=str).encode("utf-8")).hexdigest()
+    return f"{state}#script:{digest}"
+
+
+# Browser stand-ins
+
+class RecordingDriver:
+    """
+    Wraps a live WebDriver and saves a page_source snapshot for every page state it sees.
+
+    A state is the URL loaded by get(), plus the label of the last clicked
+    element. The snapshot is refreshed on each lookup, so the most rendered
+    version of a state is what gets replayed.
+    """
+
+    def __init__(self, driver, store):
+        self._driver = driver
+        self._store = store
+        self._state = None
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def get(self, url):
+        self._driver.get(url)
+        self._state = url
+        self._snapshot()
+
+    @property
+    def page_source(self):
+        source = self._driver.page_source
+        self._save(source)
+        return source
+
+    def find_element(self, by, value):
+        element = self._driver.find_element(by, value)
+        self._snapshot()
+        return RecordingElement(element, self)
+
+    def execute_script(self, script, *args):
+        result = self._driver.execute_script(script, *args)
+        if self._state is not None:
+            self._store.save("script", script_key(self._state, script, args), result)
+        return result
+
+    def find_elements(self, by, value):
+        elements = self._driver.find_elements(by, value)
+        self._snapshot()
+        return [RecordingElement(element, self) for element in elements]
+
+    def _clicked(self, text):
+        if self._state is not None:
+            self._state = click_key(self._state, text)
+
+    def _snapshot(self):
+        self._save(self._driver.page_source)
+
+    def _save(self, source):
+        if self._state is not None:
+            self._store.save("page", self._state, source, url=self._driver.current_url)
+
+
+class RecordingElement:
+    def __init__(self, element, driver):
+        self._element = element
+        self._driver = driver
+
+    def __getattr__(self, name):
+        return getattr(self._element, name)
+
+    def click(self):
+        text = self._element.text
+        self._element.click()
+        self._driver._clicked(text)
+
+    def find_element(self, by, value):
+        return RecordingElement(self._element.find_element(by, value), self._driver)
+
+    def find_elements(self, by, value):
+        return [RecordingElement(element, self._driver) for element in self._element.find_elements(by, value)]
+
+
+def _css_to_xpath(selector, prefix):
+    """Translates the simple selectors the scrapers use ('tag.class', '.a .b', '#id') to XPath."""
+    steps = []
+    for part in selector.split():
+        match = re.fullmatch(r"([a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)", part)
+        if not match:
+            raise ValueError(f"Unsupported CSS selector in replay: {selector}")
+        conditions = []
+        for kind, name in re.findall(r"([.#])([\w-]+)", match.group(2)):
+            if kind == ".":
+                conditions.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')")
+            else:
+                conditions.append(f"@id='{name}'")
+        steps.append((match.group(1) or "*") + "".join(f"[{condition}]" for condition in conditions))
+    return prefix + "//".join(steps)
+
+
+def _xpath(by, value, prefix):
+    if by == "xpath":
+        return value
+    if by == "css selector":
+        return _css_to_xpath(value, prefix)
+    if by == "class name":
+        return _css_to_xpath("." + value, prefix)
+    if by == "id":
+        return f"{prefix}*[@id='{value}']"
+    if by == "name":
+        return f"{prefix}*[@name='{value}']"
+    if by == "tag name":
+        return f"{prefix}{value}"
+    if by == "link text":
+        return f"{prefix}a[normalize-space(.)='{value}']"
+    raise ValueError(f"Unsupported locator in replay: {by}")
+
+
+class _Locator:
+    def find_elements(self, by, value):
+        found = self._root().xpath(_xpath(by, value, self._prefix))
+        return [ReplayElement(element, self._driver_ref()) for element in found if isinstance(element, etree._Element)]
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found:
+            from selenium.common.exceptions import NoSuchElementException
+            raise NoSuchElementException(f"{by}={value} not in replayed page")
+        return found[0]
+
+
+class ReplayDriver(_Locator):
+    """
+    Serves recorded page snapshots through the WebDriver calls the scrapers make.
+
+    get() and click() switch between recorded page states; lookups run as
+    XPath over the snapshot in-process, so replay runs at parse speed with no
+    browser. A state that was never recorded behaves like an empty page.
+    """
+
+    _prefix = "//"
+
+    def __init__(self, store=None):
+        self.store = store or get_store()
+        self.current_url = "about:blank"
+        self._state = None
+        self._source = "<html><body></body></html>"
+        self._tree = lxml_html.fromstring(self._source)
+
+    def _root(self):
+        return self._tree
+
+    def _driver_ref(self):
+        return self
+
+    def _load(self, state):
+        fixture = self.store.load("page", state)
+        if fixture is None:
+            return False
+        self._state = state
+        self._source = fixture["body"]
+        self._tree = lxml_html.fromstring(self._source) if self._source.strip() else lxml_html.fromstring("<html></html>")
+        self.current_url = fixture.get("url") or state.split("#click:", 1)[0]
+        return True
+
+    def get(self, url):
+        if not self._load(url):
+            print(f"No recorded page for {url}; replaying an empty page")
+            self._state = url
+            self.current_url = url
+            self._source = "<html><body></body></html>"
+            self._tree = lxml_html.fromstring(self._source)
+
+    @property
+    def page_source(self):
+        return self._source
+
+    def _clicked(self, text):
+        if self._state is not None:
+            self._load(click_key(self._state, text))
+
+    def maximize_window(self):
+        pass
+
+    def execute_script(self, script, *args):
+        """Returns what the script returned when recorded on this page state, or None."""
+        if self._state is None:
+            return None
+        fixture = self.store.load("script", script_key(self._state, script, args))
+        return None if fixture is None else fixture["body"]
+
+    def get_cookies(self):
+        return []
+
+    def quit(self):
+        pass
+
+
+class ReplayElement(_Locator):
+    _prefix = ".//"
+
+    def __init__(self, element, driver):
+        self._element = element
+        self._driver = driver
+
+    def _root(self):
+        return self._element
+
+    def _driver_ref(self):
+        return self._driver
+
+    @property
+    def text(self):
+        # Close to Selenium's rendering for the flat elements the scrapers read
+        return "\n".join(piece.strip() for piece in self._element.itertext() if piece.strip())
+
+    def get_attribute(self, name):
+        return self._element.get(name)
+
+    def is_displayed(self):
+        return True
+
+    def click(self):
+        self._driver._clicked(self.text)
+
+    def send_keys(self, *values):
+        pass
+
+
+# HTTP stand-ins
+
+def _request_key(method, url, params=None):
+    import requests
+
+    return f"{method.upper()} {requests.Request(method.upper(), url, params=params).prepare().url}"
+
+
+class RecordingSession:
+    """Wraps a requests.Session (or the requests module) and saves every response."""
+
+    def __init__(self, session, store):
+        self._session = session
+        self._store = store
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def request(self, method, url, params=None, **kwargs):
+        response = self._session.request(method, url, params=params, **kwargs)
+        self._store.save("http", _request_key(method, url, params), response.text, status=response.status_code,
+                         url=response.url, content_type=response.headers.get("Content-Type"))
+        return response
+
+    def get(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+class ReplayResponse:
+    def __init__(self, url, status_code, text, content_type=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.headers = {"Content-Type": content_type} if content_type else {}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if not self.ok:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} replayed for {self.url}", response=self)
+
+
+class ReplaySession:
+    """
+    Answers requests from recorded responses; unrecorded GETs get a 404.
+
+    Unrecorded writes (POSTs such as webhooks) are acknowledged with a 200 and
+    go nowhere, so replaying a pipeline never notifies anyone.
+    """
+
+    def __init__(self, store=None):
+        import requests
+
+        self.store = store or get_store()
+        self.headers = {}
+        self.cookies = requests.cookies.RequestsCookieJar()
+
+    def request(self, method, url, params=None, **kwargs):
+        fixture = self.store.load("http", _request_key(method, url, params))
+        if fixture is None:
+            return ReplayResponse(url, 404 if method.upper() == "GET" else 200, "")
+        return ReplayResponse(fixture.get("url") or url, fixture.get("status", 200), fixture["body"], fixture.get("content_type"))
+
+    def get(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def close(self):
+        pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the process-wide fixture store under FIXTURE_DIR."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FixtureStore()
+        return _store
+
+
+def wrap_driver(factory):
+    """Builds a driver for SCRAPE_MODE: a ReplayDriver, a RecordingDriver around factory(), or factory() itself."""
+    if SCRAPE_MODE == "replay":
+        return ReplayDriver(get_store())
+    if SCRAPE_MODE == "record":
+        return RecordingDriver(factory(), get_store())
+    return factory()
+
+
+def wrap_session(session):
+    """Returns the session to use for SCRAPE_MODE; `session` may also be the requests module."""
+    if SCRAPE_MODE == "replay":
+        return ReplaySession(get_store())
+    if SCRAPE_MODE == "record":
+        return RecordingSession(session, get_store())
+    return session
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as clock_time
+
+import pytz
+from dotenv import load_dotenv
+
+import instrumentation
+
+# Load environment variables from .env file
+load_dotenv()
+
+IST = pytz.timezone('Asia/Kolkata')
+MARKET_OPEN = clock_time(9, 15)
+MARKET_CLOSE = clock_time(15, 30)
+# Port of the JSON job status endpoint; 0 or unset disables it
+STATUS_PORT = int(os.getenv("SCHEDULER_STATUS_PORT", "0")) or None
+# Port of the Prometheus /metrics endpoint; 0 or unset disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+
+def market_open(now=None):
+    """True between 09:15 and 15:30 IST, Monday to Friday (exchange holidays are not known here)."""
+    now = (now or datetime.now(IST)).astimezone(IST)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+
+class Job:
+    """A blocking function the scheduler runs every `interval` seconds, and its run history."""
+
+    def __init__(self, name, func, interval, market_hours=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.market_hours = market_hours
+        self.next_run = 0.0
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started = None
+        self.last_success = None
+        self.last_error = None
+        self.durations = deque(maxlen=100)
+
+    def status(self):
+        durations = list(self.durations)
+        return {
+            "job": self.name,
+            "interval_seconds": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started": self.last_started.isoformat() if self.last_started else None,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_error": self.last_error,
+            "last_duration_seconds": durations[-1] if durations else None,
+            "mean_duration_seconds": sum(durations) / len(durations) if durations else None,
+            "max_duration_seconds": max(durations) if durations else None,
+        }
+
+
+class Scheduler:
+    """
+    Runs jobs on their own intervals from one long-lived process.
+
+    Each job runs in its own worker thread, so independent jobs overlap while
+    the browser and DB pools stay warm between runs. A job still running when
+    it is next due is skipped for that tick rather than started twice. Jobs
+    with market_hours=True only run while market_open(). Job status is
+    available from status() and, with a status_port, as JSON over HTTP;
+    status_port=0 binds a free port, which run() stores back in status_port.
+    """
+
+    def __init__(self, jobs, tick=1.0, status_port=None, now=None):
+        self.jobs = list(jobs)
+        self.tick = tick
+        self.status_port = STATUS_PORT if status_port is None else status_port
+        self.now = now or (lambda: datetime.now(IST))
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self.jobs), 1), thread_name_prefix="job")
+
+    def status(self):
+        return [job.status() for job in self.jobs]
+
+    async def run(self, stop=None):
+        """Schedules jobs until `stop` is set, then waits for running jobs to finish."""
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        server = None
+        if self.status_port is not None:
+            server = await asyncio.start_server(self._serve_status, "127.0.0.1", self.status_port)
+            self.status_port = server.sockets[0].getsockname()[1]
+        running = set()
+        try:
+            while not stop.is_set():
+                now = time.monotonic()
+                trading = market_open(self.now())
+                for job in self.jobs:
+                    if now < job.next_run:
+                        continue
+                    job.next_run = now + job.interval
+                    if job.market_hours and not trading:
+                        continue
+                    if job.running:
+                        job.skipped += 1
+                        print(f"Skipping {job.name}: the previous run is still going")
+                        continue
+                    job.running = True
+                    task = asyncio.create_task(self._run(job, loop))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.tick)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+            self._executor.shutdown(wait=False)
+
+    async def _run(self, job, loop):
+        job.last_started = self.now()
+        started = time.perf_counter()
+        try:
+            await loop.run_in_executor(self._executor, instrumentation.timer("scheduler", "job", name=job.name)(job.func))
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"Job {job.name} failed: {e}")
+        else:
+            job.last_success = self.now()
+        finally:
+            job.durations.append(time.perf_counter() - started)
+            job.runs += 1
+            job.running = False
+            print(f"Job {job.name} finished in {job.durations[-1]:.1f}s")
+            instrumentation.flush()
+
+    async def _serve_status(self, reader, writer):
+        await reader.readline()
+        body = json.dumps(self.status()).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+        await writer.drain()
+        writer.close()
+
+
+def default_jobs():
+    """The cron scripts as jobs; intervals in seconds come from SCHEDULE_* variables."""
+    import fetch_LTP
+    import max_pain_sensibull
+    import reco_sync
+
+    return [
+        Job("max_pain", max_pain_sensibull.run_all, float(os.getenv("SCHEDULE_MAX_PAIN", "300"))),
+        Job("recommendations", reco_sync.run, float(os.getenv("SCHEDULE_RECOMMENDATIONS", "900"))),
+        Job("ltp", fetch_LTP.run, float(os.getenv("SCHEDULE_LTP", "60"))),
+    ]
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            # Windows event loops have no signal handlers; Ctrl+C still interrupts
+            pass
+    if METRICS_PORT:
+        instrumentation.REGISTRY.serve(METRICS_PORT)
+    scheduler = Scheduler(default_jobs())
+    print("scheduler started : ", datetime.now(IST))
+    await scheduler.run(stop)
+    print("scheduler stopped : ", datetime.now(IST))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
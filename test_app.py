@@ -0,0 +1,118 @@
+# tests/test_app.py
+from datetime import date, datetime, timedelta
+
+import pytest
+import streamlit as st
+
+import app
+import db
+from app import build_query, fetch_data, page_cursor
+from max_pain_sensibull import MAX_PAIN_INDEXES, create_indexes
+
+
+@pytest.fixture
+def viewer_db(sqlite_db):
+    st.cache_data.clear()
+    with db.transaction() as cursor:
+        cursor.execute("""CREATE TABLE max_pain_data (expiry_date VARCHAR(32), max_pain TEXT, index_name VARCHAR(32),
+            index_price_close VARCHAR(32), max_pain_trend VARCHAR(32), max_pain_price VARCHAR(32), record_time TIMESTAMP)""")
+        start = datetime(2025, 1, 1, 3, 45)
+        cursor.executemany("INSERT INTO max_pain_data (expiry_date, max_pain, index_name, index_price_close, max_pain_trend, max_pain_price, record_time) "
+                           "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                           [(["2025-01-30", "2025-02-06"][number % 2], f"23,{number:03d}\nBullish", ["NIFTY", "BANKNIFTY"][number // 2 % 2],
+                             "23,000", "Bullish", f"23,{number:03d}", start + timedelta(hours=6 * number)) for number in range(12)])
+        create_indexes(cursor)
+    yield
+    st.cache_data.clear()
+
+
+def test_build_query_projects_and_binds_every_filter():
+    query, params = build_query(columns=("record_time", "max_pain_price"), index_name="NIFTY", expiry_date="2025-01-30",
+                                start=datetime(2025, 1, 1), end=datetime(2025, 1, 2), limit=50, offset=100)
+    assert query == ("SELECT record_time, max_pain_price FROM max_pain_data WHERE index_name = %s AND expiry_date = %s "
+                     "AND record_time >= %s AND record_time < %s "
+                     "ORDER BY record_time DESC, index_name DESC, expiry_date DESC LIMIT %s OFFSET %s")
+    assert params == ("NIFTY", "2025-01-30", datetime(2025, 1, 1), datetime(2025, 1, 2), 50, 100)
+
+    query, params = build_query(after=(datetime(2025, 1, 2), "NIFTY", "2025-01-30"))
+    assert query == (f"SELECT {', '.join(app.COLUMNS)} FROM max_pain_data WHERE (record_time, index_name, expiry_date) < (%s, %s, %s) "
+                     "ORDER BY record_time DESC, index_name DESC, expiry_date DESC LIMIT %s OFFSET %s")
+    assert params == (datetime(2025, 1, 2), "NIFTY", "2025-01-30", app.PAGE_SIZE, 0)
+
+
+def test_build_query_filters_and_pages_against_the_database(viewer_db):
+    query, params = build_query(columns=("max_pain_price",), index_name="NIFTY", limit=2, offset=0)
+    first = db.read_frame(query, params)
+    query, params = build_query(columns=("max_pain_price",), index_name="NIFTY", limit=2, offset=2)
+    second = db.read_frame(query, params)
+    query, params = build_query(columns=("max_pain_price",), index_name="NIFTY", limit=2, offset=6)
+
+    assert list(first.columns) == ["max_pain_price"]
+    # NIFTY rows are numbers 0, 1, 4, 5, 8, 9, newest first
+    assert first["max_pain_price"].tolist() + second["max_pain_price"].tolist() == ["23,009", "23,008", "23,005", "23,004"]
+    assert db.read_frame(query, params).empty
+
+    query, params = build_query(expiry_date="2025-02-06", start=datetime(2025, 1, 2), end=datetime(2025, 1, 3, 3, 45))
+    assert db.read_frame(query, params)["max_pain_price"].tolist() == ["23,007", "23,005"]
+
+
+def test_fetch_data_converts_ist_dates_and_pages(viewer_db):
+    # 2 Jan IST runs from 1 Jan 18:30 to 2 Jan 18:30 UTC: rows 3 (1 Jan 21:45) to 6 (2 Jan 15:45)
+    data = fetch_data(date_range=(date(2025, 1, 2), date(2025, 1, 2)), page=0, page_size=2)
+    assert data["max_pain_price"].tolist() == ["23,006", "23,005"]
+    assert str(data["record_time"].iloc[0].tz) == "Asia/Kolkata"
+    assert fetch_data(date_range=(date(2025, 1, 2),), page=1, page_size=2)["max_pain_price"].tolist() == ["23,004", "23,003"]
+    assert fetch_data(index_name="BANKNIFTY", expiry_date="2025-01-30", page=0, page_size=10)["max_pain_price"].tolist() == \
+        ["23,010", "23,006", "23,002"]
+
+
+def test_indexes_exist_once_and_serve_the_viewer_queries(viewer_db):
+    with db.transaction() as cursor:
+        create_indexes(cursor)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'max_pain_data'")
+        assert sorted(name for name, in cursor.fetchall()) == sorted(MAX_PAIN_INDEXES)
+
+        query, params = build_query(index_name="NIFTY", expiry_date="2025-01-30", after=(datetime(2025, 1, 3), "NIFTY", "2025-01-30"))
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        assert "idx_max_pain_index_expiry_time" in plan and "TEMP B-TREE" not in plan
+
+        query, params = build_query()
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        assert "idx_max_pain_record_time" in plan and "TEMP B-TREE" not in plan
+
+        cursor.execute("EXPLAIN QUERY PLAN SELECT MAX(record_time) AS latest FROM max_pain_data")
+        assert "idx_max_pain_record_time" in " ".join(str(row[-1]) for row in cursor.fetchall())
+
+
+def test_keyset_pages_match_offset_pages_across_tied_record_times(viewer_db):
+    with db.transaction() as cursor:
+        # One capture writes several indices and expiries with the same record_time
+        cursor.executemany("INSERT INTO max_pain_data (expiry_date, index_name, max_pain_price, record_time) VALUES (%s, %s, %s, %s)",
+                           [(expiry, index, f"tie {index} {expiry}", datetime(2025, 1, 2, 12))
+                            for index in ("NIFTY", "BANKNIFTY") for expiry in ("2025-01-30", "2025-02-06")])
+
+    by_offset = [fetch_data(page=page, page_size=3)["max_pain_price"].tolist() for page in range(6)]
+    by_key, after = [], None
+    for page in range(6):
+        data = fetch_data(page=page, page_size=3, after=after)
+        by_key.append(data["max_pain_price"].tolist())
+        after = page_cursor(data)
+    assert by_key == by_offset
+    assert sum(len(rows) for rows in by_key) == 16
+    assert page_cursor(fetch_data(page=9, page_size=3)) is None
+
+
+def test_archive_pages_filter_expiry_in_the_scan(viewer_db, tmp_path, monkeypatch):
+    import max_pain_archive
+
+    root = str(tmp_path / "archive")
+    max_pain_archive.export_max_pain(root)
+    monkeypatch.setattr(max_pain_archive, "ARCHIVE_DIR", root)
+
+    first = fetch_data(expiry_date="2025-02-06", page=0, page_size=2, source="Archive")
+    second = fetch_data(expiry_date="2025-02-06", page=1, page_size=2, source="Archive")
+    assert first["max_pain_price"].tolist() + second["max_pain_price"].tolist() == [23011.0, 23009.0, 23007.0, 23005.0]
+    assert str(first["record_time"].iloc[0].tz) == "Asia/Kolkata"
+    assert fetch_data(expiry_date="next week", source="Archive").empty
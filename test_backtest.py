@@ -0,0 +1,104 @@
+# tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest as backtest_module
+from backtest import backtest, summarize, sweep
+
+
+@pytest.fixture
+def prices():
+    days = pd.date_range("2025-01-01", periods=6, freq="D")
+    return pd.DataFrame({
+        "INFY": [100, 104, 111, 90, 95, 96],
+        "TCS": [100, 97, 94, 99, 130, 131],
+        "SBIN": [100, 101, 102, 101, 103, np.nan],
+    }, index=days)
+
+
+def recommendation(reco_id, instrument, user_name="alice", reco_type="buy", entry=100, target=110, stoploss=95,
+                   created="2025-01-01", end="2025-01-06"):
+    return {"id": reco_id, "instrument": instrument, "user_name": user_name, "reco_type": reco_type, "entry_price": entry,
+            "target_price_1": target, "stoploss_price": stoploss, "created_at": created, "reco_end_date": end}
+
+
+def test_first_touch_outcomes(prices):
+    recos = pd.DataFrame([
+        recommendation(1, "INFY"),
+        recommendation(2, "TCS", user_name="bob"),
+        recommendation(3, "SBIN"),
+        recommendation(4, "TCS", reco_type="sell", target=95, stoploss=105, user_name="bob"),
+        recommendation(5, "MISSING"),
+        recommendation(6, "INFY", entry=90, stoploss=85, created="2025-01-04"),
+    ])
+
+    results = backtest(recos, prices).set_index("id")
+
+    assert results["outcome"].tolist() == ["target", "stoploss", "expiry", "target", "no_data", "expiry"]
+    assert results.loc[1, "exit_price"] == 111
+    assert results.loc[1, "exit_time"] == pd.Timestamp("2025-01-03")
+    assert results.loc[2, "pnl"] == -6
+    assert results.loc[3, "exit_price"] == 103
+    assert results.loc[4, "pnl"] == 6
+    assert results.loc[6, "exit_price"] == 96
+    assert np.isnan(results.loc[5, "pnl"])
+
+    summary = summarize(results)
+    assert summary.loc["alice", "recommendations"] == 3
+    assert summary.loc["alice", "hit_rate"] == pytest.approx(1 / 3)
+    assert summary.loc["bob", "stoploss_rate"] == 0.5
+
+
+def test_matches_row_by_row_loop_and_sweeps(prices):
+    rng = np.random.default_rng(11)
+    rows = []
+    for reco_id in range(300):
+        entry = float(rng.uniform(95, 105))
+        rows.append(recommendation(reco_id, rng.choice(["INFY", "TCS", "SBIN"]), entry=entry,
+                                   target=entry + rng.uniform(1, 30), stoploss=entry - rng.uniform(1, 15),
+                                   created=str(prices.index[rng.integers(0, 4)].date()), end=str(prices.index[rng.integers(3, 6)].date())))
+    recos = pd.DataFrame(rows)
+
+    results = backtest(recos, prices, chunk_size=64)
+
+    for reco, result in zip(recos.itertuples(), results.itertuples()):
+        window = prices.loc[reco.created_at:reco.reco_end_date, reco.instrument].dropna()
+        expected = "expiry"
+        for price in window:
+            if price >= reco.target_price_1:
+                expected = "target"
+                break
+            if price <= reco.stoploss_price:
+                expected = "stoploss"
+                break
+        assert result.outcome == expected
+
+    grid = sweep(recos, prices, stoploss_multiples=(0.5, 1.0, 3.0))
+    assert grid["stoploss_rate"].is_monotonic_decreasing
+
+
+def test_unset_levels_never_trigger_even_when_scaled(prices):
+    recos = pd.DataFrame([
+        recommendation(1, "INFY", target=0),
+        recommendation(2, "INFY", target=1000, stoploss=0),
+        recommendation(3, "TCS", reco_type="sell", target=None, stoploss=0),
+        recommendation(4, "TCS", target=-5, stoploss=-5),
+    ])
+
+    for multiple in (0.1, 1.0, 2.0):
+        results = backtest(recos, prices, stoploss_multiple=multiple, target_multiple=multiple)
+        assert results["outcome"].tolist() == ["stoploss", "expiry", "expiry", "expiry"]
+
+
+def test_chunk_size_follows_the_memory_budget(prices, monkeypatch):
+    recos = pd.DataFrame([recommendation(reco_id, "INFY") for reco_id in range(40)])
+    expected = backtest(recos, prices)
+
+    calls = []
+    first_touch = backtest_module._first_touch
+    monkeypatch.setattr(backtest_module, "_first_touch", lambda *args: calls.append(len(args[1])) or first_touch(*args))
+    # Six bars per window: room for seven recommendations per chunk
+    monkeypatch.setattr(backtest_module, "CHUNK_MEMORY_BYTES", 7 * 6 * backtest_module.BYTES_PER_CELL)
+    pd.testing.assert_frame_equal(backtest(recos, prices), expected)
+    assert calls == [7] * 5 + [5]
@@ -0,0 +1,50 @@
+# tests/test_cli.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+import fetch_LTP
+
+# Cold-start budget for DB-only commands; pandas alone is most of it
+IMPORT_BUDGET_MS = float(os.getenv("CLI_IMPORT_BUDGET_MS", "1500"))
+HEAVY_MODULES = ("selenium", "bs4", "webdriver_manager", "streamlit")
+
+
+def import_profile(statement):
+    """Runs statement in a fresh interpreter under -X importtime; returns (stdout, {module: cumulative us}, top-level us)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    modules = {}
+    top_level = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+        if not name[1:].startswith(" "):
+            top_level += int(cumulative)
+    return result.stdout, modules, top_level
+
+
+def test_db_only_commands_start_fast():
+    stdout, modules, total_us = import_profile("import cli, fetch_LTP, max_pain, price_history")
+
+    assert stdout == ""
+    loaded = [name for name in modules if name.split(".")[0] in HEAVY_MODULES]
+    assert loaded == []
+    assert total_us / 1000 < IMPORT_BUDGET_MS, f"cold start took {total_us / 1000:.0f} ms"
+
+
+def test_subcommands_dispatch(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fetch_LTP, "update_stock_exit_date", lambda dry_run: calls.append(("exits", dry_run)))
+    monkeypatch.setattr(fetch_LTP, "update_stock_prices", lambda workers: calls.append(("ltp", workers)))
+
+    assert cli.main(["exits", "--dry-run"]) == 0
+    assert cli.main(["ltp", "--workers", "3"]) == 0
+    assert calls == [("exits", True), ("ltp", 3)]
+    with pytest.raises(SystemExit):
+        cli.main([])
@@ -0,0 +1,67 @@
+# tests/test_db.py
+import threading
+
+import pytest
+
+import db
+
+
+@pytest.fixture(autouse=True)
+def portfolio(sqlite_db):
+    with db.transaction() as cursor:
+        cursor.execute("CREATE TABLE portfolio (id INT PRIMARY KEY AUTO_INCREMENT, instrument VARCHAR(255), current_price FLOAT)")
+
+
+def test_transaction_commits_and_translates_placeholders(sqlite_db):
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO portfolio (instrument, current_price) VALUES (%s, %s)", [("INFY", 1500.0), ("TCS", 3900.0)])
+
+    with db.transaction() as cursor:
+        cursor.execute("SELECT instrument, current_price FROM portfolio WHERE instrument = %s", ("TCS",))
+        assert cursor.fetchall() == [("TCS", 3900.0)]
+
+    frame = db.read_frame("SELECT instrument FROM portfolio WHERE current_price > %s", params=(1000,))
+    assert sorted(frame["instrument"]) == ["INFY", "TCS"]
+
+
+def test_transaction_rolls_back_on_error(sqlite_db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as cursor:
+            cursor.execute("INSERT INTO portfolio (instrument, current_price) VALUES (%s, %s)", ("INFY", 1500.0))
+            raise RuntimeError("scrape failed")
+
+    with db.transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM portfolio")
+        assert cursor.fetchone() == (0,)
+
+
+def test_pool_reuses_connections_and_caps_concurrency(sqlite_db):
+    with db.connection() as first:
+        pass
+    with db.connection() as second:
+        pass
+    assert first is second
+
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold_both():
+        with db.connection(), db.connection():
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold_both)
+    thread.start()
+    held.wait()
+    assert not sqlite_db._slots.acquire(timeout=0.05)
+    release.set()
+    thread.join()
+
+
+def test_insert_rows_upserts_on_key(sqlite_db):
+    with db.transaction() as cursor:
+        cursor.execute("CREATE TABLE quotes (symbol VARCHAR(32) PRIMARY KEY, price FLOAT)")
+        db.insert_rows(cursor, "quotes", ["symbol", "price"], [("INFY", 1.0), ("TCS", 2.0), ("SBIN", 3.0)], chunk_size=2)
+        db.insert_rows(cursor, "quotes", ["symbol", "price"], [("TCS", 20.0)], key_columns=["symbol"], update_columns=["price"])
+        cursor.execute("SELECT symbol, price FROM quotes ORDER BY symbol")
+        assert cursor.fetchall() == [("INFY", 1.0), ("SBIN", 3.0), ("TCS", 20.0)]
@@ -0,0 +1,106 @@
+# tests/test_driver_pool.py
+import threading
+import time
+
+import pytest
+
+import driver_pool
+from driver_pool import DriverPool, configure_browser
+
+
+class FakeDriver:
+    def __init__(self):
+        self.crashed = False
+        self.quit_called = False
+
+    @property
+    def current_url(self):
+        if self.crashed:
+            raise ConnectionError("browser is gone")
+        return "about:blank"
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_pool_reuses_warm_driver():
+    started = []
+    pool = DriverPool(size=2, factory=lambda: started.append(FakeDriver()) or started[-1])
+
+    with pool.driver() as first:
+        pass
+    with pool.driver() as second:
+        pass
+
+    assert first is second
+    assert len(started) == 1
+    pool.close()
+    assert first.quit_called
+
+
+def test_pool_recycles_crashed_driver():
+    pool = DriverPool(size=1, factory=FakeDriver)
+
+    with pool.driver() as first:
+        first.crashed = True
+    with pool.driver() as second:
+        pass
+
+    assert second is not first
+    assert first.quit_called
+
+
+def test_pool_caps_concurrent_checkouts():
+    pool = DriverPool(size=2, factory=FakeDriver)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with pool.driver():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+
+
+def test_pool_retires_driver_after_max_uses_and_times_out_when_full():
+    pool = DriverPool(size=1, factory=FakeDriver, max_uses=2)
+
+    with pool.driver() as first:
+        pass
+    with pool.driver() as again:
+        assert again is first
+        with pytest.raises(TimeoutError):
+            with pool.driver(timeout=0.01):
+                pass
+    with pool.driver() as fresh:
+        pass
+
+    assert fresh is not first
+    assert first.quit_called
+
+
+def test_browsers_get_a_page_load_timeout_and_a_maximized_window_once():
+    calls = []
+
+    class Browser:
+        def set_page_load_timeout(self, seconds):
+            calls.append(("set_page_load_timeout", seconds))
+
+        def maximize_window(self):
+            calls.append(("maximize_window",))
+
+    browser = Browser()
+    assert configure_browser(browser) is browser
+    assert calls == [("set_page_load_timeout", driver_pool.PAGE_LOAD_TIMEOUT), ("maximize_window",)]
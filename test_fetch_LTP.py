@@ -0,0 +1,269 @@
+# tests/test_fetch_LTP.py
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+
+import db
+import fetch_LTP
+import price_history
+import price_sources
+from driver_pool import DriverPool
+from fetch_LTP import fetch_latest_prices, update_stock_exit_date, update_stock_prices, write_stock_prices
+from ltp_cache import LTPCache
+
+
+@pytest.fixture
+def portfolio_db(sqlite_db):
+    with db.transaction() as cursor:
+        cursor.execute("""CREATE TABLE recommendations (id INT PRIMARY KEY, target_price_1 FLOAT, stoploss_price FLOAT)""")
+        cursor.execute("""CREATE TABLE portfolio (id INT PRIMARY KEY AUTO_INCREMENT, instrument VARCHAR(255), entry_price FLOAT,
+            quantity INT, recommendation_id INT, current_price FLOAT, realized_profit FLOAT, exit_price FLOAT, exit_date DATETIME)""")
+
+
+def add_position(instrument, entry_price, recommendation_id=None, current_price=None, quantity=1):
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO portfolio (instrument, entry_price, quantity, recommendation_id, current_price) VALUES (%s, %s, %s, %s, %s)",
+                       (instrument, entry_price, quantity, recommendation_id, current_price))
+
+
+def test_write_stock_prices_updates_in_one_statement_and_counts(portfolio_db):
+    add_position("INFY", 1500)
+    add_position("INFY", 1450)
+    add_position("TCS", 3900)
+    add_position("SBIN", 800)
+
+    with db.transaction() as cursor:
+        result = write_stock_prices({"INFY": 1534.8, "TCS": 3912.05, "SBIN": None, "GONE": 10.0, "O'REILLY": 5.0}, cursor, chunk_size=2)
+
+    assert result["updated"] == 2
+    assert result["rows"] == 3
+    assert result["missing"] == 3
+    assert sorted(result["missing_instruments"]) == ["GONE", "O'REILLY", "SBIN"]
+    with db.transaction() as cursor:
+        cursor.execute("SELECT instrument, current_price FROM portfolio ORDER BY id")
+        assert cursor.fetchall() == [("INFY", 1534.8), ("INFY", 1534.8), ("TCS", 3912.05), ("SBIN", None)]
+
+
+def test_update_stock_exit_date_uses_join_and_batches_exits(portfolio_db):
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO recommendations (id, target_price_1, stoploss_price) VALUES (%s, %s, %s)",
+                           [(1, 110, 90), (2, 110, 90), (3, 110, 90), (4, 0, None), (5, None, 95)])
+    add_position("HIT", 100, recommendation_id=1, current_price=112, quantity=2)
+    add_position("STOP", 100, recommendation_id=2, current_price=85, quantity=3)
+    add_position("HOLD", 100, recommendation_id=3, current_price=100)
+    add_position("NOTARGET", 100, recommendation_id=4, current_price=500)
+    add_position("NOPRICE", 100, recommendation_id=5)
+    add_position("ORPHAN", 100, recommendation_id=99, current_price=1)
+
+    planned = update_stock_exit_date(dry_run=True)
+    assert planned[["instrument", "reason", "realized_profit"]].values.tolist() == [["HIT", "target", 24.0], ["STOP", "stoploss", -45.0]]
+    with db.transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM portfolio WHERE exit_date IS NOT NULL")
+        assert cursor.fetchone() == (0,)
+
+    update_stock_exit_date()
+    with db.transaction() as cursor:
+        cursor.execute("SELECT instrument, exit_price, realized_profit FROM portfolio WHERE exit_date IS NOT NULL ORDER BY id")
+        assert cursor.fetchall() == [("HIT", 112.0, 24.0), ("STOP", 85.0, -45.0)]
+    assert update_stock_exit_date().empty
+
+
+def test_update_stock_exit_date_skips_positions_without_quantity_or_entry_price(portfolio_db, capsys):
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO recommendations (id, target_price_1, stoploss_price) VALUES (%s, %s, %s)", (1, 110, 90))
+    add_position("NOQTY", 100, recommendation_id=1, current_price=112, quantity=None)
+    add_position("NOENTRY", None, recommendation_id=1, current_price=85)
+    add_position("HIT", 100, recommendation_id=1, current_price=112, quantity=2)
+
+    assert update_stock_exit_date()["instrument"].tolist() == ["HIT"]
+    with db.transaction() as cursor:
+        cursor.execute("SELECT instrument, realized_profit, exit_date IS NULL FROM portfolio ORDER BY id")
+        assert cursor.fetchall() == [("NOQTY", None, 1), ("NOENTRY", None, 1), ("HIT", 24.0, 0)]
+    out = capsys.readouterr().out
+    assert "Missing entry price or quantity for NOQTY" in out and "NOENTRY" in out
+
+
+class FixedPrices:
+    """Stands in for the layered HTTP/Selenium sources with fixed prices."""
+
+    def __init__(self, prices):
+        self.prices = prices
+
+    def fetch_many(self, symbols):
+        return {symbol: self.prices.get(symbol) for symbol in symbols}
+
+    def report(self):
+        return []
+
+
+@pytest.fixture
+def refresh(portfolio_db, monkeypatch):
+    monkeypatch.setattr(price_sources, "HttpPriceSource", lambda: None)
+    monkeypatch.setattr(price_sources, "LayeredPriceSource", lambda sources: FixedPrices({"INFY": 1534.8, "TCS": 3912.05}))
+    monkeypatch.setattr(fetch_LTP, "SeleniumPriceSource", lambda **kwargs: None)
+    monkeypatch.setattr(fetch_LTP, "get_cache", lambda: LTPCache(ttl=0))
+    rings = price_history.PriceRings(capacity=8)
+    monkeypatch.setattr(price_history, "_rings", rings)
+    add_position("INFY", 1500)
+    add_position("TCS", 3900)
+    return rings
+
+
+def test_update_stock_prices_creates_history_table_before_writing(refresh, monkeypatch):
+    events = []
+    transaction = db.transaction
+    create_table = price_history.create_table
+
+    def traced_transaction(*args, **kwargs):
+        events.append("begin")
+        return transaction(*args, **kwargs)
+
+    monkeypatch.setattr(db, "transaction", traced_transaction)
+    monkeypatch.setattr(price_history, "create_table", lambda cursor: events.append("ddl") or create_table(cursor))
+    update_stock_prices()
+
+    # DDL commits implicitly on MySQL, so it never shares a transaction with the writes
+    assert events == ["begin", "ddl", "begin", "begin"]
+    assert refresh.get("INFY").latest()[1] == 1534.8
+    with transaction() as cursor:
+        cursor.execute("SELECT instrument, price FROM price_history ORDER BY instrument")
+        assert cursor.fetchall() == [("INFY", 1534.8), ("TCS", 3912.05)]
+
+
+def test_update_stock_prices_leaves_rings_alone_when_the_write_fails(refresh, monkeypatch):
+    def failing_write(*args, **kwargs):
+        raise sqlite3.Error("disk I/O error")
+
+    monkeypatch.setattr(price_history, "record_prices", failing_write)
+    update_stock_prices()
+
+    assert "INFY" not in refresh
+    with db.transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM price_history")
+        assert cursor.fetchone() == (0,)
+        cursor.execute("SELECT current_price FROM portfolio ORDER BY id")
+        assert cursor.fetchall() == [(None,), (None,)]
+
+
+class FakeDriver:
+    def __init__(self):
+        self.crashed = False
+
+    @property
+    def current_url(self):
+        if self.crashed:
+            raise ConnectionError("browser is gone")
+        return "about:blank"
+
+    def quit(self):
+        pass
+
+
+class QuotePage:
+    """A driver that serves one TradingView page and refuses per-lookup window changes."""
+
+    page_source = '<div class="symbol-header-ticker"><span class="js-symbol-last">1,534.80</span></div>'
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+
+    def maximize_window(self):
+        raise AssertionError("the pool maximizes each browser once")
+
+
+def test_get_latest_price_leaves_window_setup_to_the_pool():
+    driver = QuotePage()
+    assert fetch_LTP.get_latest_price("INFY", driver, timeout=1) == 1534.8
+    assert driver.urls == ["https://www.tradingview.com/symbols/NSE-INFY/"]
+
+
+class FakeTicker:
+    """A fetch_price stand-in: 'SLOW' symbols time out and 'CRASH' symbols kill the browser."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.timeouts = []
+        self.drivers = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, instrument_name, driver, timeout):
+        with self._lock:
+            self.calls[instrument_name] += 1
+            self.timeouts.append(timeout)
+            self.drivers[instrument_name] = driver
+        time.sleep(0.001)
+        if instrument_name.startswith("SLOW"):
+            return None
+        if instrument_name.startswith("CRASH"):
+            driver.crashed = True
+            return None
+        return float(len(instrument_name))
+
+
+def test_fetch_latest_prices_processes_each_symbol_once():
+    started = []
+    pool = DriverPool(size=3, factory=lambda: started.append(FakeDriver()) or started[-1])
+    ticker = FakeTicker()
+    instruments = [f"SYM{number}" for number in range(60)]
+
+    prices = fetch_latest_prices(instruments + instruments[:10], pool=pool, fetch_price=ticker)
+
+    assert prices == {name: float(len(name)) for name in instruments}
+    assert set(ticker.calls.values()) == {1}
+    assert len(started) <= 3
+    pool.close()
+
+
+def test_fetch_latest_prices_keeps_the_browser_after_a_timeout():
+    pool = DriverPool(size=1, factory=FakeDriver)
+    ticker = FakeTicker()
+
+    prices = fetch_latest_prices(["SLOW", "INFY"], pool=pool, fetch_price=ticker, timeout=0.5)
+
+    assert prices == {"SLOW": None, "INFY": 4.0}
+    assert ticker.timeouts == [0.5, 0.5]
+    assert ticker.drivers["SLOW"] is ticker.drivers["INFY"]
+    pool.close()
+
+
+def test_fetch_latest_prices_replaces_a_crashed_browser():
+    started = []
+    pool = DriverPool(size=1, factory=lambda: started.append(FakeDriver()) or started[-1])
+    ticker = FakeTicker()
+
+    prices = fetch_latest_prices(["INFY", "CRASH", "TCS", "SBIN"], pool=pool, workers=1, fetch_price=ticker)
+
+    assert prices == {"INFY": 4.0, "CRASH": None, "TCS": 3.0, "SBIN": 4.0}
+    assert len(started) == 2
+    assert ticker.drivers["INFY"] is ticker.drivers["CRASH"] is started[0]
+    assert ticker.drivers["TCS"] is ticker.drivers["SBIN"] is started[1]
+    assert sum(ticker.calls.values()) == 4
+    pool.close()
+
+
+def test_fetch_latest_prices_never_checks_out_a_browser_it_does_not_need():
+    pool = DriverPool(size=1, factory=FakeDriver)
+    ticker = FakeTicker()
+    checkouts = []
+    checkout = pool.driver
+
+    @contextmanager
+    def traced_checkout(*args):
+        with checkout(*args) as driver:
+            before = sum(ticker.calls.values())
+            yield driver
+            checkouts.append(sum(ticker.calls.values()) - before)
+
+    pool.driver = traced_checkout
+    fetch_latest_prices(["INFY", "TCS", "SBIN"], pool=pool, workers=3, fetch_price=ticker)
+
+    # Workers waiting on the single browser must not take it once the queue has run dry
+    assert sum(checkouts) == 3 and 0 not in checkouts
+    pool.close()
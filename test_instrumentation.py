@@ -0,0 +1,68 @@
+# tests/test_instrumentation.py
+import json
+import time
+from urllib.request import urlopen
+
+import pytest
+
+from instrumentation import Registry, timer
+
+
+def test_timer_records_histograms_errors_and_logs(tmp_path):
+    log_path = tmp_path / "metrics.jsonl"
+    registry = Registry(log_path=str(log_path))
+
+    with timer("ltp", "page_load", registry=registry, symbol="INFY"):
+        time.sleep(0.02)
+    with pytest.raises(TimeoutError):
+        with timer("ltp", "page_load", registry=registry, symbol="INFY"):
+            raise TimeoutError
+
+    @timer("exits", "evaluate", registry=registry)
+    def evaluate(value):
+        return value * 2
+
+    assert [evaluate(number) for number in range(3)] == [0, 2, 4]
+
+    page_load = registry.histogram("stage_seconds", job="ltp", stage="page_load", symbol="INFY")
+    assert page_load.count == 2 and page_load.sum >= 0.02
+    assert registry.histogram("stage_seconds", job="exits", stage="evaluate").count == 3
+    assert registry.counter_value("stage_errors_total", job="ltp", stage="page_load", symbol="INFY") == 1
+
+    events = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [event["ok"] for event in events[:2]] == [True, False]
+    assert events[0]["event"] == "stage" and events[0]["symbol"] == "INFY" and events[0]["seconds"] >= 0.02
+
+
+def test_prometheus_textfile_and_endpoint(tmp_path):
+    registry = Registry()
+    registry.inc("ltp_instruments_total", 3, result="updated")
+    registry.observe("stage_seconds", 0.3, job="recos", stage="login")
+    registry.observe("stage_seconds", 7.0, job="recos", stage="login")
+
+    text = registry.render()
+    assert '# TYPE ltp_instruments_total counter\nltp_instruments_total{result="updated"} 3' in text
+    assert 'stage_seconds_bucket{job="recos",stage="login",le="0.25"} 0' in text
+    assert 'stage_seconds_bucket{job="recos",stage="login",le="0.5"} 1' in text
+    assert 'stage_seconds_bucket{job="recos",stage="login",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{job="recos",stage="login"} 2' in text
+
+    path = tmp_path / "stock.prom"
+    registry.write_textfile(str(path))
+    assert path.read_text() == text
+
+    server = registry.serve(0)
+    try:
+        assert urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics").read().decode() == text
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_timer_overhead_is_small():
+    registry = Registry()
+    started = time.perf_counter()
+    for _ in range(10000):
+        with timer("ltp", "price_wait", registry=registry, symbol="INFY"):
+            pass
+    assert (time.perf_counter() - started) / 10000 < 50e-6
@@ -0,0 +1,86 @@
+# tests/test_ltp_cache.py
+import threading
+import time
+
+from ltp_cache import LTPCache, SQLiteStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_loader(prices, calls):
+    def load(symbols):
+        calls.append(list(symbols))
+        return {symbol: prices.get(symbol) for symbol in symbols}
+    return load
+
+
+def test_ttl_lru_and_counters():
+    clock = Clock()
+    calls = []
+    cache = LTPCache(ttl=60, max_entries=2, clock=clock)
+    load = counting_loader({"INFY": 1500.0, "TCS": 3900.0, "SBIN": 800.0}, calls)
+
+    assert cache.fetch_many(["INFY", "TCS", "INFY", "GONE"], load) == {"INFY": 1500.0, "TCS": 3900.0, "GONE": None}
+    assert calls == [["INFY", "TCS", "GONE"]]
+
+    clock.now += 30
+    assert cache.fetch_many(["TCS", "INFY"], load) == {"TCS": 3900.0, "INFY": 1500.0}
+    assert len(calls) == 1
+
+    # SBIN evicts the least recently used symbol, TCS
+    cache.fetch_many(["SBIN"], load)
+    assert cache.fetched_at("TCS") is None
+
+    clock.now += 40
+    cache.fetch_many(["INFY"], load)
+    assert calls[-1] == ["INFY"]
+    assert cache.report() == {"entries": 2, "hits": 2, "misses": 4, "stale": 1, "coalesced": 0, "hit_rate": 2 / 7}
+
+
+def test_concurrent_callers_share_one_fetch():
+    cache = LTPCache(ttl=60)
+    calls = []
+    started = threading.Event()
+
+    def slow_load(symbols):
+        calls.append(list(symbols))
+        started.set()
+        time.sleep(0.2)
+        return {symbol: 100.0 for symbol in symbols}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.fetch_many(["INFY"], slow_load)))
+    leader.start()
+    started.wait()
+    results.append(cache.fetch_many(["INFY"], slow_load))
+    leader.join()
+
+    assert calls == [["INFY"]]
+    assert results == [{"INFY": 100.0}, {"INFY": 100.0}]
+    assert cache.report()["coalesced"] == 1
+
+
+def test_store_shares_prices_between_processes(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "ltp.sqlite3")
+    calls = []
+    load = counting_loader({"INFY": 1500.0}, calls)
+
+    LTPCache(ttl=60, store=SQLiteStore(path), clock=clock).fetch_many(["INFY"], load)
+    other = LTPCache(ttl=60, store=SQLiteStore(path), clock=clock)
+    assert other.fetch_many(["INFY"], load) == {"INFY": 1500.0}
+    assert len(calls) == 1
+
+    # An older price from a slow process does not overwrite a newer one
+    SQLiteStore(path).put_many({"INFY": (1400.0, 900.0)})
+    assert SQLiteStore(path).get_many(["INFY"]) == {"INFY": (1500.0, 1000.0)}
+
+    clock.now += 61
+    assert LTPCache(ttl=60, store=SQLiteStore(path), clock=clock).fetch_many(["INFY"], load) == {"INFY": 1500.0}
+    assert len(calls) == 2
@@ -0,0 +1,200 @@
+# tests/test_max_pain.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from max_pain import MaxPainBook, batch_max_pain, calculate_max_pain, pain_curve
+
+
+def reference_max_pain(options_chain):
+    # The original nested-loop implementation, kept as the oracle
+    strikes = np.array(options_chain['strike_prices'])
+    call_oi = np.array(options_chain['call_oi'])
+    put_oi = np.array(options_chain['put_oi'])
+    pain_values = {}
+    for stock_price in strikes:
+        total_pain = 0
+        for idx, strike in enumerate(strikes):
+            if stock_price > strike:
+                total_pain += (stock_price - strike) * call_oi[idx]
+        for idx, strike in enumerate(strikes):
+            if stock_price < strike:
+                total_pain += (strike - stock_price) * put_oi[idx]
+        pain_values[stock_price] = total_pain
+    max_pain_price = min(pain_values.items(), key=lambda x: x[1])[0]
+    return max_pain_price, pain_values
+
+
+def random_chain(rng, size, shuffle=True):
+    strikes = np.arange(size) * 50 + 20000
+    if shuffle:
+        rng.shuffle(strikes)
+    return {
+        'strike_prices': strikes.tolist(),
+        'call_oi': rng.integers(0, 50000, size).tolist(),
+        'put_oi': rng.integers(0, 50000, size).tolist(),
+    }
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 37, 150])
+def test_calculate_max_pain_matches_reference(size):
+    rng = np.random.default_rng(size)
+    for _ in range(5):
+        chain = random_chain(rng, size)
+        assert calculate_max_pain(chain) == reference_max_pain(chain)
+
+
+def test_calculate_max_pain_ties_and_duplicate_strikes():
+    chain = {
+        'strike_prices': [110, 100, 105, 100, 95],
+        'call_oi': [0, 0, 0, 0, 0],
+        'put_oi': [0, 0, 0, 0, 0],
+    }
+    assert calculate_max_pain(chain) == reference_max_pain(chain)
+    assert calculate_max_pain(chain)[0] == 110
+
+    chain = {
+        'strike_prices': [95, 100, 100, 105],
+        'call_oi': [10, 20, 5, 1],
+        'put_oi': [3, 7, 9, 40],
+    }
+    assert calculate_max_pain(chain) == reference_max_pain(chain)
+
+
+def test_pain_curve_on_custom_price_grid():
+    strikes = [95, 100, 105, 110, 115]
+    call_oi = [500, 700, 400, 300, 200]
+    put_oi = [200, 400, 600, 400, 300]
+    prices = np.linspace(90, 120, 61)
+
+    curve = pain_curve(strikes, call_oi, put_oi, prices=prices)
+
+    expected_call = [sum(max(p - k, 0) * c for k, c in zip(strikes, call_oi)) for p in prices]
+    expected_put = [sum(max(k - p, 0) * u for k, u in zip(strikes, put_oi)) for p in prices]
+    np.testing.assert_array_equal(curve.strikes, prices)
+    np.testing.assert_allclose(curve.call_pain, expected_call)
+    np.testing.assert_allclose(curve.put_pain, expected_put)
+    np.testing.assert_allclose(curve.total_pain, np.add(expected_call, expected_put))
+
+
+def test_calculate_max_pain_rejects_empty_chain():
+    with pytest.raises(ValueError):
+        calculate_max_pain({'strike_prices': [], 'call_oi': [], 'put_oi': []})
+
+
+def test_batch_max_pain_matches_per_chain_results():
+    rng = np.random.default_rng(7)
+    chains = {}
+    for index_name in ['NIFTY', 'BANKNIFTY', 'SENSEX', 'FINNIFTY', 'MIDCPNIFTY']:
+        for expiry in ['2025-01-30', '2025-02-27', '2025-03-27']:
+            chains[(index_name, expiry)] = random_chain(rng, int(rng.integers(1, 80)))
+    chains[('NIFTY', 'dupes')] = {
+        'strike_prices': [100, 95, 100, 105],
+        'call_oi': [20, 10, 5, 1],
+        'put_oi': [7, 3, 9, 40],
+    }
+
+    summary, curves = batch_max_pain(chains)
+
+    assert len(summary) == len(chains)
+    assert len(curves) == sum(len(chain['strike_prices']) for chain in chains.values())
+    for row in summary.itertuples(index=False):
+        chain = chains[(row.index_name, row.expiry_date)]
+        expected_price, expected_pain = reference_max_pain(chain)
+        assert row.max_pain_price == expected_price
+        assert row.total_pain == expected_pain[expected_price]
+
+        curve = curves[(curves['index_name'] == row.index_name) & (curves['expiry_date'] == row.expiry_date)]
+        for strike, total in zip(curve['strike_price'], curve['total_pain']):
+            assert total == expected_pain[strike]
+
+
+def test_batch_max_pain_accepts_long_format_frame():
+    frame = pd.DataFrame({
+        'index_name': ['NIFTY'] * 5 + ['BANKNIFTY'] * 3,
+        'expiry_date': ['2025-01-30'] * 8,
+        'strike_price': [115, 95, 105, 100, 110, 300, 200, 250],
+        'call_oi': [200, 500, 400, 700, 300, 10, 30, 20],
+        'put_oi': [300, 200, 600, 400, 400, 5, 50, 5],
+    })
+
+    summary, _ = batch_max_pain(frame)
+
+    assert summary['index_name'].tolist() == ['NIFTY', 'BANKNIFTY']
+    assert summary['max_pain_price'].tolist() == [105, 200]
+    assert summary['total_pain'].tolist() == [13500, 750]
+
+
+def test_batch_max_pain_empty_input():
+    summary, curves = batch_max_pain({})
+    assert summary.empty and curves.empty
+
+
+def test_max_pain_book_tracks_oi_deltas():
+    rng = np.random.default_rng(3)
+    chain = random_chain(rng, 120)
+    book = MaxPainBook(chain['strike_prices'], chain['call_oi'], chain['put_oi'], verify=True)
+    strikes = np.array(chain['strike_prices'])
+    call_oi = np.array(chain['call_oi'])
+    put_oi = np.array(chain['put_oi'])
+
+    for _ in range(50):
+        picked = rng.choice(len(strikes), size=int(rng.integers(1, 6)), replace=False)
+        call_delta = rng.integers(-500, 500, len(picked))
+        put_delta = rng.integers(-500, 500, len(picked))
+        call_oi[picked] += call_delta
+        put_oi[picked] += put_delta
+
+        price = book.update(strikes[picked], call_delta, put_delta)
+
+        expected_price, expected_pain = reference_max_pain(
+            {'strike_prices': strikes, 'call_oi': call_oi, 'put_oi': put_oi})
+        assert price == expected_price
+        assert dict(zip(book.strikes, book.total_pain)) == expected_pain
+
+
+def test_max_pain_book_snapshot_and_verification():
+    book = MaxPainBook([115, 95, 105, 100, 110], [200, 500, 400, 700, 300], [300, 200, 600, 400, 400], verify=True)
+    assert book.max_pain_price == 105
+
+    assert book.apply_snapshot([95, 100, 105, 110, 115], [500, 700, 400, 300, 200], [200, 400, 600, 400, 300]) == 105
+    assert book.apply_snapshot([95, 100, 105, 110, 115], [500, 700, 400, 300, 200], [200, 400, 600, 4000, 300]) == 110
+
+    with pytest.raises(ValueError):
+        book.update([102], call_delta=[1])
+
+    book.total_pain[0] += 1
+    with pytest.raises(RuntimeError):
+        book.check()
+
+
+def test_max_pain_book_breaks_ties_like_calculate_max_pain():
+    # Flat OI gives 100 and 110 equal pain; the strike listed first wins
+    chain = {'strike_prices': [110, 95, 100, 105, 115], 'call_oi': [0, 0, 0, 0, 0], 'put_oi': [0, 0, 0, 0, 0]}
+    book = MaxPainBook(chain['strike_prices'], chain['call_oi'], chain['put_oi'], verify=True)
+    assert book.max_pain_price == calculate_max_pain(chain)[0] == 110
+
+    rng = np.random.default_rng(11)
+    for _ in range(20):
+        strikes = rng.permutation([95, 100, 105, 110, 115])
+        call_oi = np.where(strikes < 105, 10, 0)
+        put_oi = np.where(strikes > 105, 10, 0)
+        chain = {'strike_prices': strikes.tolist(), 'call_oi': call_oi.tolist(), 'put_oi': put_oi.tolist()}
+        assert book.apply_snapshot(strikes, call_oi, put_oi) == calculate_max_pain(chain)[0]
+
+
+
+def test_max_pain_book_promotes_integer_oi_for_fractional_deltas():
+    book = MaxPainBook([95, 100, 105, 110, 115], [500, 700, 400, 300, 200], [200, 400, 600, 400, 300], verify=True)
+    assert book.call_oi.dtype.kind == 'i'
+
+    book.update([100, 110], call_delta=[0.6, 0.5], put_delta=0.25)
+    assert book.call_oi.tolist() == [500, 700.6, 400, 300.5, 200]
+    assert book.put_oi[1] == 400.25
+    expected = pain_curve([95, 100, 105, 110, 115], [500, 700.6, 400, 300.5, 200], [200, 400.25, 600, 400.25, 300])
+    np.testing.assert_allclose(book.total_pain, expected.total_pain)
+
+    # A float snapshot of an integer book keeps the fractions too
+    book = MaxPainBook([95, 100, 105], [5, 5, 5], [5, 5, 5], verify=True)
+    book.apply_snapshot([95, 100, 105], [5.5, 5, 5], [5, 5, 4.5])
+    np.testing.assert_allclose(book.total_pain, pain_curve([95, 100, 105], [5.5, 5, 5], [5, 5, 4.5]).total_pain)
@@ -0,0 +1,89 @@
+# tests/test_max_pain_archive.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+from max_pain_archive import export_max_pain, read_archive, read_watermark
+
+
+@pytest.fixture
+def max_pain_db(sqlite_db, tmp_path):
+    with db.transaction() as cursor:
+        cursor.execute("""CREATE TABLE max_pain_data (expiry_date VARCHAR(32), max_pain TEXT, index_name VARCHAR(32),
+            index_price_close VARCHAR(32), max_pain_trend VARCHAR(32), max_pain_price VARCHAR(32), record_time TIMESTAMP)""")
+    return tmp_path / "archive"
+
+
+def add_snapshots(start, count, step=timedelta(hours=6), expiry="2025-01-30"):
+    rows = []
+    for number in range(count):
+        index_name = ["NIFTY", "BANKNIFTY"][number % 2]
+        rows.append((expiry, f"24,{500 + number}\nBullish", index_name, "24,412.35", "Bullish",
+                     f"24,{500 + number}", start + number * step))
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO max_pain_data (expiry_date, max_pain, index_name, index_price_close, max_pain_trend, max_pain_price, record_time) "
+                           "VALUES (%s, %s, %s, %s, %s, %s, %s)", rows)
+
+
+def test_export_is_typed_partitioned_and_incremental(max_pain_db):
+    root = str(max_pain_db)
+    add_snapshots(datetime(2025, 1, 1), 8)
+
+    assert export_max_pain(root) == 8
+    assert export_max_pain(root) == 0
+    assert read_watermark(root) == datetime(2025, 1, 2, 18)
+
+    add_snapshots(datetime(2025, 1, 3), 4)
+    assert export_max_pain(root) == 4
+    partitions = sorted(path.name for path in max_pain_db.iterdir() if path.is_dir())
+    assert partitions == ["record_date=2025-01-01", "record_date=2025-01-02", "record_date=2025-01-03"]
+
+    frame = read_archive(root=root)
+    assert len(frame) == 12
+    assert frame["max_pain_price"].dtype == "float64"
+    assert frame["index_price_close"].iloc[0] == 24412.35
+    assert str(frame["index_name"].dtype) == "category"
+    assert str(frame["expiry_date"].iloc[0]) == "2025-01-30"
+
+
+def test_read_archive_filters(max_pain_db):
+    root = str(max_pain_db)
+    add_snapshots(datetime(2025, 1, 1), 12)
+    export_max_pain(root)
+
+    frame = read_archive(columns=["record_time", "max_pain_price"], index_name="NIFTY",
+                         start=datetime(2025, 1, 2), end=datetime(2025, 1, 3), root=root)
+
+    assert list(frame.columns) == ["record_time", "max_pain_price"]
+    assert frame["record_time"].tolist() == [datetime(2025, 1, 2), datetime(2025, 1, 2, 12)]
+    assert read_archive(root=str(max_pain_db / "missing")).empty
+
+
+def test_export_dates_scraped_expiries_across_new_year(max_pain_db):
+    root = str(max_pain_db)
+    # Sensibull's expiry tabs read '02 Jan': scraped in late December, they mean next January
+    add_snapshots(datetime(2024, 12, 30), 4, expiry="02 Jan")
+    add_snapshots(datetime(2025, 1, 2), 2, expiry="30 Jan")
+    export_max_pain(root)
+
+    frame = read_archive(columns=["record_time", "expiry_date"], root=root)
+    assert [str(expiry) for expiry in frame["expiry_date"]] == ["2025-01-02"] * 4 + ["2025-01-30"] * 2
+
+
+def test_read_archive_pushes_expiry_down_and_reads_newest_partitions_for_a_limit(max_pain_db):
+    root = str(max_pain_db)
+    add_snapshots(datetime(2025, 1, 1), 8)
+    add_snapshots(datetime(2025, 1, 3), 8, expiry="2025-02-06")
+    export_max_pain(root)
+
+    frame = read_archive(columns=["record_time", "expiry_date"], expiry_date="2025-01-30", root=root)
+    assert len(frame) == 8 and {str(expiry) for expiry in frame["expiry_date"]} == {"2025-01-30"}
+
+    # Unreadable files in older partitions are never opened when the newest ones fill the limit
+    for path in (max_pain_db / "record_date=2025-01-01").iterdir():
+        path.write_bytes(b"not parquet")
+    newest = read_archive(columns=["max_pain_price"], index_name="NIFTY", limit=3, root=root)
+    assert list(newest.columns) == ["max_pain_price"]
+    assert newest["max_pain_price"].tolist() == [24506.0, 24504.0, 24502.0]
+    assert read_archive(expiry_date="2025-03-27", limit=3, root=root, start=datetime(2025, 1, 3)).empty
@@ -1,10 +1,16 @@
 # tests/test_max_pain_sensibull.py
+from datetime import datetime
+
 import pytest
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.firefox.options import Options
 
+import cli
+import db
+import max_pain_sensibull
+
 def test_webdriver_setup():
     firefox_options = Options()
     firefox_options.add_argument("--headless")  # Run in headless mode
@@ -13,4 +19,24 @@ def test_webdriver_setup():
     geckodriver_path = "/snap/bin/geckodriver"
     service = Service(geckodriver_path)
     driver = webdriver.Firefox(service=service, options=firefox_options)
-    driver.quit()
\ No newline at end of file
+    driver.quit()
+
+
+def test_backfill_expiries_dates_old_rows_from_their_record_day(sqlite_db, capsys):
+    with db.transaction() as cursor:
+        cursor.execute("""CREATE TABLE max_pain_data (expiry_date VARCHAR(32), max_pain TEXT, index_name VARCHAR(32),
+            index_price_close VARCHAR(32), max_pain_trend VARCHAR(32), max_pain_price VARCHAR(32), record_time TIMESTAMP)""")
+        cursor.executemany("INSERT INTO max_pain_data (expiry_date, index_name, record_time) VALUES (%s, %s, %s)", [
+            ("02 Jan", "NIFTY", datetime(2024, 12, 30, 9, 15)),
+            ("02 Jan", "NIFTY", datetime(2024, 12, 30, 15, 25)),
+            ("30 Jan", "NIFTY", datetime(2025, 1, 2, 9, 15)),
+            ("2025-01-30", "NIFTY", datetime(2025, 1, 3, 9, 15)),
+            ("soon", "NIFTY", datetime(2025, 1, 3, 9, 15)),
+        ])
+
+    assert cli.main(["max-pain", "--backfill-expiries"]) == 0
+    assert "Converted 3 max_pain_data rows" in capsys.readouterr().out
+    assert max_pain_sensibull.backfill_expiries() == 0
+    with db.transaction() as cursor:
+        cursor.execute("SELECT expiry_date FROM max_pain_data ORDER BY record_time, expiry_date")
+        assert [row[0] for row in cursor.fetchall()] == ["2025-01-02", "2025-01-02", "2025-01-30", "2025-01-30", "soon"]
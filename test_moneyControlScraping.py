@@ -0,0 +1,41 @@
+# tests/test_moneyControlScraping.py
+import json
+
+import pytest
+
+import db
+from moneyControlScraping import create_tables, ingest_recommendations
+
+
+@pytest.fixture
+def reco_db(sqlite_db):
+    with db.transaction() as cursor:
+        create_tables(cursor)
+
+
+def api_item(reco_id, symbol, call_status="active", cmp="100", entry_price=95.0):
+    return {
+        "id": reco_id, "asset_class": "equity", "instrument_type": "cash", "instrument": symbol,
+        "reco_type": "buy", "option_category": None, "meta_data": json.dumps({"sc_symbol": symbol}),
+        "reco_end_date": "2025-03-31T10:00:00Z", "created_at": "2025-03-01T09:30:00", "user_name": "analyst",
+        "call_status": call_status, "cmp": cmp, "entry_condition": "above", "entry_price": entry_price,
+        "target_condition": "above", "target_price_1": 120.0, "stoploss_price": 90.0, "target_return": 20.0,
+        "stoploss_condition": "below", "rationale": "breakout",
+    }
+
+
+def test_ingest_inserts_updates_and_skips_unchanged(reco_db):
+    with db.transaction() as cursor:
+        summary = ingest_recommendations([api_item(1, "INFY"), api_item(2, "TCS"), {**api_item(3, "BAD"), "meta_data": "{"}], cursor)
+    assert (summary["inserted"], summary["updated"], summary["unchanged"]) == (3, 0, 0)
+    assert [record["sc_symbol"] for record in summary["new"]] == ["INFY", "TCS", None]
+
+    with db.transaction() as cursor:
+        summary = ingest_recommendations([api_item(1, "INFY"), api_item(2, "TCS", call_status="closed", cmp="110"), api_item(4, "SBIN")], cursor)
+    assert (summary["inserted"], summary["updated"], summary["unchanged"]) == (1, 1, 1)
+
+    with db.transaction() as cursor:
+        cursor.execute("SELECT id, call_status FROM recommendations ORDER BY id")
+        assert cursor.fetchall() == [(1, "active"), (2, "closed"), (3, "active"), (4, "active")]
+        cursor.execute("SELECT recommendation_id, instrument, exit_price, realized_profit FROM portfolio ORDER BY recommendation_id")
+        assert cursor.fetchall() == [(1, "INFY", None, None), (2, "TCS", 110.0, 15.0), (3, None, None, None), (4, "SBIN", None, None)]
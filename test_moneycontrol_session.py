@@ -0,0 +1,146 @@
+# tests/test_moneycontrol_session.py
+import json
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import db
+import moneyControlScraping
+from moneycontrol_session import AuthError, MoneycontrolSession, load_cookies
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures")
+GOOD_COOKIE = {"name": "mc_session", "value": "good", "domain": "127.0.0.1", "path": "/"}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Answers with the recorded recommendations only when the login cookie is sent."""
+
+    requests = 0
+    body = b"{}"
+    # What a request without the login cookie gets: a 401, or this body with a 200
+    refusal = None
+
+    def do_GET(self):
+        type(self).requests += 1
+        if "mc_session=good" not in (self.headers.get("Cookie") or ""):
+            if self.refusal is None:
+                self.send_response(401)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._answer(self.refusal)
+            return
+        self._answer(self.body)
+
+    def _answer(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api_url():
+    with open(os.path.join(FIXTURES, "moneycontrol_recommendations.json"), "rb") as fixture:
+        ApiHandler.body = fixture.read()
+    ApiHandler.requests = 0
+    ApiHandler.refusal = None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/mcapi/technicalpicks/recommendations"
+    server.shutdown()
+    server.server_close()
+
+
+class FakeLogin:
+    def __init__(self, cookies=(GOOD_COOKIE,)):
+        self.cookies = None if cookies is None else list(cookies)
+        self.calls = 0
+
+    def __call__(self, username, password, pool):
+        self.calls += 1
+        return self.cookies
+
+
+def test_logs_in_once_then_reuses_saved_cookies(api_url, tmp_path):
+    cookie_path = str(tmp_path / "cookies.json")
+    login = FakeLogin()
+    client = MoneycontrolSession("user", "secret", cookie_path=cookie_path, login=login)
+
+    assert len(client.get_json(api_url)["list"]["data"]) == 200
+    assert client.get_json(api_url)["list"]["data"]
+    # No saved cookies: the login runs before the first request instead of after a refusal
+    assert (login.calls, ApiHandler.requests) == (1, 2)
+    assert load_cookies(cookie_path) == [GOOD_COOKIE]
+    assert stat.S_IMODE(os.stat(cookie_path).st_mode) == 0o600
+
+    # A new process starts from the saved cookies: one request, no browser
+    restarted = FakeLogin()
+    assert MoneycontrolSession("user", "secret", cookie_path=cookie_path, login=restarted).get_json(api_url)
+    assert (restarted.calls, ApiHandler.requests) == (0, 3)
+
+
+@pytest.mark.parametrize("refusal", [
+    b'{"success": 0, "message": "Please login to continue"}',
+    b'{"success": 1, "error": "Session expired"}',
+    b"<html>Sign in to Moneycontrol</html>",
+])
+def test_a_200_without_the_listing_counts_as_refused(api_url, tmp_path, refusal):
+    ApiHandler.refusal = refusal
+    cookie_path = tmp_path / "cookies.json"
+    cookie_path.write_text(json.dumps([{**GOOD_COOKIE, "value": "stale"}]))
+    login = FakeLogin()
+    client = MoneycontrolSession("user", "secret", cookie_path=str(cookie_path), login=login)
+
+    assert len(client.get_json(api_url)["list"]["data"]) == 200
+    assert (login.calls, ApiHandler.requests) == (1, 2)
+
+    refused = FakeLogin(cookies=[{**GOOD_COOKIE, "value": "stale"}])
+    with pytest.raises(AuthError):
+        MoneycontrolSession("user", "secret", cookie_path=str(tmp_path / "b.json"), login=refused).get_json(api_url)
+    assert refused.calls == 1
+
+
+def test_concurrent_refusals_share_one_login(api_url, tmp_path):
+    login = FakeLogin()
+    client = MoneycontrolSession("user", "secret", cookie_path=str(tmp_path / "cookies.json"), login=login)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: client.get_json(api_url), range(4)))
+    assert all(result["list"]["data"] for result in results)
+    assert login.calls == 1
+
+
+def test_failed_or_refused_login_raises(api_url, tmp_path):
+    failed = MoneycontrolSession("user", "secret", cookie_path=str(tmp_path / "a.json"), login=FakeLogin(cookies=None))
+    with pytest.raises(AuthError):
+        failed.get_json(api_url)
+
+    refused = FakeLogin(cookies=[{**GOOD_COOKIE, "value": "stale"}])
+    with pytest.raises(AuthError):
+        MoneycontrolSession("user", "secret", cookie_path=str(tmp_path / "b.json"), login=refused).get_json(api_url)
+    assert refused.calls == 1
+
+
+def test_expired_and_unreadable_cookie_files_are_ignored(tmp_path):
+    path = tmp_path / "cookies.json"
+    path.write_text(json.dumps([{**GOOD_COOKIE, "expiry": 1}, {**GOOD_COOKIE, "name": "other"}]))
+    assert [cookie["name"] for cookie in load_cookies(str(path))] == ["other"]
+    path.write_text("{")
+    assert load_cookies(str(path)) == []
+
+
+def test_api_extract_data_ingests_without_a_browser(api_url, sqlite_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(moneyControlScraping, "send_webhook", lambda record: None)
+    client = MoneycontrolSession("user", "secret", cookie_path=str(tmp_path / "cookies.json"), login=FakeLogin())
+    assert moneyControlScraping.api_extract_data("user", "secret", api_url, client=client)
+    with db.transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM recommendations")
+        assert cursor.fetchone() == (146,)
@@ -0,0 +1,158 @@
+# tests/test_notifier.py
+import json
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import notifier
+from notifier import WebhookNotifier
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    received = []
+    status = 200
+    delay = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.delay)
+        type(self).received.append(json.loads(body)["message"])
+        self.send_response(self.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def webhook_server():
+    WebhookHandler.received = []
+    WebhookHandler.status = 200
+    WebhookHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WebhookHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/webhook", WebhookHandler
+    server.shutdown()
+    server.server_close()
+
+
+def test_notify_does_not_block_and_coalesces(webhook_server, tmp_path):
+    url, handler = webhook_server
+    handler.delay = 0.3
+    notifier = WebhookNotifier(url=url, spill_path=str(tmp_path / "spill.jsonl"), coalesce_window=0.1)
+
+    started = time.perf_counter()
+    for number in range(5):
+        notifier.notify(f"reco {number}")
+    assert time.perf_counter() - started < 0.1
+
+    notifier.close()
+    assert handler.received == ["reco 0\n\nreco 1\n\nreco 2\n\nreco 3\n\nreco 4"]
+    assert notifier.sent == 5
+
+
+def test_failed_messages_spill_and_replay(webhook_server, tmp_path):
+    url, handler = webhook_server
+    spill_path = tmp_path / "spill.jsonl"
+    handler.status = 500
+    notifier = WebhookNotifier(url=url, spill_path=str(spill_path), retries=2, backoff=0.01, coalesce_window=0.01)
+    notifier.notify("undeliverable")
+    notifier.close()
+
+    assert notifier.spilled == 1
+    assert len(handler.received) == 2
+    assert json.loads(spill_path.read_text())["message"] == "undeliverable"
+
+    handler.status = 200
+    handler.received.clear()
+    replay = WebhookNotifier(url=url, spill_path=str(spill_path), coalesce_window=0.01)
+    replay.close()
+    assert handler.received == ["undeliverable"]
+    assert not spill_path.exists()
+
+
+def test_unreadable_spill_lines_are_skipped(webhook_server, tmp_path, capsys):
+    url, handler = webhook_server
+    spill_path = tmp_path / "spill.jsonl"
+    spill_path.write_text('{"message": "first"}\n{"message": "cut sho\n[1, 2]\n\n{"message": "last"}\n')
+
+    notifier = WebhookNotifier(url=url, spill_path=str(spill_path), coalesce_window=0.05)
+    notifier.close()
+    assert handler.received == ["first\n\nlast"]
+    assert not spill_path.exists()
+    out = capsys.readouterr().out
+    assert "line 2" in out and "line 3" in out
+
+
+def test_worker_retries_the_spill_file_while_running(webhook_server, tmp_path):
+    url, handler = webhook_server
+    spill_path = tmp_path / "spill.jsonl"
+    handler.status = 500
+    notifier = WebhookNotifier(url=url, spill_path=str(spill_path), retries=1, coalesce_window=0.01,
+                               spill_retry_interval=0.2)
+    notifier.notify("late")
+    deadline = time.monotonic() + 5
+    while notifier.spilled == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert notifier.spilled >= 1
+
+    handler.status = 200
+    while notifier.sent == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    notifier.close()
+    assert notifier.sent == 1
+    assert handler.received[-1] == "late"
+    assert not spill_path.exists()
+
+
+def spill_file_only(path):
+    """A notifier reduced to its spill file, without the worker thread or HTTP session."""
+    spiller = WebhookNotifier.__new__(WebhookNotifier)
+    spiller.spill_path = path
+    spiller.spilled = 0
+    spiller._spill_lock = threading.Lock()
+    return spiller
+
+
+def spill_messages(path, writer, count):
+    spiller = spill_file_only(path)
+    for number in range(count):
+        spiller._spill([f"{writer}-{number}"])
+
+
+def take_until_done(path, done, taken):
+    spiller = spill_file_only(path)
+    while not done.is_set():
+        taken.put(spiller._take_spilled())
+    taken.put(spiller._take_spilled())
+
+
+@pytest.mark.skipif(notifier.fcntl is None, reason="needs flock")
+def test_processes_sharing_a_spill_file_never_lose_or_repeat_messages(tmp_path):
+    path = str(tmp_path / "spill.jsonl")
+    context = multiprocessing.get_context("fork")
+    done = context.Event()
+    taken = context.Queue()
+    readers = [context.Process(target=take_until_done, args=(path, done, taken)) for _ in range(2)]
+    writers = [context.Process(target=spill_messages, args=(path, writer, 300)) for writer in range(4)]
+    for process in readers + writers:
+        process.start()
+    for process in writers:
+        process.join(30)
+    done.set()
+
+    messages = []
+    while len(messages) < 1200:
+        messages.extend(taken.get(timeout=30))
+    for process in readers:
+        process.join(30)
+    while not taken.empty():
+        messages.extend(taken.get())
+    messages.extend(spill_file_only(path)._take_spilled())
+    assert sorted(messages) == sorted(f"{writer}-{number}" for writer in range(4) for number in range(300))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,142 @@
+# tests/test_option_chain.py
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import db
+import option_chain
+from max_pain import calculate_max_pain, pain_curve
+from driver_pool import DriverPool
+from max_pain_sensibull import max_pain_chain
+from replay import FixtureStore, RecordingDriver, RecordingSession, ReplayDriver, ReplayResponse, ReplaySession
+
+CHAIN = {
+    "data": {
+        "underlying_price": 23155.35,
+        # Expiries and strikes out of order, as an API may send them
+        "expiries": {
+            "2025-02-06": [{"strike": 23400, "call_oi": 300, "put_oi": 50}, {"strike": 23000, "call_oi": 100, "put_oi": 900},
+                           {"strike": 23200, "call_oi": 500, "put_oi": 500}],
+            "2025-01-30": [{"strike": 23100, "call_oi": 250, "put_oi": 0}, {"strike": 22900, "call_oi": None, "put_oi": 700},
+                           {"strike": 23300, "call_oi": 800, "put_oi": 20}, {"strike": 23000, "call_oi": 400, "put_oi": 600}],
+        },
+    }
+}
+
+
+@pytest.fixture
+def chain_db(sqlite_db):
+    with db.transaction() as cursor:
+        cursor.execute("""CREATE TABLE max_pain_data (expiry_date VARCHAR(32), max_pain TEXT, index_name VARCHAR(32),
+            index_price_close VARCHAR(32), max_pain_trend VARCHAR(32), max_pain_price VARCHAR(32))""")
+
+
+def test_capture_stores_curve_and_matches_calculate_max_pain(chain_db):
+    captured_at = datetime(2025, 1, 27, 10, 0)
+    with db.transaction() as cursor:
+        option_chain.create_table(cursor)
+        underlying, chain = option_chain.parse_option_chain(CHAIN)
+        summary = option_chain.record_chain("NIFTY", underlying, chain, cursor, captured_at)
+
+    for expiry, strikes in CHAIN["data"]["expiries"].items():
+        options = {"strike_prices": [strike["strike"] for strike in strikes],
+                   "call_oi": [strike["call_oi"] or 0 for strike in strikes],
+                   "put_oi": [strike["put_oi"] or 0 for strike in strikes]}
+        expected_price, _ = calculate_max_pain(options)
+        assert summary.loc[summary["expiry_date"] == expiry, "max_pain_price"].item() == expected_price
+
+        stored = option_chain.pain_curves("NIFTY", expiry)
+        order = np.argsort(options["strike_prices"])
+        curve = pain_curve(np.array(options["strike_prices"], dtype=float)[order], np.array(options["call_oi"])[order],
+                           np.array(options["put_oi"])[order])
+        assert stored["strike_price"].tolist() == curve.strikes.tolist()
+        assert stored["call_oi"].tolist() == np.array(options["call_oi"])[order].tolist()
+        assert stored["total_pain"].tolist() == curve.total_pain.tolist()
+
+    with db.transaction() as cursor:
+        cursor.execute("SELECT expiry_date, max_pain, index_price_close, max_pain_trend, max_pain_price FROM max_pain_data ORDER BY expiry_date")
+        assert cursor.fetchall() == [("2025-01-30", "23,000\nBearish", "23,155.35", "Bearish", "23,000"),
+                                     ("2025-02-06", "23,200\nBullish", "23,155.35", "Bullish", "23,200")]
+
+
+CHAIN_REQUEST = "https://oxide.sensibull.com/v1/compute/cache/option_chain/NIFTY"
+
+
+class LiveSensibull:
+    """Stands in for a browser on Sensibull's page: lists the requests it made and hands out a cookie."""
+
+    def __init__(self):
+        self.current_url = "about:blank"
+
+    def get(self, url):
+        self.current_url = url
+
+    @property
+    def page_source(self):
+        return "<html><body><span class='instrument-ltp'>23,155.35</span></body></html>"
+
+    def execute_script(self, script, *args):
+        assert script == option_chain.RESOURCES_SCRIPT
+        if "tradingsymbol=NIFTY" not in self.current_url:
+            return ["https://web.sensibull.com/static/app.js"]
+        return ["https://web.sensibull.com/static/app.js", CHAIN_REQUEST + "?stale=1", CHAIN_REQUEST]
+
+    def get_cookies(self):
+        return [{"name": "session", "value": "abc"}]
+
+
+class LiveApi:
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, params=None, cookies=None, **kwargs):
+        self.requests.append((url, cookies))
+        return ReplayResponse(url, 200, json.dumps(CHAIN), "application/json")
+
+
+def test_max_pain_chain_captures_the_pages_own_request_and_replays_it(chain_db, tmp_path, monkeypatch):
+    # Record against stand-ins for the browser and the API, then replay only what was recorded
+    recorded = FixtureStore(str(tmp_path / "recorded"))
+    api = LiveApi()
+    with DriverPool(size=1, factory=lambda: RecordingDriver(LiveSensibull(), recorded)) as pool:
+        max_pain_chain("NIFTY", pool, RecordingSession(api, recorded))
+    assert api.requests == [(CHAIN_REQUEST, {"session": "abc"})]
+    live = option_chain.pain_curves("NIFTY")
+
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM option_chain_oi")
+        cursor.execute("DELETE FROM max_pain_data")
+    replayed = FixtureStore(recorded.root)
+    with DriverPool(size=1, factory=lambda: ReplayDriver(replayed)) as pool:
+        max_pain_chain("NIFTY", pool, ReplaySession(replayed))
+        # A page that never requests a chain is reported, not raised
+        monkeypatch.setattr(option_chain, "OPTION_CHAIN_TIMEOUT", 0.3)
+        max_pain_chain("MISSING", pool, ReplaySession(replayed))
+
+    assert len(live) == 7
+    pd.testing.assert_frame_equal(option_chain.pain_curves("NIFTY").drop(columns="captured_at"), live.drop(columns="captured_at"))
+    with db.transaction() as cursor:
+        cursor.execute("SELECT index_name, expiry_date FROM max_pain_data ORDER BY expiry_date")
+        assert cursor.fetchall() == [("NIFTY", "2025-01-30"), ("NIFTY", "2025-02-06")]
+
+
+def test_parse_option_chain_dates_expiries_and_rejects_unknown_shapes():
+    payload = {"underlying_price": 23155.35, "expiries": {"30 Jan": [{"strike": 23000, "call_oi": 1, "put_oi": 2}],
+                                                           "2025-02-06": [{"strike": 23000}]}}
+    underlying, chain = option_chain.parse_option_chain(payload, captured_at=datetime(2024, 12, 31, 10))
+    assert underlying == 23155.35
+    assert chain.values.tolist() == [["2025-01-30", 23000.0, 1, 2], ["2025-02-06", 23000.0, 0, 0]]
+
+    with pytest.raises(ValueError):
+        option_chain.parse_option_chain({"data": {"optionChain": []}})
+
+
+def test_parse_option_chain_skips_expiries_it_cannot_date(capsys):
+    payload = {"expiries": {"weekly": [{"strike": 23000, "call_oi": 1}, {"strike": 23100}],
+                            "30 Jan": [{"strike": 23000, "put_oi": 5}]}}
+    _, chain = option_chain.parse_option_chain(payload, captured_at=datetime(2025, 1, 2))
+    assert chain.values.tolist() == [["2025-01-30", 23000.0, 0, 5]]
+    assert "Skipping 2 strikes of unparseable expiries ['weekly']" in capsys.readouterr().out
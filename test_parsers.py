@@ -0,0 +1,71 @@
+# tests/test_parsers.py
+import math
+import os
+from datetime import date, datetime
+
+from fetch_LTP import read_price
+from moneyControlScraping import extract_stock_data
+from parsers import parse_expiry, parse_price_html, parse_technical_picks
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures")
+
+PICKS_PAGE = """<html><body><section class="technical-picks">
+<div class="technical-picks-card"><h3 class="stock-name">Infosys Ltd</h3><span class="stock-code">INFY</span>
+  <span class="recommendation-date">2025-01-20</span><span class="entry-price">₹ 1,534.50</span>
+  <span class="stoploss-price">₹ 1,480</span><span class="target-price">₹ 1,650.00</span><span class="current-price">1,540.10</span></div>
+<div class="technical-picks-card highlighted"><div class="stock-name-wrapper"><h3 class="stock-name">TCS</h3></div>
+  <span class="entry-price">--</span><span class="target-price">₹ 4,100</span></div>
+</section></body></html>"""
+
+
+class PageDriver:
+    """Just enough of a WebDriver for the wait-then-snapshot paths."""
+
+    def __init__(self, page_source):
+        self.page_source = page_source
+
+    def find_elements(self, by, value):
+        return [object()]
+
+
+def test_parse_technical_picks_types_every_field():
+    first, second = parse_technical_picks(PICKS_PAGE)
+
+    assert first == {"stock_name": "Infosys Ltd", "stock_code": "INFY", "recommendation_date": "2025-01-20",
+                     "entry_price": 1534.5, "stoploss_price": 1480.0, "target_price": 1650.0, "current_price": 1540.1}
+    assert (second["stock_name"], second["stock_code"], second["target_price"]) == ("TCS", "", 4100.0)
+    assert math.isnan(second["entry_price"]) and math.isnan(second["current_price"])
+    assert parse_technical_picks("") == []
+
+
+def test_snapshot_modes_parse_page_source_once():
+    cards = extract_stock_data(PageDriver(PICKS_PAGE))
+    assert len(cards) == 2 and cards[0] == parse_technical_picks(PICKS_PAGE)[0]
+    assert read_price(PageDriver('<div class="symbol-header-ticker"><span class="js-symbol-last">2,001.25</span></div>')) == 2001.25
+    assert read_price(PageDriver('<div class="symbol-header-ticker"><span class="js-symbol-last">—</span></div>')) is False
+
+
+def test_recorded_pages():
+    with open(os.path.join(FIXTURES, "moneycontrol_technical_picks.html"), encoding="utf-8") as page:
+        cards = parse_technical_picks(page.read())
+    assert len(cards) == 60 and all(card["stock_code"] and card["entry_price"] > 0 for card in cards)
+    with open(os.path.join(FIXTURES, "tradingview_INFY.html"), encoding="utf-8") as page:
+        assert parse_price_html(page.read()) == 1534.8
+
+
+def test_embedded_price_is_read_from_the_symbol_object():
+    page = ('<script>window.initData = {"related": [{"symbol": "TCS", "lp": 3912.05}], '
+            '"quote": {"pro_name": "NSE:INFY", "last_price": "1,534.80", "ch": 12.35}};</script>')
+    assert parse_price_html(page, "INFY") == 1534.8
+    assert parse_price_html(page, "TCS") == 3912.05
+    assert parse_price_html(page, "SBIN") is None
+    assert parse_price_html('<script>{"symbol": "INFY", "ch": 1.2} {"lp": 99}</script>', "INFY") is None
+
+
+def test_parse_expiry_takes_the_year_from_record_time():
+    record_times = [datetime(2025, 1, 2, 9, 15), datetime(2024, 12, 30, 15), datetime(2025, 1, 30, 15, 25),
+                    datetime(2025, 1, 31), datetime(2025, 3, 1), datetime(2025, 1, 1), datetime(2025, 1, 1)]
+    expiries = parse_expiry(["30 Jan", "2 Jan", "30 Jan", "30 Jan", "29 Feb", "2025-02-27", "soon"], record_times)
+    assert expiries.tolist()[:6] == [date(2025, 1, 30), date(2025, 1, 2), date(2025, 1, 30), date(2026, 1, 30),
+                                     date(2028, 2, 29), date(2025, 2, 27)]
+    assert expiries.isna().tolist()[6]
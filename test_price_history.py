@@ -0,0 +1,61 @@
+# tests/test_price_history.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+from price_history import PriceRing, PriceRings, append_ticks, create_table, ohlc, record_prices
+
+
+@pytest.fixture
+def history_db(sqlite_db):
+    with db.transaction() as cursor:
+        create_table(cursor)
+
+
+def test_ring_keeps_latest_ticks_in_order():
+    ring = PriceRing(capacity=4)
+    start = datetime(2025, 1, 1, 9, 15)
+    assert ring.latest() is None
+    for minute, price in enumerate([100, 104, 98, 101, 103, 99]):
+        ring.append(start + timedelta(minutes=minute), price)
+
+    assert len(ring) == 4
+    times, prices = ring.window()
+    assert prices.tolist() == [98, 101, 103, 99]
+    assert ring.latest() == (start + timedelta(minutes=5), 99.0)
+    _, prices = ring.window(start + timedelta(minutes=3), start + timedelta(minutes=5))
+    assert prices.tolist() == [101, 103]
+    assert ring.ohlc() == {"open": 98.0, "high": 103.0, "low": 98.0, "close": 99.0, "ticks": 4}
+    assert ring.ohlc(end=start) is None
+
+
+def test_record_prices_batches_ticks_and_builds_ohlc(history_db):
+    rings = PriceRings(capacity=8)
+    start = datetime(2025, 1, 1, 9, 16)
+    ticks = [{"INFY": 1500, "TCS": 3900, "SBIN": None},
+             {"INFY": 1510, "TCS": 3890},
+             {"INFY": 1495, "TCS": 3920},
+             {"INFY": 1505, "TCS": None}]
+    for minute, prices in enumerate(ticks):
+        with db.transaction() as cursor:
+            record_prices(prices, cursor, ts=start + timedelta(minutes=minute), chunk_size=1)
+        append_ticks(prices, start + timedelta(minutes=minute), rings=rings)
+    with db.transaction() as cursor:
+        assert record_prices({"INFY": 1506}, cursor, ts=start + timedelta(minutes=3)) == 1
+        cursor.execute("SELECT COUNT(*) FROM price_history")
+        assert cursor.fetchone() == (7,)
+    append_ticks({"INFY": 1506}, start + timedelta(minutes=3), rings=rings)
+
+    whole = ohlc().set_index("instrument")
+    assert whole.loc["INFY", ["open", "high", "low", "close", "ticks"]].tolist() == [1500, 1510, 1495, 1506, 4]
+    assert whole.loc["TCS", "close"] == 3920
+    assert "SBIN" not in whole.index
+
+    bars = ohlc(["INFY"], start=start, end=start + timedelta(minutes=4), interval="2min")
+    assert bars[["open", "high", "low", "close", "ticks"]].values.tolist() == [[1500, 1510, 1500, 1510, 2], [1495, 1506, 1495, 1506, 2]]
+    assert bars["ts"].tolist() == [start, start + timedelta(minutes=2)]
+    assert ohlc([]).empty
+
+    assert rings.get("INFY").latest() == (start + timedelta(minutes=3), 1506.0)
+    assert "SBIN" not in rings
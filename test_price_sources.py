@@ -0,0 +1,90 @@
+# tests/test_price_sources.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from price_sources import HttpPriceSource, LayeredPriceSource, SourceStats, parse_price_html
+
+PAGES = {
+    "/symbols/NSE-INFY/": """<html><body><div class="js-symbol-header-ticker symbol-header-ticker">
+        <span class="last-JWoJqCpY js-symbol-last">1,534.80</span></div></body></html>""",
+    "/symbols/NSE-TCS/": """<html><head><meta itemprop="price" content="3912.05"></head><body></body></html>""",
+    "/symbols/NSE-SBIN/": """<html><script>window.initData = {"symbol":"SBIN","lp":801.4,"ch":2.1};</script></html>""",
+    "/symbols/NSE-LOADING/": """<html><div class="symbol-header-ticker"><span class="symbol-last">—</span></div></html>""",
+}
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = PAGES.get(self.path)
+        status = 200 if body is not None else 404
+        payload = (body or "not found").encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def quote_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), QuoteHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/symbols/NSE-{{symbol}}/"
+    server.shutdown()
+    server.server_close()
+
+
+class FallbackSource:
+    name = "fallback"
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.asked = []
+        self.stats = SourceStats(self.name)
+
+    def fetch_many(self, symbols):
+        self.asked.extend(symbols)
+        found = {symbol: self.prices.get(symbol) for symbol in symbols}
+        for price in found.values():
+            self.stats.record(price, 0.0)
+        return found
+
+
+def test_parse_price_html_variants():
+    assert parse_price_html(PAGES["/symbols/NSE-INFY/"]) == 1534.8
+    assert parse_price_html(PAGES["/symbols/NSE-TCS/"]) == 3912.05
+    assert parse_price_html(PAGES["/symbols/NSE-SBIN/"]) == 801.4
+    assert parse_price_html(PAGES["/symbols/NSE-LOADING/"]) is None
+
+
+def test_http_source_against_stub_server(quote_server):
+    source = HttpPriceSource(url_template=quote_server, max_workers=4)
+
+    prices = source.fetch_many(["INFY", "TCS", "SBIN", "LOADING", "MISSING", "INFY"])
+
+    assert prices == {"INFY": 1534.8, "TCS": 3912.05, "SBIN": 801.4, "LOADING": None, "MISSING": None}
+    report = source.stats.report()
+    assert report["requests"] == 5
+    assert report["hits"] == 3
+    assert report["hit_rate"] == pytest.approx(0.6)
+    assert report["p95_seconds"] is not None
+    source.close()
+
+
+def test_layered_source_only_falls_back_for_misses(quote_server):
+    fallback = FallbackSource({"LOADING": 120.0})
+    sources = LayeredPriceSource([HttpPriceSource(url_template=quote_server), fallback])
+
+    prices = sources.fetch_many(["INFY", "LOADING", "MISSING"])
+
+    assert prices == {"INFY": 1534.8, "LOADING": 120.0, "MISSING": None}
+    assert fallback.asked == ["LOADING", "MISSING"]
+    assert [report["hits"] for report in sources.report()] == [1, 1]
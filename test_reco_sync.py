@@ -0,0 +1,122 @@
+# tests/test_reco_sync.py
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import db
+import reco_sync
+from reco_sync import SyncState, iter_recommendations, page_url, sync_recommendations
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures")
+URL = "https://api.example.com/recommendations?deviceType=I&start=0&limit=100&recommendation_type=active&search="
+
+
+def load_items():
+    with open(os.path.join(FIXTURES, "moneycontrol_recommendations.json"), encoding="utf-8") as fixture:
+        return json.load(fixture)["list"]["data"]
+
+
+class PagedApi:
+    """Serves items by start/limit, tracking requests and how many were in flight at once."""
+
+    def __init__(self, items, delay=0.01, report_total=False):
+        self.items = items
+        self.delay = delay
+        self.report_total = report_total
+        self.starts = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        query = parse_qs(urlsplit(url).query, keep_blank_values=True)
+        assert query["recommendation_type"] == ["active"] and query["search"] == [""]
+        start, limit = int(query["start"][0]), int(query["limit"][0])
+        with self._lock:
+            self.starts.append(start)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        listing = {"data": self.items[start:start + limit]}
+        if self.report_total:
+            listing["total"] = len(self.items)
+        return {"list": listing}
+
+
+@pytest.fixture
+def reco_db(sqlite_db, monkeypatch):
+    notified = []
+    monkeypatch.setattr(reco_sync, "send_webhook", notified.append)
+    return notified
+
+
+def test_page_url_replaces_only_start_and_limit():
+    query = parse_qs(urlsplit(page_url(URL, 300, 50)).query, keep_blank_values=True)
+    assert (query["start"], query["limit"], query["deviceType"], query["search"]) == (["300"], ["50"], ["I"], [""])
+
+
+def test_iter_recommendations_streams_every_page_in_order_with_a_cap():
+    items = load_items()
+    api = PagedApi(items)
+
+    assert [item["id"] for item in iter_recommendations(api, URL, page_size=30, concurrency=3)] == [item["id"] for item in items]
+    assert api.max_active <= 3
+    # 200 items in pages of 30: six full pages, a short one, and at most two fetched past the end
+    assert sorted(api.starts)[:7] == [0, 30, 60, 90, 120, 150, 180]
+    assert len(api.starts) <= 9
+    # The first page goes out alone
+    assert api.starts[0] == 0 and api.starts.count(0) == 1
+
+
+def test_iter_recommendations_fetches_a_short_listing_with_one_request():
+    items = load_items()[:10]
+    api = PagedApi(items)
+    assert [item["id"] for item in iter_recommendations(api, URL, page_size=30, concurrency=4)] == [item["id"] for item in items]
+    assert api.starts == [0]
+
+
+def test_iter_recommendations_stops_at_an_empty_page_or_the_reported_total():
+    items = load_items()[:60]
+    api = PagedApi(items)
+    assert len(list(iter_recommendations(api, URL, page_size=30, concurrency=2))) == 60
+    assert sorted(api.starts)[:3] == [0, 30, 60]
+
+    reported = PagedApi(items, report_total=True)
+    assert len(list(iter_recommendations(reported, URL, page_size=30, concurrency=4))) == 60
+    assert reported.starts == [0, 30]
+
+
+def test_sync_ingests_only_new_or_changed_items(reco_db, tmp_path, monkeypatch):
+    items = load_items()
+    state = SyncState(str(tmp_path / "state.sqlite3"))
+
+    first = sync_recommendations(PagedApi(items), URL, state=state, page_size=50, batch_size=40)
+    assert (first["seen"], first["changed"], first["inserted"]) == (146, 146, 146)
+    assert len(reco_db) == 146
+    with db.transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM recommendations")
+        assert cursor.fetchone() == (146,)
+
+    # A quiet run: live prices moved, nothing else did, and the database is never touched
+    moved = [{**item, "cmp": "1.0"} for item in items]
+    with monkeypatch.context() as patched:
+        patched.setattr(db, "transaction", None)
+        quiet = sync_recommendations(PagedApi(moved), URL, state=state, page_size=50)
+    assert (quiet["seen"], quiet["changed"]) == (146, 0)
+
+    equity = [item for item in items if item["instrument_type"] == "cash" and item["asset_class"] == "equity"]
+    closed_id = equity[10]["id"]
+    changed = [{**item, "call_status": "closed"} if item["id"] == closed_id else item for item in moved]
+    changed.append({**equity[0], "id": 999999})
+    summary = sync_recommendations(PagedApi(changed), URL, state=state, page_size=50)
+    assert (summary["seen"], summary["changed"], summary["inserted"], summary["updated"]) == (147, 2, 1, 1)
+    with db.transaction() as cursor:
+        cursor.execute("SELECT call_status FROM recommendations WHERE id = %s", (int(closed_id),))
+        assert cursor.fetchone() == ("closed",)
+    assert len(reco_db) == 147
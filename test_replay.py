@@ -0,0 +1,148 @@
+# tests/test_replay.py
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import db
+import moneyControlScraping
+import replay
+from driver_pool import DriverPool
+from fetch_LTP import get_latest_price
+from max_pain_sensibull import scrape_max_pain
+from parsers import parse_expiry
+from price_sources import HttpPriceSource
+from replay import FixtureStore, RecordingDriver, RecordingSession, ReplayDriver, ReplayResponse, ReplaySession
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures")
+SENSIBULL_URL = "https://web.sensibull.com/futures-options-data?tradingsymbol=NIFTY"
+EXPIRIES = ["30 Jan", "06 Feb", "13 Feb", "27 Feb"]
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fixture:
+        return fixture.read()
+
+
+def sensibull_page(active, max_pain):
+    """The recorded NIFTY page with `active` as the selected expiry and its own max pain."""
+    page = read_fixture("sensibull_NIFTY.html").replace('data-state="active"', 'data-state="inactive"')
+    page = page.replace(f'data-state="inactive">{active}<', f'data-state="active">{active}<')
+    return page.replace("<div>23,200</div>", f"<div>{max_pain}</div>")
+
+
+@pytest.fixture
+def max_pain_db(sqlite_db):
+    with db.transaction() as cursor:
+        cursor.execute("""CREATE TABLE max_pain_data (expiry_date VARCHAR(32), max_pain TEXT, index_name VARCHAR(32),
+            index_price_close VARCHAR(32), max_pain_trend VARCHAR(32), max_pain_price VARCHAR(32))""")
+
+
+def stored_max_pain():
+    with db.transaction() as cursor:
+        cursor.execute("SELECT expiry_date, max_pain_price, index_price_close, max_pain_trend FROM max_pain_data ORDER BY expiry_date")
+        return cursor.fetchall()
+
+
+def test_sensibull_round_trip_records_and_replays_every_expiry(tmp_path, max_pain_db):
+    site = FixtureStore(str(tmp_path / "site"))
+    site.save("page", SENSIBULL_URL, sensibull_page(EXPIRIES[0], "23,200"))
+    for number, expiry in enumerate(EXPIRIES[1:], start=1):
+        site.save("page", replay.click_key(SENSIBULL_URL, expiry), sensibull_page(expiry, f"23,{200 + number * 100}"))
+
+    # Record against a stand-in "browser", then replay only what was recorded
+    recorded = FixtureStore(str(tmp_path / "recorded"))
+    scrape_max_pain(RecordingDriver(ReplayDriver(site), recorded), "NIFTY")
+    live = stored_max_pain()
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM max_pain_data")
+
+    started = time.perf_counter()
+    scrape_max_pain(ReplayDriver(FixtureStore(recorded.root)), "NIFTY")
+    elapsed = time.perf_counter() - started
+
+    # Stored as ISO dates, dated from when they were scraped
+    dated = dict(zip(EXPIRIES, (expiry.isoformat() for expiry in parse_expiry(EXPIRIES, [datetime.now()] * len(EXPIRIES)))))
+    assert sorted(live) == sorted([(dated["06 Feb"], "23,300", "23,155.35", "Bullish"), (dated["13 Feb"], "23,400", "23,155.35", "Bullish"),
+                                   (dated["27 Feb"], "23,500", "23,155.35", "Bullish"), (dated["30 Jan"], "23,200", "23,155.35", "Bullish")])
+    assert stored_max_pain() == live
+    # No fixed sleeps or timed-out waits on the replay path
+    assert elapsed < 1.5
+    assert set(recorded.keys("page")) == {SENSIBULL_URL} | {replay.click_key(SENSIBULL_URL, expiry) for expiry in EXPIRIES[1:]}
+
+
+def test_wildcard_fixture_serves_many_symbols_through_driver_and_http(tmp_path):
+    store = FixtureStore(str(tmp_path))
+    page = read_fixture("tradingview_INFY.html")
+    store.save("page", "https://www.tradingview.com/symbols/NSE-*/", page)
+    store.save("http", "GET https://www.tradingview.com/symbols/NSE-*/", page, status=200)
+    symbols = [f"SYM{number}" for number in range(50)]
+
+    driver = ReplayDriver(FixtureStore(store.root))
+    assert [get_latest_price(symbol, driver, timeout=1) for symbol in symbols] == [1534.8] * 50
+
+    source = HttpPriceSource(session=ReplaySession(FixtureStore(store.root)), max_workers=4)
+    assert source.fetch_many(symbols) == dict.fromkeys(symbols, 1534.8)
+    assert ReplaySession(store).get("https://www.tradingview.com/other").status_code == 404
+
+
+
+def test_unsupported_locators_raise_value_error(tmp_path):
+    store = FixtureStore(str(tmp_path))
+    store.save("page", "https://example.com/", '<div class="card"><span id="price">1</span></div>')
+    driver = ReplayDriver(FixtureStore(store.root))
+    driver.get("https://example.com/")
+
+    assert driver.find_element("css selector", "div.card #price").text == "1"
+    with pytest.raises(ValueError, match="Unsupported CSS selector"):
+        driver.find_elements("css selector", "div > span")
+    with pytest.raises(ValueError, match="Unsupported locator"):
+        driver.find_element("partial link text", "pri")
+
+class FakeSession:
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, params=None, **kwargs):
+        self.calls += 1
+        return ReplayResponse(url + ("?page=2" if params else ""), 200, '{"ok": true}', "application/json")
+
+
+def test_recorded_http_responses_replay_through_extract_stock_data_api(tmp_path, monkeypatch):
+    store = FixtureStore(str(tmp_path))
+    live = FakeSession()
+    RecordingSession(live, store).get("https://api.example.com/picks", params={"page": 2})
+
+    monkeypatch.setattr(replay, "SCRAPE_MODE", "replay")
+    monkeypatch.setattr(replay, "_store", store)
+    assert moneyControlScraping.extract_stock_data_api("https://api.example.com/picks?page=2") == {"ok": True}
+    assert moneyControlScraping.extract_stock_data_api("https://api.example.com/missing") == ""
+    assert live.calls == 1
+    # Unrecorded writes are acknowledged and dropped, so replays never notify anyone
+    assert replay.wrap_session(None).post("https://hooks.example.com", json={}).status_code == 200
+
+
+def test_moneycontrol_login_and_ingest_replay_without_sleeping(sqlite_db, tmp_path, monkeypatch):
+    store = FixtureStore(str(tmp_path / "fixtures"))
+    login_url = "https://accounts.moneycontrol.com/mclogin/?v=2&d=2&cpurl=https://www.moneycontrol.com/"
+    store.save("page", login_url, '<html><body><div class="loginwithTab"><ul><li>Login with OTP</li><li>Login with Password</li>'
+               '</ul></div><div class="loginwithTab"><ul><li>Login with Password</li></ul></div></body></html>')
+    store.save("page", replay.click_key(login_url, "Login with Password"),
+               '<html><body><input name="email"><input name="pwd"><form><input name="email"><input name="pwd">'
+               '<button class="continue login_verify_btn">Login</button></form></body></html>')
+    store.save("page", replay.click_key(login_url, "Login"), "<html><body><div class='user'>Welcome</div></body></html>")
+    api_url = "https://api.moneycontrol.com/mcapi/technicalpicks/recommendations?start=0"
+    store.save("page", api_url, "<html><body><pre>" + read_fixture("moneycontrol_recommendations.json") + "</pre></body></html>")
+    notified = []
+    monkeypatch.setattr(moneyControlScraping, "send_webhook", notified.append)
+
+    started = time.perf_counter()
+    with DriverPool(size=1, factory=lambda: ReplayDriver(store)) as pool:
+        assert moneyControlScraping.login_and_extract_data("user", "secret", api_url, pool=pool)
+    elapsed = time.perf_counter() - started
+    with db.transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM recommendations")
+        assert cursor.fetchone() == (146,)
+    assert len(notified) == 146
+    assert elapsed < 3
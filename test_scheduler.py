@@ -0,0 +1,78 @@
+# tests/test_scheduler.py
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+from urllib.request import urlopen
+
+from scheduler import IST, Job, Scheduler, market_open
+
+
+def test_market_open_follows_nse_hours():
+    assert market_open(IST.localize(datetime(2025, 1, 6, 9, 15)))
+    assert market_open(IST.localize(datetime(2025, 1, 6, 15, 30)))
+    assert not market_open(IST.localize(datetime(2025, 1, 6, 9, 14)))
+    assert not market_open(IST.localize(datetime(2025, 1, 6, 15, 31)))
+    assert not market_open(IST.localize(datetime(2025, 1, 4, 11, 0)))
+
+
+async def run_for(scheduler, seconds):
+    stop = asyncio.Event()
+    asyncio.get_running_loop().call_later(seconds, stop.set)
+    await scheduler.run(stop)
+
+
+def test_jobs_run_concurrently_and_overruns_are_skipped():
+    threads = set()
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            threads.add(threading.current_thread().name)
+        time.sleep(0.35)
+
+    def fast():
+        with lock:
+            threads.add(threading.current_thread().name)
+
+    def broken():
+        raise RuntimeError("page changed")
+
+    slow_job = Job("slow", slow, interval=0.1, market_hours=False)
+    fast_job = Job("fast", fast, interval=0.1, market_hours=False)
+    broken_job = Job("broken", broken, interval=10, market_hours=False)
+    closed_job = Job("closed", fast, interval=0.1)
+    saturday = IST.localize(datetime(2025, 1, 4, 11, 0))
+    scheduler = Scheduler([slow_job, fast_job, broken_job, closed_job], tick=0.05, now=lambda: saturday)
+
+    asyncio.run(run_for(scheduler, 0.5))
+
+    assert slow_job.runs == 2 and slow_job.skipped >= 3
+    assert fast_job.runs >= 4
+    assert len(threads) >= 2
+    assert broken_job.failures == 1 and broken_job.last_success is None
+    assert closed_job.runs == 0
+    status = {entry["job"]: entry for entry in scheduler.status()}
+    assert status["slow"]["last_success"] == saturday.isoformat()
+    assert status["slow"]["max_duration_seconds"] >= 0.35
+    assert status["broken"]["last_error"] == "RuntimeError: page changed"
+
+
+def test_status_endpoint():
+    job = Job("ltp", lambda: None, interval=60, market_hours=False)
+    # Port 0: the OS picks a free port, so parallel runs never collide
+    scheduler = Scheduler([job], tick=0.05, status_port=0)
+
+    async def scenario():
+        stop = asyncio.Event()
+        task = asyncio.create_task(scheduler.run(stop))
+        await asyncio.sleep(0.2)
+        assert scheduler.status_port
+        body = await asyncio.to_thread(lambda: urlopen(f"http://127.0.0.1:{scheduler.status_port}/").read())
+        stop.set()
+        await task
+        return json.loads(body)
+
+    status = asyncio.run(scenario())
+    assert status[0]["job"] == "ltp" and status[0]["runs"] == 1